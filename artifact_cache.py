@@ -0,0 +1,199 @@
+# Content-addressed artifact cache
+# Every pipeline stage output is stored under a hash of that stage's inputs, so reruns (after a failure, or
+# with a different caption style) skip every stage whose inputs haven't changed.
+#
+# Layout: <root>/<stage>/<key>/<filename> plus a meta.json with the inputs and last-used time.
+# Total size is bounded; least recently used artifacts are evicted first.
+# Readers (fetch, load_json) and writers (store, evict) take a lock: a thread lock plus, on POSIX, a file lock
+# on <root>/.lock, so an entry is never evicted while another thread or process (batch workers, daemon jobs)
+# is copying it out.
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+_FILE_HASHES = {}  # (path, size, mtime_ns) -> sha256, so unchanged files are only hashed once per process
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents."""
+    stat = os.stat(path)
+    fingerprint = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _FILE_HASHES.get(fingerprint)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+        _FILE_HASHES[fingerprint] = digest
+    return digest
+
+
+def file_fingerprint(path):
+    """Cheap identity for large inputs (like background videos): path, size and modification time."""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def make_key(stage, **inputs):
+    """Hashes a stage name and its (JSON-serializable) inputs into a cache key."""
+    payload = json.dumps({'stage': stage, 'inputs': inputs}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    """Stores stage outputs by key, with size-bounded LRU eviction."""
+
+    def __init__(self, root=".artifact_cache", max_bytes=5 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._depth = 0
+        os.makedirs(root, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            # Re-entrant (store calls evict): only the outermost level takes the file lock
+            if fcntl is None or self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            with open(os.path.join(self.root, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _entry_dir(self, stage, key):
+        return os.path.join(self.root, stage, key)
+
+    def lookup(self, stage, key, filename):
+        """
+        Returns the path of the cached artifact, or None. Marks the entry as recently used.
+        The entry can be evicted afterwards; use fetch() to copy it out safely.
+        """
+        entry_dir = self._entry_dir(stage, key)
+        path = os.path.join(entry_dir, filename)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        if not (os.path.exists(path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            meta['last_used'] = time.time()
+            self._write_meta(entry_dir, meta)
+        except (OSError, ValueError):
+            return None
+        return path
+
+    def fetch(self, stage, key, filename, dest_path):
+        """Copies the cached artifact to dest_path (safe against concurrent eviction). Returns True if it was cached."""
+        with self._locked():
+            path = self.lookup(stage, key, filename)
+            if path is None:
+                return False
+            shutil.copyfile(path, dest_path)
+            return True
+
+    def store(self, stage, key, src_path, filename, inputs=None):
+        """
+        Copies src_path into the cache as this stage's artifact and returns the cached path.
+        The entry is written to a temporary folder and renamed into place, so a crash never leaves a
+        half-written artifact that later runs would trust.
+        """
+        entry_dir = self._entry_dir(stage, key)
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key[:12]}-", dir=os.path.dirname(entry_dir))
+        try:
+            shutil.copyfile(src_path, os.path.join(tmp_dir, filename))
+            now = time.time()
+            self._write_meta(tmp_dir, {'stage': stage, 'key': key, 'filename': filename, 'inputs': inputs,
+                                       'size': os.path.getsize(src_path), 'created': now, 'last_used': now})
+            with self._locked():
+                if os.path.exists(entry_dir):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+                self.evict(keep=entry_dir)
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return os.path.join(entry_dir, filename)
+
+    def store_json(self, stage, key, data, filename, inputs=None):
+        """Stores a JSON-serializable result as this stage's artifact."""
+        fd, tmp_path = tempfile.mkstemp(suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            return self.store(stage, key, tmp_path, filename, inputs=inputs)
+        finally:
+            os.remove(tmp_path)
+
+    def load_json(self, stage, key, filename):
+        """Returns the cached JSON artifact, or None."""
+        with self._locked():
+            path = self.lookup(stage, key, filename)
+            if path is None:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+
+    @staticmethod
+    def _write_meta(entry_dir, meta):
+        tmp_path = os.path.join(entry_dir, "meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, os.path.join(entry_dir, "meta.json"))
+
+    def entries(self):
+        """Lists (last_used, size, entry_dir) for every complete cache entry."""
+        found = []
+        for stage in os.listdir(self.root):
+            stage_dir = os.path.join(self.root, stage)
+            if not os.path.isdir(stage_dir): continue
+            for key in os.listdir(stage_dir):
+                if key.startswith("."): continue  # Entry still being written
+                entry_dir = os.path.join(stage_dir, key)
+                try:
+                    with open(os.path.join(entry_dir, "meta.json"), encoding="utf-8") as f:
+                        meta = json.load(f)
+                    found.append((meta.get('last_used', 0), meta.get('size', 0), entry_dir))
+                except (OSError, ValueError):
+                    continue  # Temporary or broken entry
+        return found
+
+    def evict(self, keep=None):
+        """Removes least recently used entries (except keep) until the cache fits in max_bytes. Returns bytes freed."""
+        with self._locked():
+            return self._evict(keep)
+
+    def _evict(self, keep):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes: break
+            if entry_dir == keep: continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            freed += size
+        if freed:
+            print(f"Artifact cache: evicted {freed / 1024 ** 2:.1f} MB")
+        return freed
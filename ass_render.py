@@ -0,0 +1,126 @@
+# FFmpeg-native render backend
+# Writes the caption cues as an ASS subtitle file in the caption style, then trims the background, muxes the
+# narration and burns in the subtitles with a single ffmpeg invocation (no per-frame Python work).
+import os
+import subprocess
+
+from PIL import ImageColor, ImageFont
+
+
+def _ass_color(color):
+    """Converts a color name/hex to ASS &HAABBGGRR format (opaque)."""
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+
+def _ass_time(seconds):
+    """Formats seconds as ASS H:MM:SS.cc."""
+    centiseconds = int(round(max(seconds, 0) * 100))
+    hours, rest = divmod(centiseconds, 360000)
+    minutes, rest = divmod(rest, 6000)
+    secs, cs = divmod(rest, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{cs:02d}"
+
+
+def _ass_text(text):
+    """Escapes caption text so ASS doesn't read it as override tags."""
+    return text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}").replace("\n", "\\N")
+
+
+def font_family(font_path):
+    """Returns (family name, is_bold) of a font file, as libass will look it up."""
+    family, style = ImageFont.truetype(font_path, 10).getname()
+    return family, "bold" in (style or "").lower()
+
+
+def font_size_scale(font_path):
+    """
+    Factor from a Pillow/ImageMagick font size (em height) to an ASS font size.
+    libass sizes fonts by their full line height (ascent + descent) rather than the em, so the same number
+    gives smaller glyphs; scale it up by the line height to em ratio.
+    """
+    ascent, descent = ImageFont.truetype(font_path, 100).getmetrics()
+    return (ascent + descent) / 100.0
+
+
+def build_ass(cues, width, height, font_name, color, stroke_color, stroke_width, bold=False, size_scale=1.0):
+    """
+    Builds an ASS subtitle document for the cues (dicts with 'text', 'start', 'end', 'fontsize').
+    One centered style is created per font size; PlayRes matches the video so sizes are in output pixels.
+    size_scale converts the cue font sizes to ASS font sizes (see font_size_scale).
+    """
+    sizes = sorted({int(cue['fontsize']) for cue in cues})
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 2",  # No automatic wrapping, like TextClip's 'label' method
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+    ]
+    for size in sizes:
+        lines.append(
+            f"Style: Caption{size},{font_name},{size * size_scale:.1f},{_ass_color(color)},{_ass_color(color)},"
+            f"{_ass_color(stroke_color)},&H00000000,{-1 if bold else 0},0,0,0,100,100,0,0,1,"
+            f"{stroke_width:g},0,5,0,0,0,1"  # Alignment 5 = middle center
+        )
+    lines += ["", "[Events]", "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"]
+    for layer, cue in enumerate(cues):
+        # Later cues get higher layers so overlaps stack like CompositeVideoClip layers
+        lines.append(f"Dialogue: {layer},{_ass_time(cue['start'])},{_ass_time(cue['end'])},"
+                     f"Caption{int(cue['fontsize'])},,0,0,0,,{_ass_text(cue['text'])}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape_filter_value(value):
+    """Escapes a value for use inside an ffmpeg filtergraph option."""
+    return "'" + value.replace("\\", "/").replace("'", "'\\\\\\''").replace(":", "\\:") + "'"
+
+
+def burn_in(ffmpeg_binary, background_path, audio_path, ass_path, output_path, duration,
+            fonts_dir=None, preset="medium", crf=None, threads=None, start=0.0, video_filters=None,
+            audio_pcm=None, audio_sample_rate=None):
+    """
+    Trims the background to duration (from start), burns in the ASS subtitles and muxes the audio in one ffmpeg run.
+    video_filters (e.g. scale/crop/fps) are applied to the background before the subtitles.
+    With audio_pcm (mono s16le bytes at audio_sample_rate) the audio is piped in instead of read from audio_path.
+    Raises subprocess.CalledProcessError (with ffmpeg's stderr) on failure.
+    """
+    subtitle_filter = f"ass=filename={_escape_filter_value(ass_path)}"
+    if fonts_dir:
+        subtitle_filter += f":fontsdir={_escape_filter_value(fonts_dir)}"
+    cmd = [
+        ffmpeg_binary, "-y", "-loglevel", "error",
+        "-ss", f"{start:.3f}", "-i", background_path,
+        *(["-f", "s16le", "-ar", str(audio_sample_rate), "-ac", "1", "-i", "pipe:0"] if audio_pcm is not None
+          else ["-i", audio_path]),
+        "-t", f"{duration:.3f}",
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-vf", ",".join(list(video_filters or []) + [subtitle_filter]),
+        "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+    ]
+    if crf is not None:
+        cmd += ["-crf", str(crf)]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd.append(output_path)
+    if audio_pcm is None:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+    else:
+        result = subprocess.run(cmd, input=audio_pcm, capture_output=True)
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, cmd, stderr=result.stderr.decode(errors="replace"))
+    return output_path
+
+
+def write_ass(path, ass_text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(ass_text)
+    return os.path.abspath(path)
@@ -0,0 +1,226 @@
+# Background video library
+# Scans the background video folder once and keeps an index (duration, resolution, fps, codec and keyframe
+# times per file) in a JSON file next to the videos. Later runs only re-probe files whose size or
+# modification time changed, so nothing in the library is decoded again just to pick a clip.
+#
+# Segments are picked on keyframes: seeking to a keyframe is cheap for both moviepy and ffmpeg (no decoding
+# from the previous keyframe), and the segment is guaranteed to cover the whole narration.
+#
+# conform() optionally makes a proxy of every video, already cropped/scaled to the output size, at the output
+# fps and with a short GOP. Proxies are recorded in the same index and rebuilt when their source changes.
+import json
+import os
+import random
+import re
+import subprocess
+import tempfile
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm", ".m4v", ".avi")
+INDEX_VERSION = 1
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)(?:, start: (-?\d+(?:\.\d+)?))?")
+_VIDEO_STREAM = re.compile(r"Stream #\d+:\d+.*?: Video: (\w+)(.*)")
+_SIZE = re.compile(r", (\d{2,5})x(\d{2,5})[ ,]")
+_FPS = re.compile(r", (\d+(?:\.\d+)?) fps")
+_ROTATION = re.compile(r"rotation of (-?\d+(?:\.\d+)?) degrees|rotate\s*:\s*(-?\d+)")
+_KEYFRAME = re.compile(r"pts_time:\s*(-?\d+(?:\.\d+)?).*?iskey:1")
+
+
+def probe_video(ffmpeg_binary, path):
+    """
+    Reads a video's metadata and keyframe times with one ffmpeg run that only decodes keyframes.
+    Returns a dict with duration, width, height, fps, codec and keyframes (seconds from the start).
+    """
+    result = subprocess.run(
+        [ffmpeg_binary, "-hide_banner", "-nostats", "-skip_frame", "nokey", "-i", path,
+         "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"],
+        capture_output=True, text=True, errors="replace",
+    )
+    output = result.stderr
+    duration = _DURATION.search(output)
+    stream = _VIDEO_STREAM.search(output)
+    if result.returncode != 0 or not duration or not stream:
+        raise RuntimeError(f"Could not probe {path}: {output.strip()[-300:]}")
+
+    hours, minutes, seconds, start = duration.groups()
+    start = float(start or 0.0)
+    size = _SIZE.search(stream.group(2))
+    fps = _FPS.search(stream.group(2))
+    width, height = (int(size.group(1)), int(size.group(2))) if size else (0, 0)
+    rotation = _ROTATION.search(output)
+    if rotation and abs(float(rotation.group(1) or rotation.group(2))) % 180 == 90:
+        width, height = height, width
+
+    keyframes = sorted({round(float(t) - start, 3) for t in _KEYFRAME.findall(output)})
+    return {
+        'duration': int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        'width': width,
+        'height': height,
+        'fps': float(fps.group(1)) if fps else None,
+        'codec': stream.group(1),
+        'keyframes': [t for t in keyframes if t >= 0] or [0.0],
+    }
+
+
+class BackgroundLibrary:
+    """Index of the videos in a folder, refreshed incrementally by file size and modification time."""
+
+    def __init__(self, video_dir, index_path=None, ffmpeg_binary="ffmpeg", proxy_dir=None):
+        self.video_dir = video_dir
+        self.index_path = index_path or os.path.join(video_dir, ".background_index.json")
+        self.proxy_dir = proxy_dir or os.path.join(video_dir, ".proxies")
+        self.ffmpeg_binary = ffmpeg_binary
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                return index['videos']
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".json", dir=os.path.dirname(os.path.abspath(self.index_path)))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({'version': INDEX_VERSION, 'videos': self.entries}, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self):
+        """
+        Probes new and changed videos and drops deleted ones. Unchanged files are not touched.
+        Returns the number of files probed.
+        """
+        found = {}
+        if os.path.isdir(self.video_dir):
+            for name in sorted(os.listdir(self.video_dir)):
+                if name.startswith(".") or not name.lower().endswith(VIDEO_EXTENSIONS): continue
+                stat = os.stat(os.path.join(self.video_dir, name))
+                found[name] = (stat.st_size, stat.st_mtime_ns)
+
+        probed = 0
+        changed = set(self.entries) - set(found)  # Deleted videos
+        for name in changed:
+            self._remove_proxy(self.entries.pop(name))
+        for name, (size, mtime_ns) in found.items():
+            entry = self.entries.get(name)
+            if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns: continue
+            if entry:
+                self._remove_proxy(entry)  # Built from the old version of the file
+            try:
+                info = probe_video(self.ffmpeg_binary, os.path.join(self.video_dir, name))
+            except Exception as e:
+                print(f"Warning: Skipping background video '{name}': {e}")
+                if self.entries.pop(name, None):
+                    changed.add(name)
+                continue
+            self.entries[name] = {'size': size, 'mtime_ns': mtime_ns, **info}
+            changed.add(name)
+            probed += 1
+        if changed:
+            self._save()
+            print(f"Background library: indexed {probed} new/changed video(s), {len(self.entries)} total")
+        return probed
+
+    def _proxy_path(self, proxy):
+        return os.path.join(self.proxy_dir, proxy['file'])
+
+    def _remove_proxy(self, entry):
+        proxy = entry.pop('proxy', None)
+        if proxy and os.path.exists(self._proxy_path(proxy)):
+            os.remove(self._proxy_path(proxy))
+
+    def conform(self, width, height, fps, gop_seconds=1.0, crf=18, preset="veryfast"):
+        """
+        Makes a proxy of every indexed video that doesn't have one for these settings yet: center-cropped and
+        scaled to width x height, at fps (None: each video's own fps), without audio and with a keyframe every
+        gop_seconds. Returns the number of proxies built.
+        """
+        settings = {'width': width, 'height': height, 'fps': fps, 'gop_seconds': gop_seconds, 'crf': crf}
+        os.makedirs(self.proxy_dir, exist_ok=True)
+        built = 0
+        for name, entry in sorted(self.entries.items()):
+            proxy = entry.get('proxy')
+            if proxy and proxy['settings'] == settings and os.path.exists(self._proxy_path(proxy)): continue
+            self._remove_proxy(entry)
+            clip_fps = fps or entry.get('fps')
+            if not clip_fps:
+                print(f"Warning: Could not conform '{name}': its frame rate is unknown")
+                continue
+            stem = os.path.splitext(name)[0]
+            proxy_file = f"{stem}.{width}x{height}@{clip_fps:g}.mp4"
+            proxy_path = os.path.join(self.proxy_dir, proxy_file)
+            tmp_path = os.path.join(self.proxy_dir, f".{proxy_file}.tmp.mp4")
+            gop = max(1, round(clip_fps * gop_seconds))
+            print(f"Conforming background '{name}' to {width}x{height} @ {clip_fps:g} fps...")
+            try:
+                subprocess.run(
+                    [self.ffmpeg_binary, "-y", "-loglevel", "error", "-i", os.path.join(self.video_dir, name),
+                     "-map", "0:v:0", "-an",
+                     "-vf", f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1,fps={clip_fps:g}",
+                     "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+                     "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+                     "-movflags", "+faststart", tmp_path],
+                    check=True, capture_output=True, text=True,
+                )
+                os.replace(tmp_path, proxy_path)
+                info = probe_video(self.ffmpeg_binary, proxy_path)
+            except (subprocess.CalledProcessError, RuntimeError) as e:
+                print(f"Warning: Could not conform '{name}': {getattr(e, 'stderr', None) or e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                continue
+            entry['proxy'] = {'file': proxy_file, 'settings': settings, **info}
+            self._save()  # After each proxy, so an interrupted conform keeps what it finished
+            built += 1
+        return built
+
+    def info(self, path):
+        """
+        Returns the index entry for a video in this library, or for one of its proxies
+        (None when it isn't indexed or has changed).
+        """
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.proxy_dir):
+            for entry in self.entries.values():
+                proxy = entry.get('proxy')
+                if proxy and proxy['file'] == os.path.basename(path) and os.path.exists(path):
+                    return proxy
+            return None
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.video_dir):
+            return None
+        entry = self.entries.get(os.path.basename(path))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            return None
+        return entry
+
+    def pick_segment(self, duration, seed=None, proxies=False):
+        """
+        Picks a (video path, start time) whose segment covers duration seconds, starting on a keyframe.
+        Every fitting (video, keyframe) pair is equally likely. When no video is long enough, the longest
+        one is used from its start. With proxies=True, conformed proxies are used where they exist.
+        Returns None when the library is empty.
+        """
+        if not self.entries:
+            return None
+        sources = {}
+        for name, entry in sorted(self.entries.items()):
+            if proxies and entry.get('proxy'):
+                sources[name] = (self._proxy_path(entry['proxy']), entry['proxy'])
+            else:
+                sources[name] = (os.path.join(self.video_dir, name), entry)
+        candidates = [
+            (path, start) for path, info in sources.values()
+            for start in info['keyframes'] if start + duration <= info['duration']
+        ]
+        if not candidates:
+            path, info = max(sources.values(), key=lambda source: source[1]['duration'])
+            print(f"Warning: No background video covers {duration:.2f}s; using the longest ({os.path.basename(path)}).")
+            return path, 0.0
+        return random.Random(seed).choice(candidates)
@@ -0,0 +1,317 @@
+# Batch mode: runs many story ideas through a staged, concurrent pipeline
+# Each idea becomes a job with its own working directory. Jobs flow through four stages connected by
+# bounded queues, so every stage works on a different job at the same time:
+#   script (local LLM, threads sharing one backend) -> TTS (OpenAI, threads) -> timestamps (Whisper, processes with a warm model each)
+#   -> render (moviepy/ffmpeg, processes)
+#
+# Usage: python batch.py ideas.jsonl --output-dir batch_output
+#   ideas.jsonl: one {"id": "...", "idea": "..."} object (or a plain JSON string) per line
+#   ideas.csv:   a header row with an "idea" column and an optional "id" column
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+
+BATCH_OUTPUT_DIR = "batch_output"
+BATCH_QUEUE_SIZE = 2  # Max jobs waiting between two stages (backpressure for the faster stages)
+BATCH_SCRIPT_WORKERS = 4  # Threads waiting on script requests; the requests share main.LLM_MAX_CONCURRENCY
+BATCH_TTS_WORKERS = 4
+BATCH_TIMESTAMP_WORKERS = 1  # Processes, each holding its own Whisper model
+BATCH_RENDER_WORKERS = 2  # Processes
+
+_STOP = object()  # Queue sentinel: no more jobs for this stage
+
+
+# --- Input ---
+def read_ideas(path):
+    """Reads ideas from a JSONL or CSV file. Returns a list of {'id', 'idea'} dicts."""
+    ideas = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("idea", "").strip():
+                    ideas.append({'id': row.get("id"), 'idea': row["idea"].strip()})
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip(): continue
+                record = json.loads(line)
+                if isinstance(record, str):
+                    record = {'idea': record}
+                if record.get('idea', "").strip():
+                    ideas.append({'id': record.get('id'), 'idea': record['idea'].strip()})
+
+    used = set()
+    for i, idea in enumerate(ideas):
+        job_id = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(idea['id'] or f"job_{i + 1:04d}"))
+        while job_id in used:
+            job_id += "_dup"
+        used.add(job_id)
+        idea['id'] = job_id
+    return ideas
+
+
+# --- Process pool tasks (must be module-level to be picklable) ---
+def _init_timestamp_worker():
+    """
+    Loads the Whisper model once per worker process so every job in it reuses the warm model. Long audio
+    is transcribed in the worker too (LONG_AUDIO_WORKERS = 1): a transcription pool per worker would hold
+    another LONG_AUDIO_WORKERS models each, while the timestamp workers already use the cores.
+    """
+    main.LONG_AUDIO_WORKERS = 1
+    main.get_whisper_model()
+
+
+def _timestamps_task(audio_path, script_text):
+    return main.get_word_timestamps(audio_path, script_text=script_text)
+
+
+def _render_task(background_video_path, audio_path, segments, output_path, background_start=0.0):
+    return main.create_video(background_video_path, audio_path, segments, output_path, background_start)
+
+
+# --- Stage functions: take a job dict, fill in its outputs, raise on failure ---
+# Outputs go through the artifact cache, so finished stages are skipped when a batch is rerun.
+def _script_stage(job, options):
+    def produce(path):
+        script = main.generate_script(job['idea'], model_name=options['llm_model'])
+        if not script:
+            return False
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(script)
+        return True
+
+    job['script_path'] = os.path.join(job['dir'], "script.txt")
+    ok, job['cached']['script'] = main.run_cached_stage(
+        options['cache'], "script", main.script_cache_key(job['idea'], options['llm_model']), job['script_path'],
+        produce, options['force_stages'])
+    if not ok:
+        raise RuntimeError("Script generation failed")
+    with open(job['script_path'], encoding="utf-8") as f:
+        job['script'] = f.read()
+
+
+def _tts_stage(job, options):
+    job['audio_path'] = os.path.join(job['dir'], "narration.wav")
+    ok, job['cached']['audio'] = main.run_cached_stage(
+        options['cache'], "audio", main.audio_cache_key(job['script']), job['audio_path'],
+        lambda path: main.generate_audio_openai(job['script'], path), options['force_stages'])
+    if not ok:
+        raise RuntimeError("TTS generation failed")
+
+
+def _timestamps_stage(job, options):
+    def produce(path):
+        segments = options['timestamp_pool'].submit(_timestamps_task, job['audio_path'], job['script']).result()
+        if not segments:
+            return False
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(segments, f, ensure_ascii=False)
+        return True
+
+    segments_path = os.path.join(job['dir'], "segments.json")
+    ok, job['cached']['timestamps'] = main.run_cached_stage(
+        options['cache'], "timestamps", main.timestamps_cache_key(job['audio_path'], job['script']), segments_path,
+        produce, options['force_stages'])
+    if not ok:
+        raise RuntimeError("Timestamp generation failed")
+    with open(segments_path, encoding="utf-8") as f:
+        job['segments'] = json.load(f)
+
+
+def _render_stage(job, options):
+    job['video_path'] = os.path.join(job['dir'], "video.mp4")
+    if options['background']:
+        job['background'], job['background_start'] = options['background'], 0.0
+    else:
+        with options['background_lock']:  # The library index is shared by all render threads
+            job['background'], job['background_start'] = main.select_background(job['audio_path'])
+    key = main.video_cache_key(job['audio_path'], job['segments'], job['background'], job['background_start'])
+    ok, job['cached']['video'] = main.run_cached_stage(
+        options['cache'], "video", key, job['video_path'],
+        lambda path: options['render_pool'].submit(
+            _render_task, job['background'], job['audio_path'], job['segments'], path, job['background_start']).result(),
+        options['force_stages'])
+    if not ok:
+        raise RuntimeError("Video generation failed")
+
+
+STAGES = [
+    ("script", _script_stage, "script_workers"),
+    ("tts", _tts_stage, "tts_workers"),
+    ("timestamps", _timestamps_stage, "timestamp_workers"),
+    ("render", _render_stage, "render_workers"),
+]
+
+
+# --- Pipeline ---
+class BatchPipeline:
+    """Runs jobs through the stages with bounded queues; collects one result record per job."""
+
+    def __init__(self, options):
+        self.options = options
+        self.results = []
+        self._lock = threading.Lock()
+        self._queues = [queue.Queue(maxsize=options['queue_size']) for _ in STAGES]
+        self._workers_left = [options[count_key] for _, _, count_key in STAGES]
+
+    def _finish(self, job, error=None, stage=None):
+        result = {
+            'id': job['id'],
+            'idea': job['idea'],
+            'status': "failed" if error else "done",
+            'failed_stage': stage,
+            'error': error,
+            'dir': job['dir'],
+            'video_path': job.get('video_path') if not error else None,
+            'background': job.get('background'),
+            'background_start': job.get('background_start'),
+            'stage_seconds': job['stage_seconds'],
+            'cached': job['cached'],
+        }
+        with self._lock:
+            self.results.append(result)
+            with open(os.path.join(self.options['output_dir'], "batch_results.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(result) + "\n")
+        print(f"[batch] Job {job['id']}: {result['status']}" + (f" at {stage} ({error})" if error else ""))
+
+    def _stage_worker(self, index):
+        name, func, _ = STAGES[index]
+        inbox = self._queues[index]
+        outbox = self._queues[index + 1] if index + 1 < len(STAGES) else None
+        while True:
+            job = inbox.get()
+            if job is _STOP:
+                break
+            print(f"[batch] {name}: starting job {job['id']}")
+            started = time.perf_counter()
+            try:
+                func(job, self.options)
+            except Exception as e:
+                job['stage_seconds'][name] = round(time.perf_counter() - started, 3)
+                self._finish(job, error=str(e) or traceback.format_exc(limit=1), stage=name)
+                continue
+            job['stage_seconds'][name] = round(time.perf_counter() - started, 3)
+            if outbox is None:
+                self._finish(job)
+            else:
+                outbox.put(job)  # Blocks while the next stage is full
+
+        # The last worker of this stage tells every worker of the next stage to stop
+        with self._lock:
+            self._workers_left[index] -= 1
+            last = self._workers_left[index] == 0
+        if last and outbox is not None:
+            for _ in range(self.options[STAGES[index + 1][2]]):
+                outbox.put(_STOP)
+
+    def run(self, ideas):
+        open(os.path.join(self.options['output_dir'], "batch_results.jsonl"), "w").close()
+        threads = []
+        for index, (name, _, count_key) in enumerate(STAGES):
+            for n in range(self.options[count_key]):
+                thread = threading.Thread(target=self._stage_worker, args=(index,), name=f"{name}-{n}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for idea in ideas:
+            job_dir = os.path.join(self.options['output_dir'], idea['id'])
+            os.makedirs(job_dir, exist_ok=True)
+            self._queues[0].put({'id': idea['id'], 'idea': idea['idea'], 'dir': job_dir, 'stage_seconds': {}, 'cached': {}})
+        for _ in range(self.options[STAGES[0][2]]):
+            self._queues[0].put(_STOP)
+
+        for thread in threads:
+            thread.join()
+        return self.results
+
+
+def run_batch(ideas, output_dir=BATCH_OUTPUT_DIR, background=None, llm_model=None,
+              queue_size=BATCH_QUEUE_SIZE, script_workers=BATCH_SCRIPT_WORKERS, tts_workers=BATCH_TTS_WORKERS,
+              timestamp_workers=BATCH_TIMESTAMP_WORKERS, render_workers=BATCH_RENDER_WORKERS,
+              use_cache=True, force_stages=()):
+    """Runs all ideas through the pipeline. Returns the per-job result records."""
+    os.makedirs(output_dir, exist_ok=True)
+    cache = None
+    if use_cache and main.ARTIFACT_CACHE_ENABLED:
+        cache = main.artifact_cache.ArtifactCache(main.ARTIFACT_CACHE_DIR, max_bytes=main.ARTIFACT_CACHE_MAX_BYTES)
+    # Spawned (not forked) workers: torch and ffmpeg readers don't survive a fork of a threaded process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(timestamp_workers, mp_context=context, initializer=_init_timestamp_worker) as timestamp_pool, \
+         ProcessPoolExecutor(render_workers, mp_context=context) as render_pool:
+        options = {
+            'output_dir': output_dir,
+            'background': background,  # None: each job picks a segment with main.select_background
+            'background_lock': threading.Lock(),
+            'llm_model': llm_model or main.llm_model(),
+            'queue_size': queue_size,
+            'script_workers': script_workers,
+            'tts_workers': tts_workers,
+            'timestamp_workers': timestamp_workers,
+            'render_workers': render_workers,
+            'timestamp_pool': timestamp_pool,
+            'render_pool': render_pool,
+            'cache': cache,
+            'force_stages': list(force_stages),
+        }
+        return BatchPipeline(options).run(ideas)
+
+
+def main_batch(argv=None):
+    parser = argparse.ArgumentParser(description="Generate videos for many story ideas concurrently.")
+    parser.add_argument("ideas", help="JSONL or CSV file with story ideas")
+    parser.add_argument("--output-dir", default=BATCH_OUTPUT_DIR, help="Folder for per-job working directories")
+    parser.add_argument("--background", help="Background video file (default: pick per job as configured in main.py)")
+    parser.add_argument("--llm-model", "--ollama-model", dest="llm_model",
+                        help="Model for the scripts (default: the LOCAL_LLM_PROVIDER model from main.py)")
+    parser.add_argument("--queue-size", type=int, default=BATCH_QUEUE_SIZE)
+    parser.add_argument("--script-workers", type=int, default=BATCH_SCRIPT_WORKERS)
+    parser.add_argument("--tts-workers", type=int, default=BATCH_TTS_WORKERS)
+    parser.add_argument("--timestamp-workers", type=int, default=BATCH_TIMESTAMP_WORKERS)
+    parser.add_argument("--render-workers", type=int, default=BATCH_RENDER_WORKERS)
+    parser.add_argument("--force-stage", action="append", default=[], choices=main.PIPELINE_STAGES + ["all"],
+                        help="Run this stage again even if its output is cached (repeatable)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the artifact cache")
+    args = parser.parse_args(argv)
+    main.configure()
+
+    if args.background and not os.path.exists(args.background):
+        print(f"Error: Background video not found at '{args.background}'.")
+        return 1
+    ideas = read_ideas(args.ideas)
+    if not ideas:
+        print(f"Error: No ideas found in {args.ideas}")
+        return 1
+
+    print(f"Starting batch of {len(ideas)} ideas...")
+    started = time.perf_counter()
+    results = run_batch(
+        ideas, output_dir=args.output_dir, background=args.background, llm_model=args.llm_model,
+        queue_size=args.queue_size, script_workers=args.script_workers, tts_workers=args.tts_workers,
+        timestamp_workers=args.timestamp_workers, render_workers=args.render_workers,
+        use_cache=not args.no_cache, force_stages=args.force_stage,
+    )
+    elapsed = time.perf_counter() - started
+
+    print("\n--- Batch Summary ---")
+    done = [r for r in results if r['status'] == "done"]
+    for result in sorted(results, key=lambda r: r['id']):
+        detail = result['video_path'] if result['status'] == "done" else f"{result['failed_stage']}: {result['error']}"
+        print(f"{result['id']}: {result['status']} - {detail}")
+    print(f"{len(done)}/{len(results)} videos generated in {elapsed:.1f}s")
+    print(f"Results saved to {os.path.join(args.output_dir, 'batch_results.jsonl')}")
+    return 0 if len(done) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_batch())
@@ -0,0 +1,86 @@
+# Benchmark: background library indexing and keyframe-aligned seeking
+# Generates a few synthetic lavfi videos, then measures a cold index build, a warm refresh (nothing changed),
+# a refresh after one file changed, and how long moviepy takes to deliver the first frame when a segment
+# starts on a keyframe versus between keyframes.
+#
+# Usage: python benchmarks/bench_background_library.py --videos 4 --seconds 60 --gop 120
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moviepy.config import get_setting
+from moviepy.editor import VideoFileClip
+
+import background_library
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def first_frame_seconds(path, start):
+    def read():
+        clip = VideoFileClip(path)
+        try:
+            clip.subclip(start).get_frame(0)
+        finally:
+            clip.close()
+    return timed(read)[1]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark the background library index and segment seeking.")
+    parser.add_argument("--videos", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=60.0, help="Length of each synthetic video")
+    parser.add_argument("--gop", type=int, default=120, help="Keyframe interval in frames (30 fps)")
+    parser.add_argument("--audio-seconds", type=float, default=20.0, help="Narration length to pick a segment for")
+    args = parser.parse_args()
+
+    ffmpeg = get_setting("FFMPEG_BINARY")
+    work_dir = tempfile.mkdtemp(prefix="bench_background_")
+    try:
+        for i in range(args.videos):
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi",
+                            "-i", "testsrc2=size=540x960:rate=30", "-t", str(args.seconds), "-c:v", "libx264",
+                            "-g", str(args.gop), "-keyint_min", str(args.gop), "-sc_threshold", "0",
+                            "-pix_fmt", "yuv420p", os.path.join(work_dir, f"background_{i + 1}.mp4")], check=True)
+
+        library = background_library.BackgroundLibrary(work_dir, ffmpeg_binary=ffmpeg)
+        probed_cold, cold = timed(library.refresh)
+        warm_library = background_library.BackgroundLibrary(work_dir, ffmpeg_binary=ffmpeg)
+        probed_warm, warm = timed(warm_library.refresh)
+        os.utime(os.path.join(work_dir, "background_1.mp4"))
+        probed_changed, changed = timed(warm_library.refresh)
+
+        path, start = warm_library.pick_segment(args.audio_seconds, seed=1)
+        entry = warm_library.info(path)
+        keyframes = entry['keyframes']
+        # The worst case for an unaligned start: just before the next keyframe
+        between = next((k for k in keyframes if k > start), entry['duration']) - 1 / (entry['fps'] or 30)
+        keyframe_seek = first_frame_seconds(path, start)
+        between_seek = first_frame_seconds(path, between)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n--- Background Library Benchmark ---")
+    print(f"Library: {args.videos} videos x {args.seconds:.0f}s, keyframe every {args.gop} frames")
+    print(f"Cold index:          {cold * 1000:>8.1f} ms ({probed_cold} probed)")
+    print(f"Warm refresh:        {warm * 1000:>8.1f} ms ({probed_warm} probed)")
+    print(f"Refresh, 1 changed:  {changed * 1000:>8.1f} ms ({probed_changed} probed)")
+    print(f"Picked {os.path.basename(path)} from {start:.2f}s ({len(keyframes)} keyframes, "
+          f"{entry['width']}x{entry['height']} {entry['codec']} @ {entry['fps']} fps)")
+    print(f"First frame at keyframe {start:.2f}s:  {keyframe_seek * 1000:>7.1f} ms")
+    print(f"First frame at {between:.2f}s (between): {between_seek * 1000:>7.1f} ms")
+    return 0 if probed_warm == 0 and probed_changed == 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,90 @@
+# Benchmark: rendering from raw backgrounds vs pre-conformed proxies
+# Generates a synthetic lavfi background in a typical raw format (landscape, 60 fps, long GOP), conforms it
+# once to the vertical output format, then renders the same narration and captions from a segment of the raw
+# file (scaled/cropped/resampled per frame) and from the proxy, with both render backends.
+#
+# Usage: python benchmarks/bench_background_proxies.py --seconds 10 --size 540x960
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from bench_render_backends import make_segments
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare render time with raw vs conformed backgrounds.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Narration length")
+    parser.add_argument("--raw-size", default="1920x1080", help="Raw background size")
+    parser.add_argument("--raw-fps", type=int, default=60)
+    parser.add_argument("--raw-seconds", type=float, default=60.0, help="Raw background length")
+    parser.add_argument("--size", default="540x960", help="Output size (width x height)")
+    parser.add_argument("--fps", type=int, default=30, help="Output fps")
+    parser.add_argument("--backends", default="moviepy,ffmpeg")
+    args = parser.parse_args()
+
+    ffmpeg = main.ffmpeg_binary()
+    width, height = (int(v) for v in args.size.split("x"))
+    work_dir = tempfile.mkdtemp(prefix="bench_proxies_")
+    results = []
+    try:
+        library_dir = os.path.join(work_dir, "library")
+        os.makedirs(library_dir)
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", f"testsrc2=size={args.raw_size}:rate={args.raw_fps}", "-t", str(args.raw_seconds),
+                        "-c:v", "libx264", "-g", str(args.raw_fps * 10), "-pix_fmt", "yuv420p",
+                        os.path.join(library_dir, "raw.mp4")], check=True)
+        audio = os.path.join(work_dir, "narration.mp3")
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", f"sine=frequency=220:duration={args.seconds}", audio], check=True)
+        segments = make_segments(args.seconds)
+
+        main.BACKGROUND_VIDEO_DIR = library_dir
+        main.BACKGROUND_INDEX_PATH = os.path.join(library_dir, ".background_index.json")
+        main.BACKGROUND_PROXY_DIR = os.path.join(library_dir, ".proxies")
+        main.OUTPUT_SIZE, main.OUTPUT_FPS = (width, height), args.fps
+        library = main.get_background_library()  # Index only (BACKGROUND_PROXIES is off)
+        start = time.perf_counter()
+        library.conform(width, height, args.fps, main.BACKGROUND_PROXY_GOP_SECONDS)
+        conform_seconds = time.perf_counter() - start
+
+        for proxies in (False, True):
+            path, segment_start = library.pick_segment(args.seconds, seed=7, proxies=proxies)
+            for backend in args.backends.split(","):
+                main.RENDER_BACKEND = backend
+                output = os.path.join(work_dir, f"{backend}_{'proxy' if proxies else 'raw'}.mp4")
+                start = time.perf_counter()
+                ok = main.create_video(path, audio, segments, output, background_start=segment_start)
+                elapsed = time.perf_counter() - start
+                info = ffmpeg_parse_infos(output) if ok else {}
+                results.append((backend, "proxy" if proxies else "raw", ok, elapsed, segment_start,
+                                info.get('video_size'), info.get('video_fps')))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n--- Background Proxy Benchmark ---")
+    print(f"Raw background: {args.raw_size} @ {args.raw_fps} fps, {args.raw_seconds:.0f}s; output {args.size} @ {args.fps} fps, "
+          f"{args.seconds:.0f}s narration")
+    print(f"One-time conform: {conform_seconds:.2f}s")
+    print(f"{'backend':<8} {'source':<6} {'start':>7} {'render':>8}  output")
+    for backend, source, ok, elapsed, segment_start, size, fps in results:
+        status = f"{size[0]}x{size[1]} @ {fps:g} fps" if ok else "FAILED"
+        print(f"{backend:<8} {source:<6} {segment_start:>6.2f}s {elapsed:>7.2f}s  {status}")
+    for backend in args.backends.split(","):
+        times = {source: elapsed for b, source, ok, elapsed, *_ in results if b == backend and ok}
+        if len(times) == 2:
+            print(f"{backend}: x{times['raw'] / times['proxy']:.2f} faster from the proxy")
+    ok = all(r[2] and tuple(r[5]) == (width, height) for r in results)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,75 @@
+# Benchmark: batch pipeline against local stub LLM/TTS servers
+# Starts the stub Ollama and speech servers, generates a lavfi background and runs N ideas through batch.py.
+# Whisper runs for real (the model must be available locally).
+#
+# Usage: python benchmarks/bench_batch.py --jobs 6 --llm-delay 2 --tts-delay 1
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubOllamaServer, StubSpeechServer
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Run the batch pipeline against stub servers.")
+    parser.add_argument("--jobs", type=int, default=6, help="Number of story ideas")
+    parser.add_argument("--llm-delay", type=float, default=2.0, help="Stub LLM latency (s)")
+    parser.add_argument("--tts-delay", type=float, default=1.0, help="Stub TTS latency (s)")
+    parser.add_argument("--render-workers", type=int, default=2)
+    parser.add_argument("--timestamp-workers", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="Keep the output folder")
+    args = parser.parse_args()
+
+    with StubOllamaServer(delay=args.llm_delay) as llm, StubSpeechServer(delay=args.tts_delay) as tts:
+        # Must be set before main is imported: the ollama and openai clients read them at creation
+        os.environ["OLLAMA_HOST"] = llm.url
+        os.environ["OPENAI_BASE_URL"] = tts.base_url
+        os.environ["OPENAI_API_KEY"] = "stub"
+        import batch
+        import main
+
+        work_dir = tempfile.mkdtemp(prefix="bench_batch_")
+        background = os.path.join(work_dir, "background.mp4")
+        subprocess.run([main.ffmpeg_binary(), "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", "testsrc2=size=540x960:rate=30", "-t", "30",
+                        "-c:v", "libx264", "-pix_fmt", "yuv420p", background], check=True)
+        ideas_path = os.path.join(work_dir, "ideas.jsonl")
+        with open(ideas_path, "w", encoding="utf-8") as f:
+            for i in range(args.jobs):
+                f.write(json.dumps({'id': f"idea_{i + 1}", 'idea': f"Synthetic story idea number {i + 1}"}) + "\n")
+
+        started = time.perf_counter()
+        results = batch.run_batch(
+            batch.read_ideas(ideas_path), output_dir=os.path.join(work_dir, "out"), background=background,
+            timestamp_workers=args.timestamp_workers, render_workers=args.render_workers,
+        )
+        elapsed = time.perf_counter() - started
+
+    print("\n--- Batch Pipeline Benchmark ---")
+    stage_totals = {}
+    for result in results:
+        for stage, seconds in result['stage_seconds'].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    serial = sum(stage_totals.values())
+    done = sum(1 for r in results if r['status'] == "done")
+    for stage, seconds in stage_totals.items():
+        print(f"{stage:<12} {seconds:>8.2f}s total across jobs")
+    print(f"Jobs: {done}/{len(results)} done")
+    print(f"Wall time: {elapsed:.2f}s (sum of stage times {serial:.2f}s, overlap x{serial / max(elapsed, 1e-9):.2f})")
+    if args.keep:
+        print(f"Outputs kept in {work_dir}")
+    else:
+        import shutil
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0 if done == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
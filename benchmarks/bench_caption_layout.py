@@ -0,0 +1,119 @@
+# Benchmark: caption layout planning
+# Plans the caption timeline of synthetic transcripts (50 to 5000 words, with some very long words mixed in)
+# with the "fit" layout and compares it with the fixed 3-word grouping: planning time with cold and warm glyph
+# metrics, how many captions would be wider than the frame, and how many are faster to read than CAPTION_MAX_CPS
+# (the synthetic speech runs at about that speed throughout, so some always are). Then rasterizes every planned
+# caption and checks that the metric-based widths agree with the real bitmaps and that no caption overflows.
+#
+# Usage: python benchmarks/bench_caption_layout.py --width 540 --words 50 500 5000
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import make_segments, make_words
+
+LONG_WORDS = ["Incomprehensibilities", "Counterrevolutionaries", "Uncharacteristically", "Telecommunications"]
+
+
+def with_long_words(words, every=40):
+    """Replaces every `every`-th word with a word too long for a large single-word caption."""
+    return [LONG_WORDS[(i // every) % len(LONG_WORDS)] if i % every == every - 1 else word
+            for i, word in enumerate(words)]
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Measure caption layout planning and check that the captions fit.")
+    parser.add_argument("--width", type=int, default=540, help="Frame width the captions must fit")
+    parser.add_argument("--words", type=int, nargs="+", default=[50, 500, 5000], help="Transcript sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    import caption_layout
+    import caption_raster
+    import main
+    main.configure(["METRICS_ENABLED=False"])
+    main.report_progress = lambda *_: None
+    font_path = caption_raster.resolve_font_path(main.CAPTION_FONT, main.CAPTION_FONT_PATH)
+    max_width = main.CAPTION_MAX_WIDTH * args.width
+    stroke = main.CAPTION_STROKE_WIDTH
+    import builtins
+    quiet = lambda fn: (lambda: _silenced(builtins, fn))
+
+    rows, planned = [], {}
+    for num_words in args.words:
+        segments = make_segments(with_long_words(make_words(num_words)))
+        duration = segments[-1]['end'] + 1.0
+        for grouping in (True, False):
+            mode = "grouped" if grouping else "single"
+            main.CAPTION_LAYOUT = "fixed"
+            fixed_seconds = best_of(args.repeat, quiet(lambda: main.build_caption_cues(segments, duration, grouping)))
+            fixed = _silenced(builtins, lambda: main.build_caption_cues(segments, duration, grouping))
+            main.CAPTION_LAYOUT = "fit"
+            caption_layout.get_metrics.cache_clear()
+            cold_seconds = best_of(1, quiet(lambda: main.build_caption_cues(segments, duration, grouping, args.width)))
+            warm_seconds = best_of(args.repeat, quiet(lambda: main.build_caption_cues(segments, duration, grouping, args.width)))
+            fit = _silenced(builtins, lambda: main.build_caption_cues(segments, duration, grouping, args.width))
+            metrics = caption_layout.get_metrics(font_path)
+            fixed_overflow = sum(1 for cue in fixed
+                                 if metrics.text_width(cue['text'], cue['fontsize']) + 4 * stroke > max_width)
+            planned[(num_words, mode)] = fit
+            rows.append((num_words, mode, fixed_seconds, len(fixed), fixed_overflow, cold_seconds, warm_seconds, fit))
+
+    # Metric widths against the real bitmaps, for every distinct caption of the largest transcript
+    errors, overflow = [], 0
+    for (num_words, mode), cues in planned.items():
+        if num_words != max(args.words):
+            continue
+        metrics = caption_layout.get_metrics(font_path)
+        for text, fontsize in dict.fromkeys((cue['text'], cue['fontsize']) for cue in cues):
+            image = caption_raster.rasterize_caption(text, font_path, fontsize, main.CAPTION_COLOR,
+                                                     main.CAPTION_STROKE_COLOR, stroke)
+            estimate = max(metrics.text_width(line, fontsize) for line in text.split("\n")) + 4 * stroke
+            errors.append(abs(image.shape[1] - estimate) / image.shape[1])
+            overflow += image.shape[1] > args.width
+
+    print("\n--- Caption Layout Benchmark ---")
+    print(f"Frame width {args.width}px (captions up to {max_width:.0f}px), font {os.path.basename(font_path)}")
+    print(f"{'words':>6} {'mode':<8} {'fixed':>9} {'cues':>5} {'too wide':>8} | {'fit cold':>9} {'fit warm':>9} "
+          f"{'cues':>5} {'wrapped':>7} {'shrunk':>6} {'max cps':>7} {'over ' + format(main.CAPTION_MAX_CPS, 'g') + ' cps':>11}")
+    for num_words, mode, fixed_seconds, fixed_cues, fixed_overflow, cold, warm, fit in rows:
+        base = main.MULTI_CAPTION_FONTSIZE if mode == "grouped" else main.SINGLE_CAPTION_FONTSIZE
+        print(f"{num_words:>6} {mode:<8} {fixed_seconds * 1000:>7.2f}ms {fixed_cues:>5} {fixed_overflow:>8} | "
+              f"{cold * 1000:>7.2f}ms {warm * 1000:>7.2f}ms {len(fit):>5} "
+              f"{sum(cue['lines'] > 1 for cue in fit):>7} {sum(cue['fontsize'] < base for cue in fit):>6} "
+              f"{max(cue['cps'] or 0 for cue in fit):>7.1f} {sum((cue['cps'] or 0) > main.CAPTION_MAX_CPS + 0.05 for cue in fit):>11}")
+    print(f"Metric width vs rasterized width over {len(errors)} captions: median error "
+          f"{statistics.median(errors) * 100:.1f}%, worst {max(errors) * 100:.1f}%; "
+          f"{overflow} planned captions wider than the frame")
+    largest = [row for row in rows if row[0] == max(args.words)]
+    print(f"Planning {max(args.words)} words: " + ", ".join(f"{mode} {warm * 1000:.1f} ms" for _, mode, _, _, _, _, warm, _ in largest))
+    return 0 if overflow == 0 else 1
+
+
+def _silenced(builtins, fn):
+    """Runs fn without its progress prints."""
+    original = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        return fn()
+    finally:
+        builtins.print = original
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,80 @@
+# Benchmark: caption clip creation with ImageMagick (moviepy TextClip) vs the in-process Pillow rasterizer
+# Renders the same story-like word sequence with each path, in both caption modes.
+#
+# Usage: python benchmarks/bench_captions.py --words 300
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import caption_raster
+
+# Small vocabulary so common words repeat the way they do in real scripts
+SAMPLE_TEXT = (
+    "I found my sister's secret bank account and the numbers did not make sense. "
+    "She said our uncle left her nothing, but then I saw the letter on the table. "
+    "Was I wrong to read it? What would you have done if it was your family?"
+)
+
+
+def make_captions(num_words, grouping, seed=0):
+    """Builds the caption texts create_video would render for a story of num_words words."""
+    vocab = SAMPLE_TEXT.split()
+    rng = random.Random(seed)
+    words = [rng.choice(vocab) for _ in range(num_words)]
+    if not grouping:
+        return words, main.SINGLE_CAPTION_FONTSIZE
+    return [" ".join(words[i:i + 3]) for i in range(0, len(words), 3)], main.MULTI_CAPTION_FONTSIZE
+
+
+def time_renderer(renderer, texts, fontsize):
+    main.CAPTION_RENDERER = renderer
+    start = time.perf_counter()
+    for text in texts:
+        main.make_caption_clip(text, fontsize).close()
+    return time.perf_counter() - start
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark ImageMagick vs Pillow caption rendering.")
+    parser.add_argument("--words", type=int, default=300, help="Number of words in the synthetic story")
+    parser.add_argument("--skip-imagemagick", action="store_true", help="Only benchmark the Pillow renderer")
+    args = parser.parse_args()
+
+    print(f"\n--- Caption Rendering Benchmark ({args.words} words) ---")
+    print(f"{'mode':<8} {'renderer':<22} {'captions':>9} {'total (s)':>10} {'per caption (ms)':>17}")
+    for grouping in (True, False):
+        texts, fontsize = make_captions(args.words, grouping)
+        mode = "grouped" if grouping else "single"
+        rows = []
+
+        if not args.skip_imagemagick:
+            try:
+                rows.append(("imagemagick", time_renderer("imagemagick", texts, fontsize)))
+            except Exception as e:
+                print(f"ImageMagick renderer unavailable, skipping: {e}")
+
+        # Fresh memory cache: repeated words are still only rasterized once
+        main._CAPTION_CACHE = caption_raster.CaptionCache(max_bytes=main.CAPTION_CACHE_MAX_BYTES)
+        rows.append(("pillow (cold)", time_renderer("pillow", texts, fontsize)))
+        rows.append(("pillow (warm memory)", time_renderer("pillow", texts, fontsize)))
+
+        # Disk cache populated by a previous process, empty memory cache
+        with tempfile.TemporaryDirectory() as cache_dir:
+            main._CAPTION_CACHE = caption_raster.CaptionCache(cache_dir=cache_dir)
+            time_renderer("pillow", texts, fontsize)
+            main._CAPTION_CACHE = caption_raster.CaptionCache(cache_dir=cache_dir)
+            rows.append(("pillow (warm disk)", time_renderer("pillow", texts, fontsize)))
+
+        for renderer, seconds in rows:
+            print(f"{mode:<8} {renderer:<22} {len(texts):>9} {seconds:>10.3f} {seconds / len(texts) * 1000:>17.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,124 @@
+# Benchmark: chunked parallel rendering vs the single-process moviepy render
+# Renders the same captioned video with the moviepy backend (one process composites and encodes every frame)
+# and with the chunked backend at several worker counts (GOP-aligned time ranges rendered in parallel, joined
+# by stream copy). Checks for seams: every chunked output must have the reference's frame count, and the
+# frames at the part boundaries must be as close to the reference (per-frame PSNR) as the frames in between.
+# Offline: synthetic lavfi background, stub narration and evenly spaced word timestamps, no artifact cache.
+#
+# Usage: python benchmarks/bench_chunked_encode.py --seconds 30 --workers 1 2 4 8
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import SPEECH_SAMPLE_RATE, SPEECH_SECONDS_PER_WORD, STUB_SCRIPT, synth_speech_pcm
+
+BOUNDARY_TOLERANCE_DB = 3.0  # A boundary frame may be this much worse than the median frame before it counts as a seam
+
+
+def make_inputs(ffmpeg, work_dir, seconds):
+    """A synthetic background, a narration of about `seconds` and word timestamps matching it."""
+    import narration_audio
+    words = STUB_SCRIPT.split()
+    words = (words * (int(seconds / (len(words) * SPEECH_SECONDS_PER_WORD)) + 1))[:int(seconds / SPEECH_SECONDS_PER_WORD)]
+    background = os.path.join(work_dir, "background.mp4")
+    subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc2=size=540x960:rate=30",
+                    "-t", str(seconds + 5), "-c:v", "libx264", "-g", "30", "-pix_fmt", "yuv420p", background], check=True)
+    audio = os.path.join(work_dir, "narration.wav")
+    narration = narration_audio.NarrationAudio.from_pcm(synth_speech_pcm(" ".join(words)), SPEECH_SAMPLE_RATE)
+    narration_audio.save(narration, audio, ffmpeg)
+    timed_words = [{'text': word, 'start': i * SPEECH_SECONDS_PER_WORD, 'end': (i + 0.8) * SPEECH_SECONDS_PER_WORD}
+                   for i, word in enumerate(words)]
+    segments = [{'text': " ".join(w['text'] for w in timed_words[i:i + 12]), 'words': timed_words[i:i + 12],
+                 'start': timed_words[i]['start'], 'end': timed_words[min(i + 11, len(timed_words) - 1)]['end']}
+                for i in range(0, len(timed_words), 12)]
+    return background, audio, segments
+
+
+def frame_psnr(ffmpeg, reference, path, stats_path):
+    """Per-frame PSNR (dB, inf for identical frames) of path against reference."""
+    subprocess.run([ffmpeg, "-loglevel", "error", "-i", path, "-i", reference,
+                    "-lavfi", f"[0:v][1:v]psnr=stats_file={stats_path}", "-f", "null", "-"], check=True)
+    values = []
+    with open(stats_path, encoding="utf-8") as f:
+        for line in f:
+            fields = dict(field.split(":", 1) for field in line.split())
+            values.append(float(fields['psnr_avg']))
+    return values
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare chunked parallel rendering with the single-process render.")
+    parser.add_argument("--seconds", type=float, default=30, help="Narration length")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to measure")
+    parser.add_argument("--gop", type=float, default=2.0, help="RENDER_GOP_SECONDS of the chunked renders")
+    parser.add_argument("--preset", default="veryfast", help="libx264 preset of every render")
+    args = parser.parse_args()
+
+    import imageio_ffmpeg
+    import main
+    main.configure(["METRICS_ENABLED=False", f"VIDEO_PRESET={args.preset!r}", f"RENDER_GOP_SECONDS={args.gop!r}"])
+    ffmpeg = main.ffmpeg_binary()
+    work_dir = tempfile.mkdtemp(prefix="bench_chunked_")
+    results = []
+    try:
+        background, audio, segments = make_inputs(ffmpeg, work_dir, args.seconds)
+        reference = os.path.join(work_dir, "single.mp4")
+        print("Rendering with the moviepy backend (single process)...")
+        main.RENDER_BACKEND = "moviepy"
+        started = time.perf_counter()
+        if not main.create_video(background, audio, segments, reference):
+            raise RuntimeError("Single-process render failed")
+        single_seconds = time.perf_counter() - started
+        reference_frames = imageio_ffmpeg.count_frames_and_secs(reference)[0]
+
+        main.RENDER_BACKEND = "chunked"
+        for workers in args.workers:
+            print(f"Rendering with the chunked backend, {workers} worker(s)...")
+            main.RENDER_WORKERS = workers
+            output = os.path.join(work_dir, f"chunked_{workers}.mp4")
+            started = time.perf_counter()
+            if not main.create_video(background, audio, segments, output):
+                raise RuntimeError(f"Chunked render with {workers} worker(s) failed")
+            seconds = time.perf_counter() - started
+            fps = main.background_info(background)['fps']
+            total_frames = int(main.load_narration(audio).duration * fps)
+            ranges = main.chunked_encode.plan_ranges(total_frames, workers, max(1, int(round(args.gop * fps))))
+            psnr = frame_psnr(ffmpeg, reference, output, os.path.join(work_dir, f"psnr_{workers}.log"))
+            finite = [value for value in psnr if value != float("inf")]
+            median = statistics.median(finite) if finite else float("inf")
+            boundary = [psnr[first] for first, _ in ranges[1:] if first < len(psnr)]
+            results.append({
+                'workers': workers, 'parts': len(ranges), 'seconds': seconds,
+                'frames': imageio_ffmpeg.count_frames_and_secs(output)[0], 'median_psnr': median,
+                'boundary_psnr': min(boundary) if boundary else None,
+            })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n--- Chunked Encoding Benchmark ---")
+    print(f"{args.seconds:g}s narration, 540x960, preset '{args.preset}', keyframe every {args.gop:g}s, {os.cpu_count()} CPUs")
+    print(f"moviepy single process: {single_seconds:>7.2f}s  {reference_frames} frames")
+    ok = True
+    for result in results:
+        seamless = result['frames'] == reference_frames and (
+            result['boundary_psnr'] is None or result['boundary_psnr'] >= result['median_psnr'] - BOUNDARY_TOLERANCE_DB)
+        ok = ok and seamless
+        boundary = f"{result['boundary_psnr']:.1f}" if result['boundary_psnr'] is not None else "-"
+        print(f"chunked x{result['workers']:<2} ({result['parts']} parts): {result['seconds']:>7.2f}s "
+              f"(x{single_seconds / result['seconds']:.2f})  {result['frames']} frames  "
+              f"PSNR median {result['median_psnr']:.1f} dB, worst boundary {boundary} dB  "
+              f"{'seamless' if seamless else 'SEAM'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,79 @@
+# Benchmark: per-frame caption compositing cost
+# Compares moviepy's CompositeVideoClip (one layer per caption) with the interval-indexed CaptionOverlay,
+# in both caption modes, and checks that both produce the same frames.
+#
+# Usage: python benchmarks/bench_compositor.py --words 300 --frames 200
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import caption_overlay
+from moviepy.editor import VideoClip, CompositeVideoClip
+
+FRAME_SIZE = (1080, 1920)
+WORD_SECONDS = 0.4  # Spacing of the synthetic words
+
+
+def make_segments(num_words):
+    """Synthetic word timestamps: one word every WORD_SECONDS, split into 10-word segments."""
+    vocab = "I found my sister's secret bank account and the numbers did not make sense".split()
+    words = [{'text': vocab[i % len(vocab)], 'start': round(i * WORD_SECONDS, 2),
+              'end': round(i * WORD_SECONDS + 0.3, 2)} for i in range(num_words)]
+    return [{'id': i // 10, 'words': words[i:i + 10]} for i in range(0, num_words, 10)]
+
+
+def make_background(duration):
+    """Static noise background; frames are read-only like decoder output."""
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, size=(FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+    image.setflags(write=False)
+    return VideoClip(lambda t: image, duration=duration)
+
+
+def time_frames(clip, times):
+    start = time.perf_counter()
+    frames = [clip.get_frame(t) for t in times]
+    return (time.perf_counter() - start) / len(times), frames
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark layered vs overlay caption compositing.")
+    parser.add_argument("--words", type=int, default=300, help="Number of words in the synthetic transcript")
+    parser.add_argument("--frames", type=int, default=200, help="Number of frames to sample")
+    args = parser.parse_args()
+
+    duration = args.words * WORD_SECONDS
+    segments = make_segments(args.words)
+    times = np.linspace(0, duration - 0.01, args.frames)
+
+    print(f"\n--- Caption Compositing Benchmark ({args.words} words, {args.frames} frames) ---")
+    print(f"{'mode':<8} {'compositor':<10} {'cues':>6} {'ms/frame':>10} {'max pixel diff':>15}")
+    for grouping in (True, False):
+        cues = main.build_caption_cues(segments, duration, word_grouping=grouping)
+        background = make_background(duration)
+
+        layers = [main.make_caption_clip(c['text'], c['fontsize']).set_position('center')
+                  .set_start(c['start']).set_duration(c['end'] - c['start']) for c in cues]
+        layered = CompositeVideoClip([background] + layers)
+        layered_time, layered_frames = time_frames(layered, times)
+
+        overlay = caption_overlay.CaptionOverlay(cues, main.make_caption_image)
+        overlaid = overlay.apply_to(background)
+        overlay_time, overlay_frames = time_frames(overlaid, times)
+
+        max_diff = max(int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+                       for a, b in zip(layered_frames, overlay_frames))
+        mode = "grouped" if grouping else "single"
+        print(f"{mode:<8} {'layers':<10} {len(cues):>6} {layered_time * 1000:>10.2f} {'':>15}")
+        print(f"{mode:<8} {'overlay':<10} {len(cues):>6} {overlay_time * 1000:>10.2f} {max_diff:>15}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
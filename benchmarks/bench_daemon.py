@@ -0,0 +1,142 @@
+# Benchmark: per-job latency of a cold run vs the warm render daemon
+# Runs the same job (stub LLM and TTS, a synthetic lavfi background, no artifact cache) once in a fresh Python
+# process, paying for imports, the Whisper model load and client setup like a main.py run, and several
+# times through a running daemon over its HTTP API. Also checks that a job cancelled while it runs ends up
+# cancelled and that a high-priority job overtakes queued ones.
+#
+# Usage: python benchmarks/bench_daemon.py --jobs 3 --model tiny
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import STUB_SCRIPT, StubOllamaServer, StubSpeechServer
+
+
+def make_background(ffmpeg, path, seconds=90):
+    subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc2=size=540x960:rate=30",
+                    "-t", str(seconds), "-c:v", "libx264", "-g", "30", "-pix_fmt", "yuv420p", path], check=True)
+    return path
+
+
+def run_cold_child(request, output_dir, model):
+    """Child process: one job through a fresh daemon object, without warm-up (what a main.py run pays)."""
+    import main
+    import render_daemon
+    main.WHISPER_MODEL_SIZE, main.OPENAI_API_KEY, main.BACKGROUND_SELECTION = model, "stub", "fixed"
+    daemon = render_daemon.RenderDaemon(output_dir, max_jobs=1, use_cache=False)
+    daemon.submit(request)
+    job = daemon._next_job()
+    daemon._run_job(job)
+    print("COLD_RESULT " + json.dumps(daemon.status(job['id']), default=str))
+
+
+def api(base_url, method, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method)
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def wait_for(base_url, job_id, statuses=("done", "failed", "cancelled"), timeout=1800):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = api(base_url, "GET", f"/jobs/{job_id}")
+        if status['status'] in statuses:
+            return status
+        time.sleep(0.1)
+    raise TimeoutError(f"Job {job_id} did not finish")
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare cold-run and daemon per-job latency.")
+    parser.add_argument("--jobs", type=int, default=3, help="Warm jobs to run through the daemon")
+    parser.add_argument("--model", default="tiny", help="Whisper model size or checkpoint path")
+    parser.add_argument("--cold-child", help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.cold_child:
+        return run_cold_child(json.loads(args.cold_child), args.output_dir, args.model)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_daemon_")
+    try:
+        with StubOllamaServer() as llm, StubSpeechServer() as tts:
+            env = dict(os.environ, OLLAMA_HOST=llm.url, OPENAI_BASE_URL=tts.base_url, OPENAI_API_KEY="stub")
+            os.environ.update(OLLAMA_HOST=llm.url, OPENAI_BASE_URL=tts.base_url, OPENAI_API_KEY="stub")
+            import main
+            import render_daemon
+            background = make_background(main.ffmpeg_binary(), os.path.join(work_dir, "background.mp4"))
+            request = {'idea': "A benchmark story", 'background': background, 'caption_mode': "grouped"}
+
+            print("Running a cold job in a fresh process...")
+            started = time.perf_counter()
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--model", args.model, "--cold-child", json.dumps(request),
+                 "--output-dir", os.path.join(work_dir, "cold")],
+                env=env, cwd=ROOT, capture_output=True, text=True,
+            )
+            cold_seconds = time.perf_counter() - started
+            cold = next((json.loads(line[len("COLD_RESULT "):]) for line in child.stdout.splitlines()
+                         if line.startswith("COLD_RESULT ")), None)
+            if cold is None or cold['status'] != "done":
+                print(child.stdout[-3000:], child.stderr[-3000:])
+                raise RuntimeError("Cold job failed")
+
+            main.WHISPER_MODEL_SIZE, main.OPENAI_API_KEY, main.BACKGROUND_SELECTION = args.model, "stub", "fixed"
+            daemon = render_daemon.RenderDaemon(os.path.join(work_dir, "daemon"), max_jobs=1, use_cache=False)
+            started = time.perf_counter()
+            daemon.warm_up()
+            warm_up_seconds = time.perf_counter() - started
+            daemon.start()
+            server = render_daemon.make_server(daemon, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+            warm = []
+            for i in range(args.jobs):
+                started = time.perf_counter()
+                job = api(base_url, "POST", "/jobs", dict(request, id=f"warm_{i + 1}"))
+                status = wait_for(base_url, job['id'])
+                warm.append((time.perf_counter() - started, status))
+
+            # Cancellation of a running job, and priority: with one job slot, "urgent" overtakes "normal"
+            running = api(base_url, "POST", "/jobs", dict(request, id="to_cancel"))
+            api(base_url, "POST", "/jobs", dict(request, id="normal", script=STUB_SCRIPT))
+            api(base_url, "POST", "/jobs", dict(request, id="urgent", script=STUB_SCRIPT, priority=10))
+            while api(base_url, "GET", "/jobs/to_cancel")['stage'] in (None, "script", "audio"):
+                time.sleep(0.05)
+            api(base_url, "POST", f"/jobs/{running['id']}/cancel")
+            cancelled = wait_for(base_url, "to_cancel")
+            urgent, normal = wait_for(base_url, "urgent"), wait_for(base_url, "normal")
+            server.shutdown()
+            daemon.stop()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n--- Render Daemon Benchmark ---")
+    print(f"Model '{args.model}', stub LLM/TTS, no artifact cache")
+    print(f"Cold run (new process):  {cold_seconds:>7.2f}s  stages {cold['timings']}")
+    print(f"Daemon warm-up (once):   {warm_up_seconds:>7.2f}s")
+    for i, (seconds, status) in enumerate(warm, 1):
+        print(f"Daemon job {i}:            {seconds:>7.2f}s  stages {status['timings']}  ({status['status']})")
+    average = sum(seconds for seconds, _ in warm) / len(warm)
+    print(f"Per-job latency: cold {cold_seconds:.2f}s -> warm {average:.2f}s (x{cold_seconds / average:.2f})")
+    print(f"Cancelled while running: {cancelled['status']} (during '{cancelled['stage']}')")
+    print(f"Priority: urgent started {'before' if urgent['started_at'] < normal['started_at'] else 'after'} normal")
+    ok = (all(status['status'] == "done" for _, status in warm) and cancelled['status'] == "cancelled"
+          and urgent['started_at'] < normal['started_at'])
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
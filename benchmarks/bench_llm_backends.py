@@ -0,0 +1,122 @@
+# Benchmark: script generation throughput (ideas per minute) against the stub LLM server
+# The stub mimics what makes a local LLM slow besides generating: loading the model when it isn't loaded (and
+# unloading it once its keep-alive runs out), evaluating the prompt minus the prefix it still has cached, and a
+# limited number of parallel slots. Two scenarios:
+#   burst:  --ideas ideas at once. The old path (one blocking ollama.chat per idea, no keep_alive) against the
+#           backend layer fanning the requests out after a warm-up, for Ollama and the OpenAI-compatible
+#           (LM Studio) backend.
+#   spaced: --jobs single ideas arriving --gap seconds apart, with the stub unloading idle models after
+#           --stub-keep-alive seconds (a stand-in for Ollama's 5 minute default against jobs further apart).
+#           The old path reloads the model for every job; LLM_KEEP_ALIVE keeps it loaded.
+#
+# Usage: python benchmarks/bench_llm_backends.py --ideas 12 --concurrency 4
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import STUB_SCRIPT, StubOllamaServer
+
+
+def ideas_for(count, prefix="idea"):
+    return [f"My neighbor kept {prefix} number {i} a secret for years" for i in range(count)]
+
+
+def old_path(host, main, ideas):
+    """What generate_script did before the backend layer: one blocking ollama.chat per idea, without keep_alive."""
+    import ollama
+    client = ollama.Client(host=host)
+    return [client.chat(model=main.OLLAMA_MODEL, messages=main._script_messages(idea))['message']['content']
+            for idea in ideas]
+
+
+def run_spaced(jobs, gap, generate):
+    """Runs one idea every gap seconds (after the previous one finished). Returns the per-job latencies."""
+    latencies = []
+    for i, idea in enumerate(ideas_for(jobs, "job")):
+        if i:
+            time.sleep(gap)
+        started = time.perf_counter()
+        script = generate(idea)
+        latencies.append(time.perf_counter() - started)
+        if script != STUB_SCRIPT:
+            raise RuntimeError(f"Unexpected script: {script!r}")
+    return latencies
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Measure script generation throughput against the stub LLM.")
+    parser.add_argument("--ideas", type=int, default=12, help="Ideas in the burst scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="LLM_MAX_CONCURRENCY and the stub's parallel slots")
+    parser.add_argument("--gen-delay", type=float, default=2.0, help="Stub generation time per script (s)")
+    parser.add_argument("--load-delay", type=float, default=3.0, help="Stub model load time (s)")
+    parser.add_argument("--prompt-delay", type=float, default=0.5, help="Stub prompt evaluation time per 1000 characters (s)")
+    parser.add_argument("--jobs", type=int, default=4, help="Jobs in the spaced scenario")
+    parser.add_argument("--gap", type=float, default=1.0, help="Idle seconds between spaced jobs")
+    parser.add_argument("--stub-keep-alive", type=float, default=0.5, help="Stub default keep-alive in the spaced scenario (s)")
+    args = parser.parse_args()
+
+    import llm_backends
+    import main
+    main.configure(["METRICS_ENABLED=False", f"LLM_MAX_CONCURRENCY={args.concurrency}", "OLLAMA_MODEL='stub'",
+                    "LMSTUDIO_MODEL_ID='stub'"])
+    ideas = ideas_for(args.ideas)
+    stub = dict(delay=args.gen_delay, load_delay=args.load_delay, prompt_delay=args.prompt_delay, parallel=args.concurrency)
+    rows = []
+
+    def measure(label, run, server):
+        started = time.perf_counter()
+        scripts = run()
+        seconds = time.perf_counter() - started
+        if any(script != STUB_SCRIPT for script in scripts):
+            raise RuntimeError(f"{label}: unexpected scripts")
+        rows.append((label, seconds, len(scripts) / seconds * 60, dict(server.stats)))
+
+    print(f"Burst: {args.ideas} ideas...")
+    with StubOllamaServer(**stub) as server:
+        measure("old: sequential ollama.chat", lambda: old_path(server.url, main, ideas), server)
+    for provider in ("ollama", "lmstudio"):
+        with StubOllamaServer(**stub) as server:
+            backend = llm_backends.make_backend(
+                provider, "stub", keep_alive=main.LLM_KEEP_ALIVE, max_concurrency=args.concurrency,
+                **({'host': server.url} if provider == "ollama" else {'base_url': server.base_url}))
+
+            def fan_out():
+                backend.warm_up(main.SCRIPT_SYSTEM_PROMPT)
+                return backend.chat_many([main._script_messages(idea) for idea in ideas])
+            measure(f"new: {provider} warm-up + fan-out x{args.concurrency}", fan_out, server)
+            backend.close()
+
+    print(f"Spaced: {args.jobs} jobs, {args.gap:g}s apart, stub unloads idle models after {args.stub_keep_alive:g}s...")
+    spaced = {}
+    with StubOllamaServer(**dict(stub, default_keep_alive=args.stub_keep_alive)) as server:
+        spaced['old: no keep_alive'] = (run_spaced(args.jobs, args.gap, lambda idea: old_path(server.url, main, [idea])[0]),
+                                        dict(server.stats))
+    with StubOllamaServer(**dict(stub, default_keep_alive=args.stub_keep_alive)) as server:
+        backend = llm_backends.make_backend("ollama", "stub", host=server.url, keep_alive=main.LLM_KEEP_ALIVE,
+                                            max_concurrency=args.concurrency)
+        generate = lambda idea: backend.chat(main._script_messages(idea))
+        spaced[f"new: keep_alive={main.LLM_KEEP_ALIVE}"] = (run_spaced(args.jobs, args.gap, generate), dict(server.stats))
+        backend.close()
+
+    print("\n--- LLM Backend Benchmark ---")
+    print(f"Stub: {args.gen_delay:g}s generation, {args.load_delay:g}s model load, {args.prompt_delay:g}s per 1000 "
+          f"uncached prompt chars ({len(main.SCRIPT_SYSTEM_PROMPT)}-char system prompt), {args.concurrency} slots")
+    print(f"{'burst':<40} {'time':>8} {'ideas/min':>10} {'loads':>6} {'prompt chars evaluated':>24}")
+    for label, seconds, per_minute, stats in rows:
+        print(f"{label:<40} {seconds:>7.2f}s {per_minute:>10.1f} {stats['loads']:>6} "
+              f"{stats['evaluated_chars']:>10} of {stats['prompt_chars']:<10}")
+    print(f"{'spaced':<40} {'mean latency':>13} {'loads':>6}")
+    for label, (latencies, stats) in spaced.items():
+        print(f"{label:<40} {sum(latencies) / len(latencies):>12.2f}s {stats['loads']:>6}")
+    baseline = rows[0][2]
+    print("Throughput vs old path: " + ", ".join(f"{label.split(':')[1].strip()} x{per_minute / baseline:.2f}"
+                                                 for label, _, per_minute, _ in rows[1:]))
+    return 0 if all(per_minute > baseline for _, _, per_minute, _ in rows[1:]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
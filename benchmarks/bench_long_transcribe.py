@@ -0,0 +1,98 @@
+# Benchmark: single-pass vs VAD-chunked parallel transcription of long narration
+# Synthesizes a multi-minute speech-like narration with pauses between sentences, transcribes it once in a
+# single Whisper pass and once split at pauses across worker processes, and checks the merged result:
+# chunk cuts must fall in silence, and word times must be monotonic and never overlap.
+#
+# Usage: python benchmarks/bench_long_transcribe.py --minutes 4 --workers 2 --model tiny
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import whisper_timestamped as whisper
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+import vad_chunking
+from stub_servers import STUB_SCRIPT, synth_speech_pcm
+
+SENTENCE_PAUSE = 0.45  # Seconds of silence after every sentence
+
+
+def make_narration(seconds, sample_rate=main.WHISPER_SAMPLE_RATE):
+    """Speech-like float32 audio: STUB_SCRIPT's sentences repeated, each followed by a pause."""
+    sentences = [s.strip() + "." for s in STUB_SCRIPT.replace("!", ".").replace("?", ".").split(".") if s.strip()]
+    pause = np.zeros(int(sample_rate * SENTENCE_PAUSE), dtype=np.float32)
+    parts, total, i = [], 0, 0
+    while total < seconds * sample_rate:
+        pcm = np.frombuffer(synth_speech_pcm(sentences[i % len(sentences)], sample_rate=sample_rate), dtype="<i2")
+        parts += [pcm.astype(np.float32) / 32768.0, pause]
+        total += len(pcm) + len(pause)
+        i += 1
+    return np.concatenate(parts)[:int(seconds * sample_rate)]
+
+
+def check_words(segments):
+    """Returns the number of words whose times go backwards or overlap the previous word."""
+    problems, previous_end = 0, 0.0
+    for segment in segments:
+        for word in segment['words']:
+            if word['start'] < previous_end - 1e-6 or word['end'] < word['start']:
+                problems += 1
+            previous_end = max(previous_end, word['end'])
+    return problems
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare single-pass and chunked parallel transcription.")
+    parser.add_argument("--minutes", type=float, default=4.0, help="Narration length")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--chunk-seconds", type=float, default=main.LONG_AUDIO_CHUNK_SECONDS)
+    parser.add_argument("--model", default="tiny", help="Whisper model size or checkpoint path")
+    args = parser.parse_args()
+
+    main.WHISPER_MODEL_SIZE = args.model
+    main.LONG_AUDIO_WORKERS = args.workers
+    main.LONG_AUDIO_CHUNK_SECONDS = args.chunk_seconds
+    main.LONG_AUDIO_MAX_CHUNK_SECONDS = args.chunk_seconds * 1.5
+    audio = make_narration(args.minutes * 60)
+
+    model = main.get_whisper_model(args.model)
+    start = time.perf_counter()
+    single = whisper.transcribe(model, audio, language="en", beam_size=5, best_of=5, vad=False)
+    single_seconds = time.perf_counter() - start
+
+    # Start the workers and wait until every one has its model loaded (one worker uses this process's model)
+    if args.workers > 1:
+        pool = main.get_transcribe_pool()
+        warmup = [pool.submit(main._transcribe_chunk_task, audio[:main.WHISPER_SAMPLE_RATE], args.model,
+                              main.WHISPER_DEVICE, main.WHISPER_QUANTIZE_INT8) for _ in range(args.workers)]
+        for future in warmup:
+            future.result()
+    start = time.perf_counter()
+    chunked = main.transcribe_long_audio(audio)
+    chunked_seconds = time.perf_counter() - start
+    main.shutdown_transcribe_pool()
+
+    speech = vad_chunking.find_speech(vad_chunking.frame_levels(audio))
+    cuts = [chunk['end'] for chunk in chunked['chunks'][:-1]]
+    cuts_in_speech = [cut for cut in cuts if any(s < cut < e for s, e in speech)]
+    single_words = sum(len(s['words']) for s in single['segments'])
+    chunked_words = sum(len(s['words']) for s in chunked['segments'])
+    problems = check_words(chunked['segments'])
+
+    print("\n--- Long Audio Transcription Benchmark ---")
+    print(f"Narration: {args.minutes:.1f} min, model '{args.model}', {os.cpu_count()} CPUs")
+    print(f"Single pass:           {single_seconds:>8.2f}s  ({single_words} words)")
+    print(f"Chunked, {args.workers} worker(s):  {chunked_seconds:>8.2f}s  ({chunked_words} words in "
+          f"{len(chunked['chunks'])} chunks)  x{single_seconds / chunked_seconds:.2f}")
+    print(f"Cuts: {', '.join(f'{c:.2f}s' for c in cuts) or 'none'}; inside speech: {len(cuts_in_speech)}")
+    print(f"Overlapping or out-of-order words: {problems}")
+    return 0 if problems == 0 and not cuts_in_speech else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
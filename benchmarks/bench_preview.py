@@ -0,0 +1,140 @@
+# Benchmark: preview renders vs the full render
+# Renders the same captioned video in full (the moviepy backend at the output size, VIDEO_PRESET) and as a preview
+# (PREVIEW_SCALE, PREVIEW_FPS, PREVIEW_PRESET), a preview of a short window and a contact sheet, and compares
+# the times. Then checks the caption timing: the same narration is rendered in full and as a preview over a
+# black background, and on every preview frame the captions must be visible exactly when they are visible on
+# the full render's frame at the same time (and when the cue table says so).
+# Offline: synthetic lavfi backgrounds, stub narration with pauses and word timestamps to match, no artifact cache.
+#
+# Usage: python benchmarks/bench_preview.py --seconds 20 --size 1080x1920
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import SPEECH_SAMPLE_RATE, SPEECH_SECONDS_PER_WORD, STUB_SCRIPT, synth_speech_pcm
+
+CAPTION_LEVEL = 160  # Pixels brighter than this (all channels) on the black background belong to a caption
+CAPTION_MIN_PIXELS = 4  # A frame shows a caption when at least this many pixels do
+SENTENCE_WORDS = 12  # Words between the pauses of the synthetic narration
+SENTENCE_PAUSE = 1.5  # Seconds of silence after each sentence (longer than any caption stays up on its own)
+
+
+def make_inputs(ffmpeg, work_dir, seconds, size, fps):
+    """
+    A testsrc2 and a black background of size, and a narration of about `seconds` with word timestamps
+    matching it: sentences of SENTENCE_WORDS words with a SENTENCE_PAUSE second pause after each, so the
+    captions come and go.
+    """
+    import narration_audio
+    words = STUB_SCRIPT.split()
+    sentence_seconds = SENTENCE_WORDS * SPEECH_SECONDS_PER_WORD + SENTENCE_PAUSE
+    sentences = max(1, round(seconds / sentence_seconds))
+    words = (words * (sentences * SENTENCE_WORDS // len(words) + 1))[:sentences * SENTENCE_WORDS]
+    backgrounds = {}
+    for name, source in (("testsrc2", f"testsrc2=size={size}:rate={fps}"), ("black", f"color=black:size={size}:rate={fps}")):
+        backgrounds[name] = os.path.join(work_dir, f"{name}.mp4")
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", source, "-t", str(seconds + 5),
+                        "-c:v", "libx264", "-preset", "veryfast", "-g", str(fps), "-pix_fmt", "yuv420p",
+                        backgrounds[name]], check=True)
+    pcm, segments = b"", []
+    for first in range(0, len(words), SENTENCE_WORDS):
+        offset = first // SENTENCE_WORDS * sentence_seconds
+        sentence = words[first:first + SENTENCE_WORDS]
+        timed_words = [{'text': word, 'start': offset + i * SPEECH_SECONDS_PER_WORD,
+                        'end': offset + (i + 0.8) * SPEECH_SECONDS_PER_WORD} for i, word in enumerate(sentence)]
+        segments.append({'text': " ".join(sentence), 'words': timed_words,
+                         'start': timed_words[0]['start'], 'end': timed_words[-1]['end']})
+        pcm += synth_speech_pcm(" ".join(sentence)) + b"\x00\x00" * int(SPEECH_SAMPLE_RATE * SENTENCE_PAUSE)
+    audio = os.path.join(work_dir, "narration.wav")
+    narration_audio.save(narration_audio.NarrationAudio.from_pcm(pcm, SPEECH_SAMPLE_RATE), audio, ffmpeg)
+    return backgrounds, audio, segments
+
+
+def caption_visible(ffmpeg, path, size, fps):
+    """For every frame of path (read at fps, scaled to size): whether a caption is visible on it."""
+    import preview_render
+    probe = subprocess.run([ffmpeg, "-i", path], capture_output=True, text=True).stderr
+    duration = next(float(h) * 3600 + float(m) * 60 + float(s) for line in probe.splitlines() if "Duration:" in line
+                    for h, m, s in [line.split("Duration:")[1].split(",")[0].strip().split(":")])
+    return [int((frame.min(axis=2) > CAPTION_LEVEL).sum()) >= CAPTION_MIN_PIXELS
+            for frame in preview_render.read_frames(ffmpeg, path, 0.0, duration, size, fps)]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    ok = fn()
+    if not ok:
+        raise RuntimeError("Render failed")
+    return time.perf_counter() - started
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare preview renders with the full render and check their caption timing.")
+    parser.add_argument("--seconds", type=float, default=20, help="Narration length")
+    parser.add_argument("--size", default="1080x1920", help="Background (and output) size")
+    parser.add_argument("--fps", type=int, default=30, help="Background (and output) frame rate")
+    parser.add_argument("--window", type=float, nargs=2, default=[4.0, 9.0], metavar=("START", "END"), help="Preview window")
+    parser.add_argument("--preset", default="medium", help="VIDEO_PRESET of the full render")
+    args = parser.parse_args()
+
+    import main
+    main.configure(["METRICS_ENABLED=False", f"VIDEO_PRESET={args.preset!r}", "RENDER_BACKEND='moviepy'"])
+    ffmpeg = main.ffmpeg_binary()
+    if args.fps % main.PREVIEW_FPS:
+        parser.error(f"--fps must be a multiple of PREVIEW_FPS ({main.PREVIEW_FPS:g}) for the timing check")
+    width, height = (int(v) for v in args.size.split("x"))
+    step = args.fps // main.PREVIEW_FPS
+    work_dir = tempfile.mkdtemp(prefix="bench_preview_")
+    try:
+        backgrounds, audio, segments = make_inputs(ffmpeg, work_dir, args.seconds, args.size, args.fps)
+        out = lambda name: os.path.join(work_dir, name)
+        render = lambda background, path, **kwargs: lambda: main.create_video(background, audio, segments, path, **kwargs)
+        print(f"Full render ({args.size}, {args.fps} fps, preset '{args.preset}')...")
+        full_seconds = timed(render(backgrounds['testsrc2'], out("full.mp4")))
+        print("Preview render...")
+        preview_seconds = timed(render(backgrounds['testsrc2'], out("preview.mp4"), preview="video"))
+        print(f"Preview of {args.window[0]:g}-{args.window[1]:g}s...")
+        window_seconds = timed(render(backgrounds['testsrc2'], out("window.mp4"), preview="video", window=tuple(args.window)))
+        print("Contact sheet...")
+        sheet_seconds = timed(render(backgrounds['testsrc2'], out("sheet.png"), preview="sheet"))
+
+        print("Caption timing check on a black background...")
+        main.VIDEO_PRESET = "ultrafast"  # The check only needs the frames, not the full render's compression
+        timed(render(backgrounds['black'], out("full_black.mp4")))
+        timed(render(backgrounds['black'], out("preview_black.mp4"), preview="video"))
+        size = main.preview_render.preview_size(width, height, main.PREVIEW_SCALE)
+        full_visible = caption_visible(ffmpeg, out("full_black.mp4"), size, args.fps)
+        preview_visible = caption_visible(ffmpeg, out("preview_black.mp4"), size, main.PREVIEW_FPS)
+        duration = main.load_narration(audio).duration
+        cues = main.build_caption_cues(segments, duration, None, width)
+        expected = [any(cue['start'] <= i / main.PREVIEW_FPS < cue['end'] for cue in cues) for i in range(len(preview_visible))]
+        against_full = sum(1 for i, visible in enumerate(preview_visible)
+                           if i * step < len(full_visible) and visible != full_visible[i * step])
+        against_cues = sum(1 for visible, should in zip(preview_visible, expected) if visible != should)
+        sheet_tiles = len(main.preview_render.cue_frames(cues, args.fps))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n--- Preview Render Benchmark ---")
+    print(f"{duration:.1f}s narration, {args.size} at {args.fps} fps; preview {size[0]}x{size[1]} at "
+          f"{main.PREVIEW_FPS:g} fps, preset '{main.PREVIEW_PRESET}'; {os.cpu_count()} CPUs")
+    print(f"{'full render (' + args.preset + ')':<32} {full_seconds:>7.2f}s")
+    for label, seconds in (("preview", preview_seconds), (f"preview {args.window[0]:g}-{args.window[1]:g}s", window_seconds),
+                           (f"contact sheet ({sheet_tiles} captions)", sheet_seconds)):
+        print(f"{label:<32} {seconds:>7.2f}s  x{full_seconds / seconds:.1f} faster")
+    print(f"Caption timing: {len(preview_visible)} preview frames, {sum(preview_visible)} with captions; "
+          f"{against_full} differ from the full render's frame at the same time, {against_cues} from the cue table")
+    ok = against_full == 0 and against_cues == 0 and full_seconds / preview_seconds >= 10
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
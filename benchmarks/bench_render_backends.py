@@ -0,0 +1,139 @@
+# Benchmark + parity check: moviepy render backend vs ffmpeg (ASS burn-in) backend
+# Generates a synthetic background with ffmpeg's lavfi (testsrc2) and a tone as narration, renders the same
+# captions with both backends, and checks that they agree on duration and on when captions are visible, and
+# that both planned the cue table expected for the output width.
+#
+# Usage: python benchmarks/bench_render_backends.py --seconds 10
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from moviepy.editor import VideoFileClip
+
+
+def make_fixtures(work_dir, seconds, size):
+    """Creates a lavfi background (a bit longer than the audio) and a sine-tone narration."""
+    ffmpeg = main.ffmpeg_binary()
+    background = os.path.join(work_dir, "background.mp4")
+    audio = os.path.join(work_dir, "narration.mp3")
+    subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"testsrc2=size={size}:rate=30", "-t", str(seconds + 2),
+                    "-c:v", "libx264", "-pix_fmt", "yuv420p", background], check=True)
+    subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"sine=frequency=220:duration={seconds}", audio], check=True)
+    return background, audio
+
+
+def make_segments(seconds):
+    """Synthetic words every 0.4s with a pause after every 8th word."""
+    words, t, i = [], 0.2, 0
+    vocab = "I found my sister's secret bank account and the numbers did not add up".split()
+    while t + 0.3 < seconds:
+        words.append({'text': vocab[i % len(vocab)], 'start': round(t, 2), 'end': round(t + 0.3, 2)})
+        t += 1.2 if (i + 1) % 8 == 0 else 0.4
+        i += 1
+    return [{'id': 0, 'start': 0, 'end': seconds, 'text': '', 'words': words}]
+
+
+def caption_visible(frame, background_frame):
+    """True if the center of the frame differs from the background (a caption is drawn)."""
+    h, w = frame.shape[:2]
+    box = (slice(h // 2 - h // 20, h // 2 + h // 20), slice(w // 4, 3 * w // 4))
+    diff = np.abs(frame[box].astype(np.int16) - background_frame[box].astype(np.int16)).max(axis=2)
+    return (diff > 60).mean() > 0.02
+
+
+def render(backend, background, audio, segments, output):
+    """Renders with backend. Returns (ok, seconds, the cue table the render planned)."""
+    main.RENDER_BACKEND = backend
+    planned, build_caption_cues = [], main.build_caption_cues
+
+    def recording_build(*args, **kwargs):
+        cues = build_caption_cues(*args, **kwargs)
+        planned.append(cues)
+        return cues
+    main.build_caption_cues = recording_build
+    try:
+        start = time.perf_counter()
+        ok = main.create_video(background, audio, segments, output)
+        return ok, time.perf_counter() - start, planned[-1] if planned else None
+    finally:
+        main.build_caption_cues = build_caption_cues
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare the moviepy and ffmpeg render backends.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Narration length")
+    parser.add_argument("--size", default="540x960", help="Background resolution (WxH)")
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        background, audio = make_fixtures(work_dir, args.seconds, args.size)
+        segments = make_segments(args.seconds)
+        width = main.output_format(*(int(v) for v in args.size.split("x")), 30)[0]
+        results = {}
+        for grouping in (True, False):
+            main.ENABLE_WORD_GROUPING = grouping
+            mode = "grouped" if grouping else "single"
+            outputs, rendered = {}, {}
+            for backend in ("moviepy", "ffmpeg"):
+                output = os.path.join(work_dir, f"{mode}_{backend}.mp4")
+                ok, seconds, rendered[backend] = render(backend, background, audio, segments, output)
+                if not ok:
+                    print(f"Error: {backend} backend failed in {mode} mode.")
+                    return 1
+                outputs[backend] = output
+                results[(mode, backend)] = seconds
+
+            # The cue table both renders should have planned: for the output width, as they do
+            cues = main.build_caption_cues(segments, args.seconds, word_grouping=grouping, frame_width=width)
+            counts = {backend: len(planned or []) for backend, planned in rendered.items()}
+            layout = lambda table: [(cue['text'], round(cue['start'], 3)) for cue in table or []]
+            cues_ok = all(layout(planned) == layout(cues) for planned in rendered.values())
+            if not cues_ok:
+                print(f"  Cue table mismatch: expected {len(cues)} cues, rendered {counts}")
+            # Sample every cue's midpoint and the middle of every gap between cues
+            samples = [((c['start'] + c['end']) / 2, True) for c in cues]
+            samples += [((a['end'] + b['start']) / 2, False) for a, b in zip(cues, cues[1:]) if b['start'] - a['end'] > 0.25]
+
+            raw = VideoFileClip(background)
+            clips = {backend: VideoFileClip(path) for backend, path in outputs.items()}
+            mismatches = 0
+            detected = 0
+            for t, expected in samples:
+                background_frame = raw.get_frame(t)
+                visible = {backend: bool(caption_visible(clip.get_frame(t), background_frame)) for backend, clip in clips.items()}
+                if visible["moviepy"] != visible["ffmpeg"]:
+                    mismatches += 1
+                    print(f"  Mismatch at {t:.2f}s: expected caption={expected}, got {visible}")
+                # Very short captions (e.g. "I") may not register in the center box; only informational
+                detected += visible["moviepy"] == expected
+            durations = {backend: clip.duration for backend, clip in clips.items()}
+            for clip in list(clips.values()) + [raw]:
+                clip.close()
+
+            duration_ok = abs(durations["moviepy"] - durations["ffmpeg"]) <= 1 / 30 + 0.05
+            print(f"{mode}: {len(cues)} cues, {len(samples)} samples, {mismatches} backend mismatches, "
+                  f"{detected}/{len(samples)} matching the cue table, durations {durations}")
+            if mismatches or not duration_ok or not cues_ok:
+                failures += 1
+
+    print("\n--- Render Backend Benchmark ---")
+    print(f"{'mode':<8} {'backend':<8} {'time (s)':>9}")
+    for (mode, backend), seconds in results.items():
+        print(f"{mode:<8} {backend:<8} {seconds:>9.2f}")
+    print(f"Parity: {'PASS' if failures == 0 else 'FAIL'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,94 @@
+# Benchmark: cold-start time of each CLI subcommand
+# Every measurement is a fresh Python process. For each subcommand it reports the time to parse the command
+# line (--help), the time to import main plus the modules that subcommand's stage imports, and a real run
+# of the subcommand against the stub LLM/TTS servers with a synthetic background. The eager import of every
+# stage's modules is what each subcommand paid when main.py imported everything at module level.
+#
+# Usage: python benchmarks/bench_startup.py --repeat 3 --model tiny
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubOllamaServer, StubSpeechServer
+
+STAGES = {'script': ["script"], 'tts': ["audio"], 'align': ["timestamps"], 'render': ["video"], 'all': None}
+
+
+def timed(cmd, env, repeat=1):
+    """Best wall time of repeat runs of cmd (raises if a run fails)."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+        seconds = time.perf_counter() - started
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(cmd)} failed:\n{result.stdout[-2000:]}\n{result.stderr[-2000:]}")
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def import_command(stages):
+    return [sys.executable, "-c", f"import main; main.import_stage_modules({stages!r})"]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Measure the cold start of each main.py subcommand.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--model", default="tiny", help="Whisper model size or checkpoint path for the align run")
+    parser.add_argument("--no-runs", action="store_true", help="Only measure startup, skip the real stage runs")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        with StubOllamaServer() as llm, StubSpeechServer() as tts:
+            env = dict(os.environ, OLLAMA_HOST=llm.url, OPENAI_BASE_URL=tts.base_url, OPENAI_API_KEY="stub")
+            eager = timed(import_command(None), env, args.repeat)
+            results = {}
+            for command, stages in STAGES.items():
+                results[command] = {
+                    'help': timed([sys.executable, "main.py", command, "--help"], env, args.repeat),
+                    'imports': timed(import_command(stages), env, args.repeat),
+                }
+
+            if not args.no_runs:
+                import main
+                path = lambda name: os.path.join(work_dir, name)
+                background = path("background.mp4")
+                subprocess.run([main.ffmpeg_binary(), "-y", "-loglevel", "error", "-f", "lavfi",
+                                "-i", "testsrc2=size=540x960:rate=30", "-t", "30", "-c:v", "libx264", "-g", "30",
+                                "-pix_fmt", "yuv420p", background], check=True)
+                common = ["--no-cache", "--force", "--set", "METRICS_ENABLED=False",
+                          "--set", f"WHISPER_MODEL_SIZE={args.model!r}", "--set", "VIDEO_PRESET='ultrafast'"]
+                runs = {
+                    'script': ["script", "--idea", "A benchmark story", "-o", path("script.txt")],
+                    'tts': ["tts", "--script", path("script.txt"), "-o", path("narration.wav")],
+                    'align': ["align", "--audio", path("narration.wav"), "--script", path("script.txt"),
+                              "-o", path("segments.json")],
+                    'render': ["render", "--audio", path("narration.wav"), "--segments", path("segments.json"),
+                               "--background", background, "-o", path("video.mp4")],
+                }
+                for command, cmd in runs.items():
+                    results[command]['run'] = timed([sys.executable, "main.py", *cmd, *common], env)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n--- CLI Cold Start Benchmark ---")
+    print(f"Eager import of every stage (old main.py import): {eager:.2f}s")
+    print(f"{'command':<8} {'--help':>8} {'imports':>8} {'saved':>9} {'stage run':>10}")
+    for command, timings in results.items():
+        run = f"{timings['run']:>9.2f}s" if 'run' in timings else f"{'-':>10}"
+        print(f"{command:<8} {timings['help']:>7.2f}s {timings['imports']:>7.2f}s "
+              f"{eager - timings['imports']:>+8.2f}s {run}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
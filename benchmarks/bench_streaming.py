@@ -0,0 +1,75 @@
+# Benchmark: blocking script -> TTS vs streaming the script from Ollama straight into TTS
+# Runs against the local stub Ollama and speech servers and reports time-to-first-audio and total latency
+# for both flows. Both use sentence-chunked parallel TTS; only the overlap with script generation differs.
+#
+# Usage: python benchmarks/bench_streaming.py --llm-delay 4 --tts-delay 1
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubOllamaServer, StubSpeechServer
+
+
+def run_blocking(main, parallel_tts, idea, audio_path):
+    """The existing flow: wait for the whole script, then synthesize its chunks in parallel."""
+    started = time.perf_counter()
+    script = main.generate_script(idea)
+    script_seconds = time.perf_counter() - started
+    chunks = parallel_tts.split_sentences(script, min_chars=main.TTS_CHUNK_MIN_CHARS)
+    tts = main.get_parallel_tts()
+    first_audio = []
+    futures = []
+    for i, text in enumerate(chunks):
+        future = tts.submit(i, text, main.TTS_MODEL, main.TTS_VOICE, main.TTS_SPEED)
+        future.add_done_callback(lambda f: first_audio.append(time.perf_counter() - started))
+        futures.append(future)
+    pcm, _ = parallel_tts.stitch_pcm([f.result() for f in futures], chunks)
+    main.save_narration(pcm, audio_path)
+    return script, {'first_audio': min(first_audio), 'script': script_seconds, 'total': time.perf_counter() - started}
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare blocking and streaming script -> TTS latency.")
+    parser.add_argument("--llm-delay", type=float, default=4.0, help="Stub LLM time for the whole script (s)")
+    parser.add_argument("--tts-delay", type=float, default=1.0, help="Stub TTS latency per 200 characters (s)")
+    args = parser.parse_args()
+
+    with StubOllamaServer(delay=args.llm_delay) as llm, StubSpeechServer(delay=args.tts_delay) as tts:
+        # Must be set before main is imported: the ollama and openai clients read them at creation
+        os.environ["OLLAMA_HOST"] = llm.url
+        os.environ["OPENAI_BASE_URL"] = tts.base_url
+        os.environ["OPENAI_API_KEY"] = "stub"
+        import main
+        import parallel_tts
+
+        main.OPENAI_API_KEY = "stub"
+        idea = "Synthetic story idea"
+        with tempfile.TemporaryDirectory() as work_dir:
+            blocking_script, blocking = run_blocking(main, parallel_tts, idea, os.path.join(work_dir, "blocking.wav"))
+            streaming_script, streaming = main.generate_script_and_audio_streaming(
+                idea, os.path.join(work_dir, "streaming.wav")
+            )
+
+    print("\n--- Streaming Script -> TTS Benchmark ---")
+    print(f"{'flow':<10} {'first audio':>12} {'script done':>12} {'total':>8}")
+    for name, timings in (("blocking", blocking), ("streaming", streaming)):
+        if timings:
+            print(f"{name:<10} {timings['first_audio']:>11.2f}s {timings['script']:>11.2f}s {timings['total']:>7.2f}s")
+        else:
+            print(f"{name:<10} FAILED")
+    if not streaming:
+        return 1
+    print(f"Time to first audio: x{blocking['first_audio'] / streaming['first_audio']:.2f} faster, "
+          f"total: x{blocking['total'] / streaming['total']:.2f} faster")
+    same_script = blocking_script == streaming_script
+    print(f"Same script text: {'yes' if same_script else 'NO'}")
+    return 0 if same_script else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,280 @@
+# Offline benchmark suite with a regression gate
+# Builds its own fixtures (lavfi background, synthetic speech-like narration, word-timestamp segments from
+# 50 to 5000 words), stubs the LLM and TTS with the local stub servers, and times every pipeline stage that
+# runs locally: script/TTS client overhead, caption construction, per-frame compositing and the full
+# create_video encode for both caption modes and several encoder presets.
+#
+# Results are written as JSON and compared with a stored baseline; any metric slower than the baseline by
+# more than the tolerance makes the run exit non-zero.
+#
+# Usage:
+#   python benchmarks/bench_suite.py                      # run and compare with benchmarks/baseline.json
+#   python benchmarks/bench_suite.py --update-baseline    # run and store the results as the new baseline
+#   python benchmarks/bench_suite.py --quick              # smaller sizes, for a fast sanity check
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import SPEECH_SECONDS_PER_WORD, STUB_SCRIPT, StubOllamaServer, StubSpeechServer, synth_speech_wav
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SUITE_VERSION = 1
+
+# Arguments that only say where this run reads and writes its files; they are not recorded with the results
+RUN_ARGS = ("output", "baseline", "update_baseline")
+
+# Words per sentence segment in the synthetic transcript
+SENTENCE_WORDS = 12
+
+
+# --- Fixtures ---
+def make_words(num_words):
+    """Story-like words (the stub script repeated), with sentence punctuation every SENTENCE_WORDS words."""
+    vocab = [w.strip('.?,!"') for w in STUB_SCRIPT.split()]
+    words = [vocab[i % len(vocab)] for i in range(num_words)]
+    for i in range(SENTENCE_WORDS - 1, num_words, SENTENCE_WORDS):
+        words[i] += "."
+    return words
+
+
+def make_segments(words):
+    """Word timestamps matching the synthetic narration: one word every SPEECH_SECONDS_PER_WORD, 80% voiced."""
+    timed = [{'text': w, 'start': round(i * SPEECH_SECONDS_PER_WORD, 3),
+              'end': round((i + 0.8) * SPEECH_SECONDS_PER_WORD, 3), 'confidence': 1.0}
+             for i, w in enumerate(words)]
+    segments = []
+    for i in range(0, len(timed), SENTENCE_WORDS):
+        chunk = timed[i:i + SENTENCE_WORDS]
+        segments.append({'id': len(segments), 'start': chunk[0]['start'], 'end': chunk[-1]['end'],
+                         'text': " " + " ".join(w['text'] for w in chunk), 'words': chunk})
+    return segments
+
+
+def make_background(ffmpeg, path, seconds, size, fps=30):
+    subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}",
+                    "-t", f"{seconds:.2f}", "-c:v", "libx264", "-g", str(fps), "-pix_fmt", "yuv420p", path], check=True)
+    return path
+
+
+def make_narration(path, words):
+    with open(path, "wb") as f:
+        f.write(synth_speech_wav(" ".join(words)))
+    return path
+
+
+# --- Timing helpers ---
+def best_of(repeat, func):
+    """Runs func repeat times; returns the fastest wall time (least disturbed by other load)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def environment(ffmpeg):
+    version = subprocess.run([ffmpeg, "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    return {'machine': platform.machine(), 'system': platform.system(), 'python': platform.python_version(),
+            'cpus': os.cpu_count(), 'ffmpeg': version}
+
+
+# --- Benchmarks ---
+def bench_clients(main, results, repeat):
+    """Script and TTS calls against zero-latency stubs: the pipeline's own overhead around the services."""
+    results['script/stub'] = best_of(repeat, lambda: main.generate_script("benchmark idea"))
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_path = os.path.join(work_dir, "tts.mp3")
+        for chunked in (False, True):
+            main.TTS_CHUNKED = chunked
+            name = f"tts/stub/{'chunked' if chunked else 'single'}"
+            results[name] = best_of(repeat, lambda: main.generate_audio_openai(STUB_SCRIPT, audio_path))
+    main.TTS_CHUNKED = True
+
+
+def bench_captions(main, caption_raster, caption_overlay, results, sizes, repeat):
+    """Caption timeline + rasterizing every caption with a cold cache, per mode and transcript size."""
+    for num_words in sizes:
+        segments = make_segments(make_words(num_words))
+        duration = num_words * SPEECH_SECONDS_PER_WORD
+        for grouping in (True, False):
+            mode = "grouped" if grouping else "single"
+
+            def build():
+                main._CAPTION_CACHE = caption_raster.CaptionCache(main.CAPTION_CACHE_MAX_BYTES)  # Cold cache
+                cues = main.build_caption_cues(segments, duration, word_grouping=grouping)
+                caption_overlay.CaptionOverlay(cues, main.make_caption_image)
+            results[f"captions/{mode}/{num_words}w"] = best_of(repeat, build)
+
+
+def bench_composite(main, caption_overlay, results, sizes, background, frames, repeat):
+    """Per-frame caption compositing onto the decoded lavfi background, sampled across the whole timeline."""
+    from moviepy.editor import VideoFileClip
+    source = VideoFileClip(background)
+    try:
+        for num_words in sizes:
+            segments = make_segments(make_words(num_words))
+            duration = num_words * SPEECH_SECONDS_PER_WORD
+            for grouping in (True, False):
+                cues = main.build_caption_cues(segments, duration, word_grouping=grouping)
+                overlay = caption_overlay.CaptionOverlay(cues, main.make_caption_image)
+                # Captions are sampled across the whole story; the background loops over the short fixture
+                times = [duration * i / frames for i in range(frames)]
+                decoded = [source.get_frame(t % (source.duration - 0.1)) for t in times[:30]]
+                mode = "grouped" if grouping else "single"
+
+                def composite():
+                    for i, t in enumerate(times):
+                        overlay.apply(decoded[i % len(decoded)], t)
+                results[f"composite/{mode}/{num_words}w/{frames}frames"] = best_of(repeat, composite)
+    finally:
+        source.close()
+
+
+def bench_encode(main, results, sizes, presets, backends, work_dir, size, repeat):
+    """The full create_video run (decode, captions, composite, encode, mux) per backend/mode/preset."""
+    ffmpeg = main.ffmpeg_binary()
+    for num_words in sizes:
+        words = make_words(num_words)
+        segments = make_segments(words)
+        audio = make_narration(os.path.join(work_dir, f"narration_{num_words}.wav"), words)
+        seconds = num_words * SPEECH_SECONDS_PER_WORD
+        background = make_background(ffmpeg, os.path.join(work_dir, f"background_{num_words}.mp4"), seconds + 1, size)
+        for backend in backends:
+            for grouping in (True, False):
+                for preset in presets:
+                    main.RENDER_BACKEND, main.ENABLE_WORD_GROUPING, main.VIDEO_PRESET = backend, grouping, preset
+                    output = os.path.join(work_dir, "encode.mp4")
+
+                    def encode():
+                        main._CAPTION_CACHE = None  # Every encode rasterizes its captions, like a fresh run
+                        if not main.create_video(background, audio, segments, output):
+                            raise RuntimeError(f"create_video failed ({backend}, {preset}, {num_words} words)")
+                    mode = "grouped" if grouping else "single"
+                    results[f"encode/{backend}/{mode}/{preset}/{num_words}w"] = best_of(repeat, encode)
+
+
+# --- Baseline comparison ---
+def compare(results, baseline, tolerance, min_delta):
+    """Returns (rows, regressions); a regression is slower than baseline * (1 + tolerance) and by more than min_delta."""
+    rows, regressions = [], []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, value, None, None, "new"))
+            continue
+        ratio = value / base if base > 0 else float("inf")
+        regressed = value > base * (1 + tolerance) and value - base > min_delta
+        status = "SLOWER" if regressed else ("faster" if ratio < 1 - tolerance else "ok")
+        rows.append((name, value, base, ratio, status))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite with baseline comparison.")
+    parser.add_argument("--sizes", default="50,500,5000", help="Transcript sizes (words) for captions/compositing")
+    parser.add_argument("--encode-sizes", default="50", help="Transcript sizes (words) for full encodes")
+    parser.add_argument("--presets", default="ultrafast,veryfast,medium", help="libx264 presets to encode with")
+    parser.add_argument("--backends", default="moviepy,ffmpeg", help="Render backends to encode with")
+    parser.add_argument("--size", default="540x960", help="Background/output size")
+    parser.add_argument("--frames", type=int, default=150, help="Frames sampled per compositing benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeats for the fast benchmarks (fastest is kept)")
+    parser.add_argument("--encode-repeat", type=int, default=2, help="Repeats for the full encodes (fastest is kept)")
+    parser.add_argument("--quick", action="store_true", help="Sizes 50,500; one preset; moviepy only")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write this run's results")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Ignore slowdowns smaller than this (s)")
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes, args.presets, args.backends, args.encode_repeat = "50,500", "ultrafast", "moviepy", 1
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    encode_sizes = [int(s) for s in args.encode_sizes.split(",") if s]
+    results = {}
+    with StubOllamaServer() as llm, StubSpeechServer() as tts:
+        # Must be set before main is imported: the ollama and openai clients read them at creation
+        os.environ["OLLAMA_HOST"] = llm.url
+        os.environ["OPENAI_BASE_URL"] = tts.base_url
+        os.environ["OPENAI_API_KEY"] = "stub"
+        import main
+        import caption_overlay
+        import caption_raster
+
+        main.OPENAI_API_KEY = "stub"
+        main.ARTIFACT_CACHE_ENABLED = False
+        main.BACKGROUND_SELECTION = "fixed"
+        main.OUTPUT_SIZE = main.OUTPUT_FPS = None
+        main.CAPTION_RENDERER, main.CAPTION_COMPOSITOR = "pillow", "overlay"
+        main.CAPTION_CACHE_DIR = None
+        ffmpeg = main.ffmpeg_binary()
+
+        work_dir = tempfile.mkdtemp(prefix="bench_suite_")
+        try:
+            started = time.perf_counter()
+            print("Benchmarking script/TTS clients against stubs...")
+            bench_clients(main, results, args.repeat)
+            print("Benchmarking caption construction...")
+            bench_captions(main, caption_raster, caption_overlay, results, sizes, args.repeat)
+            print("Benchmarking compositing...")
+            background = make_background(ffmpeg, os.path.join(work_dir, "composite_background.mp4"), 5, args.size)
+            bench_composite(main, caption_overlay, results, sizes, background, args.frames, args.repeat)
+            print("Benchmarking full encodes...")
+            bench_encode(main, results, encode_sizes, args.presets.split(","), args.backends.split(","),
+                         work_dir, args.size, args.encode_repeat)
+            total = time.perf_counter() - started
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        settings = {name: value for name, value in vars(args).items() if name not in RUN_ARGS}
+        report = {'version': SUITE_VERSION, 'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  'environment': environment(ffmpeg), 'settings': settings, 'results': results}
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output} (suite took {total:.1f}s)")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get('environment', {}).get('cpus') != report['environment']['cpus'] or \
+            baseline.get('environment', {}).get('machine') != report['environment']['machine']:
+        print("Warning: The baseline was recorded on a different machine; timings may not be comparable.")
+    rows, regressions = compare(results, baseline.get('results', {}), args.tolerance, args.min_delta)
+
+    print(f"\n--- Benchmark Suite (tolerance {args.tolerance:.0%}, min delta {args.min_delta}s) ---")
+    print(f"{'benchmark':<48} {'now (s)':>9} {'base (s)':>9} {'ratio':>7}  status")
+    for name, value, base, ratio, status in rows:
+        base_text = f"{base:>9.3f}" if base is not None else f"{'-':>9}"
+        ratio_text = f"{ratio:>7.2f}" if ratio is not None else f"{'-':>7}"
+        print(f"{name:<48} {value:>9.3f} {base_text} {ratio_text}  {status}")
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} benchmark(s) slower than the baseline: {', '.join(regressions)}")
+        return 1
+    print("\nPASS: no regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
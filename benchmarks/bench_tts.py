@@ -0,0 +1,60 @@
+# Benchmark: single-request TTS vs sentence-chunked parallel TTS against the local stub speech server
+# The stub's latency grows with the input length, so chunking + concurrency shows up as wall-time savings.
+#
+# Usage: python benchmarks/bench_tts.py --delay 1.0 --concurrency 4 --rate-limit-every 0
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import STUB_SCRIPT, StubSpeechServer
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark single vs chunked parallel TTS.")
+    parser.add_argument("--delay", type=float, default=1.0, help="Stub latency per 200 input characters (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max chunk requests in flight")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Make every Nth stub request return 429")
+    parser.add_argument("--repeat", type=int, default=2, help="Repeat the stub script N times")
+    args = parser.parse_args()
+
+    script = " ".join([STUB_SCRIPT] * args.repeat)
+    with StubSpeechServer(delay=args.delay, rate_limit_every=args.rate_limit_every) as tts:
+        os.environ["OPENAI_BASE_URL"] = tts.base_url
+        os.environ["OPENAI_API_KEY"] = "stub"
+        import main
+
+        main.OPENAI_API_KEY = "stub"
+        main.TTS_MAX_CONCURRENCY = args.concurrency
+        main.TTS_MAX_RETRIES = 5
+        with tempfile.TemporaryDirectory() as work_dir:
+            results = {}
+            for chunked in (False, True):
+                main.TTS_CHUNKED = chunked
+                output = os.path.join(work_dir, f"{'chunked' if chunked else 'single'}.wav")
+                start = time.perf_counter()
+                ok = main.generate_audio_openai(script, output)
+                results[chunked] = (ok, time.perf_counter() - start)
+
+            with open(os.path.join(work_dir, "chunked_chunks.json"), encoding="utf-8") as f:
+                chunks = json.load(f)
+
+    print("\n--- TTS Benchmark ---")
+    print(f"Script: {len(script)} characters, {len(chunks)} chunks, concurrency {args.concurrency}")
+    for chunked, (ok, seconds) in results.items():
+        print(f"{'chunked' if chunked else 'single':<8} {'ok' if ok else 'FAILED':<7} {seconds:>7.2f}s")
+    if results[True][1] > 0:
+        print(f"Speedup: x{results[False][1] / results[True][1]:.2f}")
+    # Chunks must tile the track with no gaps or overlaps
+    contiguous = all(abs(a['end'] - b['start']) < 1e-6 for a, b in zip(chunks, chunks[1:]))
+    print(f"Chunk offsets contiguous: {'yes' if contiguous else 'NO'} (track length {chunks[-1]['end']:.2f}s)")
+    return 0 if all(ok for ok, _ in results.values()) and contiguous else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
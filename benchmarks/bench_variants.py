@@ -0,0 +1,110 @@
+# Benchmark: several render variants of one story, as separate runs vs one variants run
+# Separate runs go through the stage CLI once per variant (TTS, timestamps and render each time, like
+# rerunning the whole script per variant); the variants run narrates and aligns once, builds the caption
+# timing once per mode, shares the rasterized captions and encodes the variants in parallel processes.
+# Runs offline against the stub TTS server with a synthetic lavfi background and no artifact cache.
+#
+# Usage: python benchmarks/bench_variants.py --model tiny --workers 2
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import STUB_SCRIPT, StubSpeechServer
+
+VARIANTS = [
+    {"name": "grouped_9x16", "caption_mode": "grouped"},
+    {"name": "single_9x16", "caption_mode": "single"},
+    {"name": "grouped_1x1", "caption_mode": "grouped", "size": [540, 540]},
+    {"name": "single_1x1_yellow", "caption_mode": "single", "size": [540, 540],
+     "style": {"CAPTION_COLOR": "yellow", "SINGLE_CAPTION_FONTSIZE": 48}},
+]
+
+
+def run(cmd, env):
+    started = time.perf_counter()
+    result = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{result.stdout[-3000:]}\n{result.stderr[-3000:]}")
+    return time.perf_counter() - started
+
+
+def separate_run(variant, work_dir, background, common, env):
+    """One variant the old way: its own TTS, timestamps and render."""
+    path = lambda name: os.path.join(work_dir, f"{variant['name']}_{name}")
+    settings = [f"OUTPUT_SIZE={tuple(variant['size'])!r}"] if variant.get("size") else []
+    settings += [f"{key}={value!r}" for key, value in variant.get("style", {}).items()]
+    overrides = [arg for setting in settings for arg in ("--set", setting)]
+    seconds = run([sys.executable, "main.py", "tts", "--script", os.path.join(work_dir, "script.txt"),
+                   "-o", path("narration.wav"), *common], env)
+    seconds += run([sys.executable, "main.py", "align", "--audio", path("narration.wav"),
+                    "--script", os.path.join(work_dir, "script.txt"), "-o", path("segments.json"), *common], env)
+    seconds += run([sys.executable, "main.py", "render", "--audio", path("narration.wav"),
+                    "--segments", path("segments.json"), "--background", background,
+                    "--caption-mode", variant["caption_mode"], "-o", path("video.mp4"), *common, *overrides], env)
+    return seconds
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare separate per-variant runs with one variants run.")
+    parser.add_argument("--model", default="tiny", help="Whisper model size or checkpoint path")
+    parser.add_argument("--workers", type=int, default=None, help="Variant encode processes (default: one per core)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_variants_")
+    try:
+        with StubSpeechServer() as tts:
+            env = dict(os.environ, OPENAI_BASE_URL=tts.base_url, OPENAI_API_KEY="stub")
+            import main
+            background = os.path.join(work_dir, "background.mp4")
+            subprocess.run([main.ffmpeg_binary(), "-y", "-loglevel", "error", "-f", "lavfi",
+                            "-i", "testsrc2=size=540x960:rate=30", "-t", "40", "-c:v", "libx264", "-g", "30",
+                            "-pix_fmt", "yuv420p", background], check=True)
+            with open(os.path.join(work_dir, "script.txt"), "w", encoding="utf-8") as f:
+                f.write(STUB_SCRIPT)
+            specs = [dict(variant, background=background) for variant in VARIANTS]
+            with open(os.path.join(work_dir, "variants.json"), "w", encoding="utf-8") as f:
+                json.dump(specs, f)
+            settings = ["METRICS_ENABLED=False", f"WHISPER_MODEL_SIZE={args.model!r}", "VIDEO_PRESET='veryfast'"]
+            common = ["--no-cache"] + [arg for setting in settings for arg in ("--set", setting)]
+
+            print(f"Rendering {len(VARIANTS)} variants as separate runs...")
+            separate = {variant["name"]: separate_run(variant, work_dir, background, common, env) for variant in VARIANTS}
+
+            print(f"Rendering {len(VARIANTS)} variants from one alignment pass...")
+            output_dir = os.path.join(work_dir, "variants")
+            cmd = [sys.executable, "variants.py", os.path.join(work_dir, "variants.json"),
+                   "--script", os.path.join(work_dir, "script.txt"), "--output-dir", output_dir, *common]
+            if args.workers:
+                cmd += ["--workers", str(args.workers)]
+            variants_seconds = run(cmd, env)
+            with open(os.path.join(output_dir, "variants_summary.json"), encoding="utf-8") as f:
+                summary = json.load(f)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    separate_total = sum(separate.values())
+    print("\n--- Multi-Variant Rendering Benchmark ---")
+    print(f"Model '{args.model}', {os.cpu_count()} CPUs, {summary['workers']} variant worker(s)")
+    for name, seconds in separate.items():
+        render = next(result['render_seconds'] for result in summary['variants'] if result['name'] == name)
+        print(f"{name:<20} separate run {seconds:>7.2f}s   variant render {render:>6.2f}s")
+    print(f"Shared once: {summary['shared_seconds']}, caption timing {summary['caption_timing_seconds']:.3f}s, "
+          f"{summary['caption_bitmaps']} caption bitmaps in {summary['caption_raster_seconds']:.2f}s")
+    print(f"Separate runs: {separate_total:.2f}s   variants run: {variants_seconds:.2f}s   "
+          f"(x{separate_total / variants_seconds:.2f}, saved {separate_total - variants_seconds:.2f}s; "
+          f"the run's own estimate: ~{summary['saved_seconds']:.2f}s)")
+    ok = all(result['status'] == "done" for result in summary['variants'])
+    return 0 if ok and variants_seconds < separate_total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
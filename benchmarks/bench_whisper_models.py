@@ -0,0 +1,71 @@
+# Benchmark: Whisper model loading strategies on the same audio
+# Compares a cold run (load + transcribe), warm reuse of the registry model,
+# and warm reuse of the int8-quantized CPU model.
+#
+# Usage: python benchmarks/bench_whisper_models.py --audio temp_story_audio.wav --size base --runs 3
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import whisper_timestamped as whisper
+
+
+def time_transcription(audio, size, quantize):
+    """Returns (seconds spent getting the model, seconds spent transcribing)."""
+    start = time.perf_counter()
+    model = main.get_whisper_model(size, "cpu", quantize=quantize)
+    loaded = time.perf_counter()
+    whisper.transcribe(model, audio, language="en", beam_size=5, best_of=5, vad=False)
+    done = time.perf_counter()
+    return loaded - start, done - loaded
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark cold vs warm vs quantized Whisper runs.")
+    parser.add_argument("--audio", default=main.TEMP_AUDIO_FILENAME, help="Audio file to transcribe")
+    parser.add_argument("--size", default=main.WHISPER_MODEL_SIZE, help="Whisper model size")
+    parser.add_argument("--runs", type=int, default=3, help="Warm runs per mode")
+    parser.add_argument("--threads", type=int, default=None, help="Torch intra-op threads")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.audio):
+        print(f"Error: Audio file not found at {args.audio}")
+        return 1
+
+    main.configure_torch_threads(num_threads=args.threads)
+    audio = whisper.load_audio(args.audio)
+    results = []
+
+    # Cold: nothing cached, pays the full model load
+    main.clear_whisper_models()
+    load_s, transcribe_s = time_transcription(audio, args.size, quantize=False)
+    results.append(("cold", load_s, transcribe_s))
+
+    # Warm: model comes from the registry
+    for _ in range(args.runs):
+        load_s, transcribe_s = time_transcription(audio, args.size, quantize=False)
+        results.append(("warm", load_s, transcribe_s))
+
+    # Quantized warm: load (and quantize) once outside the timing, then reuse
+    main.get_whisper_model(args.size, "cpu", quantize=True)
+    for _ in range(args.runs):
+        load_s, transcribe_s = time_transcription(audio, args.size, quantize=True)
+        results.append(("int8 warm", load_s, transcribe_s))
+
+    print("\n--- Whisper Model Benchmark ---")
+    print(f"Audio: {args.audio} ({len(audio) / 16000:.2f}s), model: {args.size}")
+    print(f"{'mode':<10} {'load (s)':>10} {'transcribe (s)':>15} {'total (s)':>10}")
+    for mode, load_s, transcribe_s in results:
+        print(f"{mode:<10} {load_s:>10.3f} {transcribe_s:>15.3f} {load_s + transcribe_s:>10.3f}")
+    for mode in ("warm", "int8 warm"):
+        totals = [l + t for m, l, t in results if m == mode]
+        print(f"Mean {mode} total: {sum(totals) / len(totals):.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
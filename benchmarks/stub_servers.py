@@ -0,0 +1,283 @@
+# Local stub servers for running the pipeline offline
+# StubOllamaServer answers Ollama's /api/chat with a canned story (blocking or streamed token by token), and the
+# same story on the OpenAI-compatible /v1/chat/completions that LM Studio serves. StubSpeechServer answers
+# OpenAI's /v1/audio/speech with synthetic speech (raw PCM or WAV) whose length follows the input text. Both can
+# add latency to mimic real network/model time; the LLM stub can also mimic loading the model (and unloading it
+# when its keep-alive runs out), processing the prompt minus a cached prefix, and a limited number of parallel
+# request slots.
+#
+# Point the pipeline at them before importing main:
+#   OLLAMA_HOST=http://127.0.0.1:<port>  OPENAI_BASE_URL=http://127.0.0.1:<port>/v1  OPENAI_API_KEY=stub
+import contextlib
+import io
+import json
+import math
+import re
+import struct
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_SCRIPT = (
+    "I found out my brother had been lying to our whole family for two years. "
+    "Every Sunday he said he was at work, but his boss told me he quit long ago. "
+    "So I followed him one morning and watched him walk into the old hospital. "
+    "He was visiting our dad's best friend, who has no one else left. "
+    "He never told us because dad would have been too proud to accept the help. "
+    "Was I wrong to tell everyone at dinner?"
+)
+SPEECH_SECONDS_PER_WORD = 0.3
+SPEECH_SAMPLE_RATE = 24000
+
+
+def synth_speech_pcm(text, seconds_per_word=SPEECH_SECONDS_PER_WORD, sample_rate=SPEECH_SAMPLE_RATE):
+    """Speech-like 16-bit mono PCM: one short tone burst per word with small pauses between words."""
+    frames = bytearray()
+    for i, _ in enumerate(text.split()):
+        freq = 180 + 40 * (i % 5)
+        voiced = int(sample_rate * seconds_per_word * 0.8)
+        for n in range(voiced):
+            envelope = math.sin(math.pi * n / voiced)
+            frames += struct.pack("<h", int(8000 * envelope * math.sin(2 * math.pi * freq * n / sample_rate)))
+        frames += b"\x00\x00" * int(sample_rate * seconds_per_word * 0.2)
+    return bytes(frames)
+
+
+def synth_speech_wav(text, seconds_per_word=SPEECH_SECONDS_PER_WORD, sample_rate=SPEECH_SAMPLE_RATE):
+    """synth_speech_pcm wrapped in a WAV container."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(synth_speech_pcm(text, seconds_per_word, sample_rate))
+    return buffer.getvalue()
+
+
+class _StubServer:
+    """Runs an HTTP handler on 127.0.0.1 in a background thread (port 0 = pick a free port)."""
+
+    def __init__(self, handler, port=0, delay=0.0):
+        handler_class = type(handler.__name__, (handler,), {'delay': delay, 'requests': []})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler_class)
+        self.handler = handler_class
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.handler.requests
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    requests = []
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.requests.append({'path': self.path, 'body': body, 'time': time.time()})
+        return body
+
+    def _send(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _keep_alive_seconds(value, default):
+    """Ollama keep_alive ("5m", "30s", "1h", seconds, negative = forever) in seconds."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        match = re.fullmatch(r"(-?[\d.]+)\s*(ms|s|m|h)?", value.strip())
+        if not match:
+            return default
+        value = float(match.group(1)) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[match.group(2) or "s"]
+    return float("inf") if value < 0 else float(value)
+
+
+class _OllamaHandler(_JsonHandler):
+    script = STUB_SCRIPT
+    load_delay = 0.0  # Seconds to load the model when it isn't loaded
+    prompt_delay = 0.0  # Seconds per 1000 prompt characters that aren't in the prefix cache
+    default_keep_alive = float("inf")  # Seconds the model stays loaded after a request without keep_alive
+    state = None  # Shared per server: loaded models, cached prefixes, counters, slot semaphore
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path == "/v1/chat/completions":
+            return self._openai_chat(body)
+        if self.path != "/api/chat":
+            return self._send(404, "application/json", b'{"error": "not found"}')
+        model = body.get("model", "stub")
+        with self._slot():
+            prompt_eval = self._process_prompt(model, body.get("messages", []), body.get("keep_alive"))
+            if body.get("stream"):
+                return self._stream(model)
+            time.sleep(self.delay)
+        response = {
+            "model": model,
+            "created_at": "2024-01-01T00:00:00Z",
+            "message": {"role": "assistant", "content": self.script},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": prompt_eval,
+            "eval_count": len(self.script) // 4,
+        }
+        self._send(200, "application/json", json.dumps(response).encode("utf-8"))
+
+    def _openai_chat(self, body):
+        model = body.get("model", "stub")
+        with self._slot():
+            prompt_eval = self._process_prompt(model, body.get("messages", []), body.get("ttl"))
+            if body.get("stream"):
+                return self._openai_stream(model)
+            time.sleep(self.delay)
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+        response = {
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": 1704067200, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.script}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(self.script) // 4,
+                      "total_tokens": prompt_tokens + len(self.script) // 4,
+                      "prompt_tokens_details": {"cached_tokens": prompt_tokens - prompt_eval}},
+        }
+        self._send(200, "application/json", json.dumps(response).encode("utf-8"))
+
+    def _slot(self):
+        return self.state['slots']
+
+    def _process_prompt(self, model, messages, keep_alive):
+        """
+        Mimics loading the model and evaluating the prompt. A system message that was already evaluated while
+        the model stayed loaded is a cached prefix and costs nothing. Returns the evaluated prompt tokens.
+        """
+        state = self.state
+        with state['lock']:
+            now = time.time()
+            loaded = state['loaded'].get(model, 0) > now
+            if not loaded:
+                state['prefixes'].pop(model, None)
+                state['loads'] += 1
+        if not loaded:
+            time.sleep(self.load_delay)
+        with state['lock']:
+            prefixes = state['prefixes'].setdefault(model, set())
+            system = "".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+            rest = sum(len(m.get("content") or "") for m in messages if m.get("role") != "system")
+            evaluated = rest + (0 if system in prefixes else len(system))
+            prefixes.add(system)
+            state['prompt_chars'] += rest + len(system)
+            state['evaluated_chars'] += evaluated
+        time.sleep(self.prompt_delay * evaluated / 1000)
+        with state['lock']:
+            state['loaded'][model] = time.time() + _keep_alive_seconds(keep_alive, self.default_keep_alive)
+        return evaluated // 4
+
+    def _openai_stream(self, model):
+        tokens = re.findall(r"\S+\s*", self.script)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(self.delay / len(tokens))
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 1704067200, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        done = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 1704067200, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream(self, model):
+        # NDJSON, one message per word-sized token; the delay is spread over the tokens so a streamed
+        # response takes as long overall as a blocking one
+        tokens = re.findall(r"\S+\s*", self.script)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()  # HTTP/1.0 without Content-Length: the body ends when the connection closes
+        for i, token in enumerate(tokens + [""]):
+            if token:
+                time.sleep(self.delay / len(tokens))
+            message = {"model": model, "created_at": "2024-01-01T00:00:00Z",
+                       "message": {"role": "assistant", "content": token}, "done": i == len(tokens)}
+            if i == len(tokens):
+                message["done_reason"] = "stop"
+            line = (json.dumps(message) + "\n").encode("utf-8")
+            self.wfile.write(line)
+            self.wfile.flush()
+
+
+class _SpeechHandler(_JsonHandler):
+    rate_limit_every = 0  # When > 0, every Nth request gets a 429 (to exercise retry/backoff)
+
+    def do_POST(self):
+        body = self._read_json()
+        if not self.path.endswith("/audio/speech"):
+            return self._send(404, "application/json", b'{"error": {"message": "not found"}}')
+        if self.rate_limit_every and len(self.requests) % self.rate_limit_every == 0:
+            return self._send(429, "application/json", b'{"error": {"message": "rate limited", "type": "requests"}}')
+        # Latency grows with the input length, like a real TTS service
+        time.sleep(self.delay * max(1, len(body.get("input", "")) / 200))
+        if body.get("response_format") == "pcm":
+            self._send(200, "audio/pcm", synth_speech_pcm(body.get("input", "")))
+        else:
+            self._send(200, "audio/wav", synth_speech_wav(body.get("input", "")))
+
+
+class StubOllamaServer(_StubServer):
+    """
+    delay: generation time per response. load_delay, prompt_delay and default_keep_alive: see _OllamaHandler.
+    parallel: requests served at once (like OLLAMA_NUM_PARALLEL); None serves every request at once.
+    """
+
+    def __init__(self, port=0, delay=0.0, load_delay=0.0, prompt_delay=0.0, default_keep_alive=float("inf"),
+                 parallel=None):
+        super().__init__(_OllamaHandler, port, delay)
+        self.handler.load_delay = load_delay
+        self.handler.prompt_delay = prompt_delay
+        self.handler.default_keep_alive = default_keep_alive
+        self.handler.state = {
+            'lock': threading.Lock(), 'loaded': {}, 'prefixes': {}, 'loads': 0, 'prompt_chars': 0,
+            'evaluated_chars': 0, 'slots': threading.Semaphore(parallel) if parallel else contextlib.nullcontext(),
+        }
+
+    @property
+    def base_url(self):
+        """The OpenAI-compatible endpoint (LM Studio style)."""
+        return self.url + "/v1"
+
+    @property
+    def stats(self):
+        """Model loads and prompt characters received / actually evaluated (the rest hit the prefix cache)."""
+        state = self.handler.state
+        return {'loads': state['loads'], 'prompt_chars': state['prompt_chars'], 'evaluated_chars': state['evaluated_chars']}
+
+
+class StubSpeechServer(_StubServer):
+    def __init__(self, port=0, delay=0.0, rate_limit_every=0):
+        super().__init__(_SpeechHandler, port, delay)
+        self.handler.rate_limit_every = rate_limit_every
+
+    @property
+    def base_url(self):
+        return self.url + "/v1"
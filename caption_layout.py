@@ -0,0 +1,224 @@
+# Caption layout planner
+# Decides where caption groups start and end, where their lines wrap and which font size they use, from
+# text widths computed with cached per-glyph advance widths instead of rasterizing anything. The result is
+# a cue table (text with line breaks, start, end, font size) that every caption renderer can draw as is.
+import string
+from functools import lru_cache
+
+from PIL import ImageFont
+
+PRELOADED_CHARS = string.printable  # Measured up front for every font size; other characters on first use
+
+
+class GlyphMetrics:
+    """
+    Advance widths of the characters of one font file, measured once per font size and reused.
+    A line's width is the sum of its characters' advances (no kerning, like Pillow's basic layout).
+    Widths of whole words are cached too, since transcripts repeat the same words over and over.
+    """
+
+    def __init__(self, font_path):
+        self.font_path = font_path
+        self._fonts = {}
+        self._advances = {}
+        self._words = {}
+
+    def _table(self, fontsize):
+        fontsize = int(fontsize)
+        table = self._advances.get(fontsize)
+        if table is None:
+            font = self._fonts[fontsize] = ImageFont.truetype(self.font_path, fontsize)
+            table = self._advances[fontsize] = {char: font.getlength(char) for char in PRELOADED_CHARS}
+        return table
+
+    def text_width(self, text, fontsize):
+        """Width of a single line of text in pixels, without stroke."""
+        fontsize = int(fontsize)
+        words = self._words.get(fontsize)
+        if words is None:
+            words = self._words[fontsize] = {}
+        width = words.get(text)
+        if width is None:
+            table = self._table(fontsize)
+            width = 0.0
+            for char in text:
+                advance = table.get(char)
+                if advance is None:
+                    advance = table[char] = self._fonts[fontsize].getlength(char)
+                width += advance
+            if len(words) < 100000:  # Bounded: only single words and short lines end up here in practice
+                words[text] = width
+        return width
+
+    def line_height(self, fontsize):
+        self._table(fontsize)
+        ascent, descent = self._fonts[int(fontsize)].getmetrics()
+        return ascent + descent
+
+
+@lru_cache(maxsize=None)
+def get_metrics(font_path):
+    """The shared GlyphMetrics of a font file (one per process)."""
+    return GlyphMetrics(font_path)
+
+
+def wrap_words(words, metrics, fontsize, max_width):
+    """
+    Greedily wraps words into lines no wider than max_width at fontsize.
+    Returns (lines, fits): fits is False when a single word is wider than max_width on its own.
+    """
+    space = metrics.text_width(" ", fontsize)
+    lines, current, current_width, fits = [], [], 0.0, True
+    for word in words:
+        width = metrics.text_width(word, fontsize)
+        if width > max_width:
+            fits = False
+        if current and current_width + space + width <= max_width:
+            current.append(word)
+            current_width += space + width
+        else:
+            if current:
+                lines.append(current)
+            current, current_width = [word], width
+    if current:
+        lines.append(current)
+    return [" ".join(line) for line in lines], fits
+
+
+def fit_caption(words, metrics, fontsize, min_fontsize, max_width, max_lines):
+    """
+    Lines and font size for one caption: fontsize if the words fit in max_lines lines of max_width,
+    otherwise the largest smaller size that does (never below min_fontsize; at min_fontsize the caption
+    is used as it wraps). Returns (lines, fontsize).
+    """
+    size = int(fontsize)
+    while True:
+        lines, fits = wrap_words(words, metrics, size, max_width)
+        if (fits and len(lines) <= max_lines) or size <= min_fontsize:
+            return lines, size
+        widest = max(metrics.text_width(word, size) for word in words)
+        # Jump straight to the size at which the widest word fits, or step down when there are too many lines
+        next_size = int(size * max_width / widest) if widest > max_width else int(size * 0.9)
+        size = max(int(min_fontsize), min(next_size, size - 1))
+
+
+def _reading_speed(group, lines, until):
+    """Characters per second a group of words (wrapped into lines of words) asks for when it stays up until then."""
+    chars = sum(len(word) for line in lines for word in line) + sum(len(line) for line in lines) - 1
+    seconds = max(until, group[-1]['end']) - group[0]['start']
+    return chars / seconds if seconds > 0 else float("inf")
+
+
+def _merge_for_reading_speed(groups, metrics, fontsize, max_width, max_lines, max_words, max_cps, max_duration, gap,
+                             end_time):
+    """
+    Merges every group that is too fast to read (above max_cps) with the neighbour that gives the slowest
+    merged caption, as long as the merged words are at most max_words, fit in max_lines lines of max_width
+    at fontsize, cover at most max_duration seconds, don't cross a segment end and are slower than the
+    group was.
+    """
+    def until(i):
+        # A group stays up until the next one starts (minus gap)
+        if i + 1 < len(groups):
+            return groups[i + 1][0][0]['start'] - gap
+        return end_time if end_time is not None else groups[i][0][-1]['end'] + 3600.0
+
+    i = 0
+    while i < len(groups):
+        speed = _reading_speed(groups[i][0], groups[i][1], until(i))
+        best = None
+        if speed > max_cps:
+            for j in (i - 1, i):  # Merge groups j and j + 1
+                if j < 0 or j + 1 >= len(groups):
+                    continue
+                first, second = groups[j][0], groups[j + 1][0]
+                if (len(first) + len(second) > max_words or first[-1].get('segment_end')
+                        or second[-1]['end'] - first[0]['start'] > max_duration):
+                    continue
+                words = first + second
+                lines, fits = wrap_words([word['text'] for word in words], metrics, fontsize, max_width)
+                if not fits or len(lines) > max_lines:
+                    continue
+                lines = [line.split(" ") for line in lines]
+                merged_speed = _reading_speed(words, lines, until(j + 1))
+                if merged_speed < speed and (best is None or merged_speed < best[0]):
+                    best = (merged_speed, j, (words, lines, True))
+        if best is None:
+            i += 1
+        else:
+            # The merged group may still be too fast: look at it again
+            _, i, merged = best
+            groups[i:i + 2] = [merged]
+    return groups
+
+
+def plan_cues(words, metrics, max_width, fontsize, min_fontsize=None, max_lines=2, max_words=3, max_cps=17.0,
+              min_duration=0.5, max_duration=3.0, pause_break=0.4, gap=0.02, end_time=None, stroke_width=0):
+    """
+    Plans the caption cues for timed words: dicts with 'text', 'start', 'end' and optionally 'segment_end'
+    (True on the last word of a transcript segment).
+
+    Words are grouped greedily; a group ends at max_words, at a segment end, before a pause of pause_break
+    seconds, when it would cover more than max_duration, or when the next word would not fit in max_lines
+    lines of max_width pixels at fontsize. A group that can't stay up long enough to be read at max_cps
+    characters per second (the next group starts too soon) is then merged with a neighbour of the same
+    segment when the pair still has at most max_words words, fits and covers at most max_duration (see
+    _merge_for_reading_speed); with max_words 1 nothing is merged. Groups that don't fit on their own are
+    shrunk (fit_caption). A cue stays up for at least min_duration and long enough to read at max_cps, as
+    far as the next cue (minus gap) and end_time allow; max_cps None or 0 disables the reading speed limit.
+    Speech that is faster than max_cps throughout still gives faster cues.
+
+    Returns the cue table: dicts with 'text' (lines joined by newlines), 'start', 'end', 'fontsize',
+    'lines' and 'cps' (the reading speed the cue asks for).
+    """
+    min_fontsize = min(int(min_fontsize or fontsize), int(fontsize))
+    # The rasterizer pads the text by the stroke on both sides, on top of the stroke drawn around the glyphs
+    max_width = max(1.0, max_width - 4 * (stroke_width or 0))
+    space = metrics.text_width(" ", fontsize)
+
+    # Groups as (words, lines at fontsize, whether every line fits), built and wrapped in one pass
+    groups, group, lines, line_widths, fits = [], [], [], [], True
+    for word in words:
+        width = metrics.text_width(word['text'], fontsize)
+        if group:
+            previous = group[-1]
+            # Would the word still fit on the last line, or on a new one?
+            room = line_widths[-1] + space + width <= max_width or len(line_widths) < max_lines
+            if (len(group) >= max_words or previous.get('segment_end') or not room
+                    or word['start'] - previous['end'] >= pause_break
+                    or word['end'] - group[0]['start'] > max_duration):
+                groups.append((group, lines, fits))
+                group, lines, line_widths, fits = [], [], [], True
+        if group and line_widths[-1] + space + width <= max_width:
+            line_widths[-1] += space + width
+            lines[-1].append(word['text'])
+        else:
+            line_widths.append(width)
+            lines.append([word['text']])
+        fits = fits and width <= max_width
+        group.append(word)
+    if group:
+        groups.append((group, lines, fits))
+    if max_cps and max_words > 1:
+        groups = _merge_for_reading_speed(groups, metrics, fontsize, max_width, max_lines, max_words, max_cps,
+                                          max_duration, gap, end_time)
+
+    cues = []
+    for i, (group, lines, fits) in enumerate(groups):
+        if fits and len(lines) <= max_lines:
+            lines, size = [" ".join(line) for line in lines], int(fontsize)
+        else:
+            lines, size = fit_caption([word['text'] for word in group], metrics, fontsize, min_fontsize, max_width, max_lines)
+        text = "\n".join(lines)
+        start = group[0]['start']
+        end = max(group[-1]['end'], start + min_duration)
+        if max_cps:
+            end = max(end, start + len(text) / max_cps)
+        if i + 1 < len(groups):
+            # Never run into the next cue, but never cut the group's own words short either
+            end = max(min(end, groups[i + 1][0][0]['start'] - gap), group[-1]['end'])
+        if end_time is not None:
+            end = min(end, end_time)
+        cues.append({'text': text, 'start': start, 'end': end, 'fontsize': size, 'lines': len(lines),
+                     'cps': round(len(text) / (end - start), 1) if end > start else None})
+    return cues
@@ -0,0 +1,102 @@
+# Interval-indexed caption compositor
+# Instead of handing moviepy one CompositeVideoClip layer per caption (which checks every layer on every
+# frame), the cue timeline is kept as sorted start/end arrays. Each frame looks up its active cue(s) with a
+# binary search and alpha-blends only the caption's bounding box onto the frame.
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+
+class CaptionOverlay:
+    """
+    Draws timed captions onto video frames.
+    cues: list of dicts with 'text', 'start', 'end' and 'fontsize' (start <= t < end is active).
+    render: function (text, fontsize) -> RGBA uint8 array for the caption image.
+    Captions are centered on the frame, like set_position('center'); when cues overlap, later cues are
+    drawn on top, matching CompositeVideoClip's layer order.
+    """
+
+    def __init__(self, cues, render):
+        self.errors = 0
+        self.decode_seconds = 0.0  # Time apply_to's clip spent getting background frames
+        self.blend_seconds = 0.0  # Time spent drawing captions onto them
+        self._images = {}
+        timed = []
+        for cue in cues:
+            key = (cue['text'], cue['fontsize'])
+            if key not in self._images:
+                try:
+                    self._images[key] = self._prepare(render(cue['text'], cue['fontsize']))
+                except Exception as e:
+                    print(f"Failed to render caption '{cue['text']}'")
+                    print(f"Error: {e}")
+                    self._images[key] = None
+                    self.errors += 1
+            if self._images[key] is not None and cue['end'] > cue['start']:
+                timed.append((cue['start'], cue['end'], key))
+
+        timed.sort(key=lambda c: c[0])  # stable, so equal starts keep their original layer order
+        self.starts = np.array([c[0] for c in timed], dtype=np.float64)
+        self.ends = np.array([c[1] for c in timed], dtype=np.float64)
+        self._keys = [c[2] for c in timed]
+        self._starts_list = self.starts.tolist()
+        self._max_duration = float((self.ends - self.starts).max()) if timed else 0.0
+
+    @staticmethod
+    def _prepare(rgba):
+        """Precomputes the blend terms: color premultiplied by alpha, and 1 - alpha."""
+        alpha = rgba[:, :, 3:4].astype(np.float32) / 255.0
+        premultiplied = rgba[:, :, :3].astype(np.float32) * alpha
+        return premultiplied, 1.0 - alpha
+
+    def __len__(self):
+        return len(self._keys)
+
+    def active_indices(self, t):
+        """Returns the indices of the cues visible at time t, in drawing order."""
+        last = bisect_right(self._starts_list, t) - 1
+        active = []
+        # Only cues starting within the longest cue duration before t can still be visible
+        i = last
+        while i >= 0 and self._starts_list[i] > t - self._max_duration - 1e-9:
+            if t < self.ends[i]:
+                active.append(i)
+            i -= 1
+        active.reverse()
+        return active
+
+    def apply(self, frame, t):
+        """Blends the captions active at time t onto the frame (in place when the frame is writable)."""
+        active = self.active_indices(t)
+        if not active:
+            return frame
+        if not frame.flags.writeable:
+            # Decoder buffers are read-only (and reused by moviepy's reader), so copy once
+            frame = frame.copy()
+        frame_h, frame_w = frame.shape[:2]
+        for i in active:
+            premultiplied, inverse_alpha = self._images[self._keys[i]]
+            h, w = inverse_alpha.shape[:2]
+            x, y = int((frame_w - w) / 2), int((frame_h - h) / 2)
+            # Clip the caption box to the frame (captions wider than the frame are cut at both sides)
+            x1, y1 = max(x, 0), max(y, 0)
+            x2, y2 = min(x + w, frame_w), min(y + h, frame_h)
+            if x2 <= x1 or y2 <= y1: continue
+            cx1, cy1 = x1 - x, y1 - y
+            region = frame[y1:y2, x1:x2]
+            region[...] = (premultiplied[cy1:cy1 + y2 - y1, cx1:cx1 + x2 - x1]
+                           + inverse_alpha[cy1:cy1 + y2 - y1, cx1:cx1 + x2 - x1] * region)
+        return frame
+
+    def apply_to(self, clip):
+        """Returns the clip with the captions drawn on it (audio is kept)."""
+        def draw(get_frame, t):
+            started = time.perf_counter()
+            frame = get_frame(t)
+            decoded = time.perf_counter()
+            frame = self.apply(frame, t)
+            self.decode_seconds += decoded - started
+            self.blend_seconds += time.perf_counter() - decoded
+            return frame
+        return clip.fl(draw)
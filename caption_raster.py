@@ -0,0 +1,179 @@
+# In-process caption rasterizer
+# Renders stroked caption text with Pillow instead of spawning one ImageMagick process per caption,
+# and caches the rendered bitmaps (in memory, optionally on disk) so repeated words are only drawn once.
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Folders searched (recursively) when a font is given by name instead of path
+FONT_SEARCH_DIRS = [
+    "/System/Library/Fonts", "/Library/Fonts", os.path.expanduser("~/Library/Fonts"),  # macOS
+    "C:\\Windows\\Fonts",  # Windows
+    "/usr/share/fonts", "/usr/local/share/fonts", os.path.expanduser("~/.fonts"),  # Linux
+]
+FALLBACK_FONTS = ["DejaVuSans-Bold", "LiberationSans-Bold", "Arial Bold", "Arial"]
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+
+@lru_cache(maxsize=None)
+def resolve_font_path(font, font_path=None):
+    """
+    Finds the font file for a font name like 'Impact'.
+    Uses font_path if given, then searches the system font folders, then falls back to a common bold font.
+    """
+    if font_path:
+        if os.path.exists(font_path):
+            return font_path
+        print(f"Warning: Caption font file not found at {font_path}, searching for '{font}' instead.")
+    if font and os.path.exists(font):
+        return font
+
+    wanted = [name.lower().replace(" ", "") for name in [font] + FALLBACK_FONTS if name]
+    found = {}
+    for font_dir in FONT_SEARCH_DIRS:
+        if not os.path.isdir(font_dir): continue
+        for root, _, files in os.walk(font_dir):
+            for filename in files:
+                stem, ext = os.path.splitext(filename)
+                if ext.lower() in FONT_EXTENSIONS:
+                    found.setdefault(stem.lower().replace(" ", ""), os.path.join(root, filename))
+    for i, name in enumerate(wanted):
+        if name in found:
+            if i > 0:
+                print(f"Warning: Font '{font}' not found, using {found[name]} for captions.")
+            return found[name]
+    raise FileNotFoundError(f"No font file found for '{font}'. Set CAPTION_FONT_PATH to a .ttf file.")
+
+
+@lru_cache(maxsize=32)
+def _load_font(path, fontsize):
+    return ImageFont.truetype(path, int(fontsize))
+
+
+def rasterize_caption(text, font_path, fontsize, color, stroke_color, stroke_width):
+    """
+    Draws stroked text onto a tight transparent canvas. Returns an RGBA uint8 array (H, W, 4).
+    Text with newlines (from the caption layout planner) is drawn as centered lines.
+    """
+    font = _load_font(font_path, fontsize)
+    stroke = int(round(stroke_width or 0))
+    multiline = "\n" in text
+    if multiline:
+        left, top, right, bottom = ImageDraw.Draw(Image.new("RGBA", (1, 1))).multiline_textbbox(
+            (0, 0), text, font=font, align="center", stroke_width=stroke)
+        # Multiline boxes can be fractional
+        left, top, right, bottom = math.floor(left), math.floor(top), math.ceil(right), math.ceil(bottom)
+    else:
+        left, top, right, bottom = font.getbbox(text, stroke_width=stroke)
+    # Pad by the stroke width so the outline is never clipped at the edges
+    width = max(1, right - left + 2 * stroke)
+    height = max(1, bottom - top + 2 * stroke)
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    if multiline:
+        draw.multiline_text((stroke - left, stroke - top), text, font=font, fill=color, align="center",
+                            stroke_width=stroke, stroke_fill=stroke_color if stroke else None)
+    else:
+        draw.text((stroke - left, stroke - top), text, font=font, fill=color,
+                  stroke_width=stroke, stroke_fill=stroke_color if stroke else None)
+    return np.asarray(image)
+
+
+class CaptionCache:
+    """
+    LRU cache of rendered captions keyed by (text, font, size, color, stroke color, stroke width).
+    Memory use is bounded by max_bytes; if cache_dir is set, renders are also kept on disk as PNGs
+    so later runs can skip rasterizing entirely. Safe to share between threads (the render daemon's jobs).
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".png")
+
+    def _store(self, key, image):
+        # Called with the lock held; another thread may have stored the same caption in the meantime
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.current_bytes -= previous.nbytes
+        self._entries[key] = image
+        self.current_bytes += image.nbytes
+        # Evict least recently used entries, but always keep the newest one
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+
+    def get(self, text, font_path, fontsize, color, stroke_color, stroke_width):
+        """Returns the RGBA array for the caption, rendering it only if it isn't cached yet."""
+        key = (text, font_path, int(fontsize), color, stroke_color, float(stroke_width or 0))
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return image
+
+        disk_path = self._disk_path(key) if self.cache_dir else None
+        if disk_path and os.path.exists(disk_path):
+            try:
+                with Image.open(disk_path) as cached:
+                    image = np.asarray(cached.convert("RGBA"))
+                with self._lock:
+                    self.disk_hits += 1
+            except Exception as e:
+                print(f"Warning: Ignoring unreadable cached caption {disk_path}: {e}")
+                image = None
+
+        if image is None:
+            image = rasterize_caption(text, font_path, fontsize, color, stroke_color, stroke_width)
+            with self._lock:
+                self.misses += 1
+            if disk_path:
+                # Unique per writer: two jobs may render the same caption at once
+                tmp_path = f"{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    Image.fromarray(image, "RGBA").save(tmp_path, format="PNG")
+                    os.replace(tmp_path, disk_path)
+                except Exception as e:
+                    print(f"Warning: Could not write caption cache file {disk_path}: {e}")
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+        with self._lock:
+            self._store(key, image)
+        return image
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.current_bytes,
+                    "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+def make_caption_clip(text, font, fontsize, color, stroke_color, stroke_width, cache, font_path=None):
+    """
+    Creates a moviepy ImageClip (with transparency mask) for the caption.
+    Drop-in replacement for TextClip(..., method='label'): set position/start/duration on the result as usual.
+    """
+    from moviepy.editor import ImageClip
+
+    path = resolve_font_path(font, font_path)
+    rgba = cache.get(text, path, fontsize, color, stroke_color, stroke_width)
+    mask = ImageClip(rgba[:, :, 3] / 255.0, ismask=True)
+    return ImageClip(rgba[:, :, :3]).set_mask(mask)
@@ -0,0 +1,97 @@
+# Chunked video encodes: render GOP-aligned frame ranges separately and join the parts without re-encoding
+# Every range starts on a multiple of the GOP length and every part is encoded with the same fixed GOP
+# (no scene-cut keyframes), so each part starts with a keyframe exactly where a single encode would put one.
+# The parts are joined with ffmpeg's concat demuxer using stream copy and the narration is muxed in once.
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+import narration_audio
+
+
+def plan_ranges(total_frames, workers, gop_frames):
+    """
+    Splits frames [0, total_frames) into at most workers ranges whose boundaries are multiples of gop_frames,
+    with the GOPs spread as evenly as possible. Returns a list of (first_frame, end_frame) pairs.
+    """
+    if total_frames <= 0:
+        return []
+    gops = -(-total_frames // gop_frames)
+    count = max(1, min(workers, gops))
+    ranges = []
+    for i in range(count):
+        first = (gops * i // count) * gop_frames
+        end = min((gops * (i + 1) // count) * gop_frames, total_frames)
+        ranges.append((first, end))
+    return ranges
+
+
+def encode_frames(ffmpeg_binary, frames, size, fps, output_path, gop_frames, preset="medium", threads=None):
+    """
+    Encodes RGB frames (an iterable of HxWx3 uint8 arrays) into a video-only H.264 file with a fixed GOP of
+    gop_frames (a keyframe every gop_frames frames, the first frame included). Returns the frame count.
+    Raises subprocess.CalledProcessError (with ffmpeg's stderr) on failure.
+    """
+    width, height = size
+    cmd = [
+        ffmpeg_binary, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-vcodec", "rawvideo", "-s", f"{width}x{height}", "-pix_fmt", "rgb24", "-r", f"{fps:g}",
+        "-i", "pipe:0", "-an",
+        "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+        "-g", str(gop_frames), "-keyint_min", str(gop_frames), "-sc_threshold", "0",
+    ]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd.append(output_path)
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Read stderr on a thread so a chatty ffmpeg can't block on a full pipe while frames are written
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    count = 0
+    try:
+        for frame in frames:
+            process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+            count += 1
+    except BrokenPipeError:
+        pass  # ffmpeg exited early; its stderr says why
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+        reader.join()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=b"".join(stderr).decode(errors="replace"))
+    return count
+
+
+def concat_parts(ffmpeg_binary, part_paths, audio, output_path, duration=None):
+    """
+    Joins the encoded parts in order with the concat demuxer (stream copy, no re-encoding) and muxes the
+    narration (a narration_audio.NarrationAudio, cut to duration) in as AAC, piped in from memory.
+    """
+    list_path = os.path.splitext(output_path)[0] + "_parts.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in part_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [
+        ffmpeg_binary, "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        *narration_audio.pcm_input_args(audio.sample_rate),
+        "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac", "-movflags", "+faststart",
+    ]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd.append(output_path)
+    try:
+        subprocess.run(cmd, input=audio.pcm(duration), capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise subprocess.CalledProcessError(e.returncode, cmd, stderr=e.stderr.decode(errors="replace")) from None
+    finally:
+        os.remove(list_path)
+    return output_path
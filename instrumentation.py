@@ -0,0 +1,262 @@
+# Pipeline instrumentation
+# Records wall time, CPU time and peak memory for every pipeline stage and for named sub-spans inside the
+# stages (model load, audio decode, transcribe, caption build, composite, encode). Results are written as
+# JSON lines (one record per span, appended across runs) and as a Prometheus text file that the
+# node_exporter textfile collector can pick up.
+#
+# Usage:
+#   @instrumentation.stage("audio")          # a pipeline stage
+#   with instrumentation.span("encode"):     # a sub-span (nested under whatever span is open in this thread)
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+def _children_cpu_seconds():
+    """CPU time of finished child processes (ffmpeg runs)."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Recorder:
+    """Collects span records for one run. Thread-safe; nesting is tracked per thread."""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def set_thread_run_id(self, run_id):
+        """Records spans of the calling thread under run_id (None: the recorder's own run id)."""
+        self._local.run_id = run_id
+
+    def _thread_run_id(self):
+        return getattr(self._local, "run_id", None) or self.run_id
+
+    def drain(self, run_id=None):
+        """
+        Moves the records so far into a new Recorder (with run_id, default this recorder's) and clears this
+        one, so a long-running process can write its metrics as it goes without the records piling up.
+        """
+        with self._lock:
+            drained = Recorder(run_id or self.run_id)
+            drained.records, self.records = self.records, []
+        return drained
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name, **labels):
+        """
+        Times the enclosed block. The record gets ok=False if the block raises; code that reports
+        failure by return value can set record['ok'] on the yielded dict.
+        """
+        stack = self._stack()
+        record = {
+            'run_id': self._thread_run_id(), 'span': name, 'parent': "/".join(stack) or None,
+            'labels': labels, 'started_at': time.time(), 'ok': True,
+        }
+        stack.append(name)
+        peak_before = _peak_rss_bytes()
+        wall_start, cpu_start, children_start = time.perf_counter(), time.process_time(), _children_cpu_seconds()
+        try:
+            yield record
+        except BaseException:
+            record['ok'] = False
+            raise
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            # Process CPU time covers all threads of this process, not only the span's own thread
+            record['cpu_seconds'] = round(time.process_time() - cpu_start, 6)
+            record['child_cpu_seconds'] = round(_children_cpu_seconds() - children_start, 6)
+            peak_after = _peak_rss_bytes()
+            # Peak RSS is the process high-water mark at the end of the span; growth > 0 means this span set a new peak
+            record['peak_rss_bytes'] = peak_after
+            record['peak_rss_growth_bytes'] = (peak_after - peak_before) if peak_after is not None else None
+            stack.pop()
+            with self._lock:
+                self.records.append(record)
+
+    def add(self, name, wall_seconds, **labels):
+        """Adds a span measured elsewhere (e.g. time accumulated across many frames) under the current span."""
+        stack = self._stack()
+        with self._lock:
+            self.records.append({
+                'run_id': self._thread_run_id(), 'span': name, 'parent': "/".join(stack) or None, 'labels': labels,
+                'started_at': None, 'ok': True, 'wall_seconds': round(wall_seconds, 6), 'cpu_seconds': None,
+                'child_cpu_seconds': None, 'peak_rss_bytes': None, 'peak_rss_growth_bytes': None,
+            })
+
+    def write_jsonl(self, path):
+        """Appends this run's span records to a JSON lines file."""
+        with self._lock:
+            records = list(self.records)
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+        return path
+
+    def prometheus_text(self):
+        """This run's spans as Prometheus text exposition format (summed per stage/span path)."""
+        totals = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            path = f"{record['parent']}/{record['span']}" if record['parent'] else record['span']
+            stage = path.split("/")[0]
+            total = totals.setdefault((stage, path), {'wall': 0.0, 'cpu': 0.0, 'children': 0.0, 'rss': 0, 'count': 0, 'failed': 0})
+            total['wall'] += record['wall_seconds']
+            total['cpu'] += record['cpu_seconds'] or 0.0
+            total['children'] += record['child_cpu_seconds'] or 0.0
+            total['rss'] = max(total['rss'], record['peak_rss_bytes'] or 0)
+            total['count'] += 1
+            total['failed'] += 0 if record['ok'] else 1
+
+        metrics = [
+            ("pipeline_span_wall_seconds", "Wall-clock time spent in the span during the last run", 'wall'),
+            ("pipeline_span_cpu_seconds", "CPU time of this process during the span", 'cpu'),
+            ("pipeline_span_child_cpu_seconds", "CPU time of child processes (ffmpeg) finished during the span", 'children'),
+            ("pipeline_span_peak_rss_bytes", "Process peak resident memory at the end of the span", 'rss'),
+            ("pipeline_span_count", "Number of times the span ran", 'count'),
+            ("pipeline_span_failures", "Number of times the span failed", 'failed'),
+        ]
+        lines = []
+        for metric, help_text, field in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for (stage, path), total in sorted(totals.items()):
+                lines.append(f'{metric}{{run_id="{self.run_id}",stage="{stage}",span="{path}"}} {total[field]:g}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the Prometheus text file atomically (the textfile collector may read it at any time)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+    def summary(self):
+        """Short human-readable table of the top-level stages."""
+        with self._lock:
+            records = [r for r in self.records if r['parent'] is None]
+        lines = []
+        for r in records:
+            rss = f"{r['peak_rss_bytes'] / 1024 ** 2:.0f} MB" if r['peak_rss_bytes'] else "n/a"
+            lines.append(f"{r['span']:<12} wall {r['wall_seconds']:>8.2f}s  cpu {r['cpu_seconds']:>8.2f}s  "
+                         f"peak RSS {rss}{'' if r['ok'] else '  (failed)'}")
+        return "\n".join(lines)
+
+
+_RECORDER = Recorder()
+
+
+def get_recorder():
+    return _RECORDER
+
+
+def reset(run_id=None):
+    """Starts a new run (drops the recorded spans)."""
+    global _RECORDER
+    _RECORDER = Recorder(run_id)
+    return _RECORDER
+
+
+def span(name, **labels):
+    return _RECORDER.span(name, **labels)
+
+
+def add_span(name, wall_seconds, **labels):
+    _RECORDER.add(name, wall_seconds, **labels)
+
+
+def _succeeded(result):
+    return result is not None and result is not False
+
+
+def stage(name, ok=_succeeded):
+    """
+    Decorator for a pipeline stage function. The stage counts as failed if the function raises or ok(result)
+    is false (by default: it returned None or False, which is how the pipeline functions report failure).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _RECORDER.span(name, function=func.__name__) as record:
+                result = func(*args, **kwargs)
+                record['ok'] = bool(ok(result))
+                return result
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def profile(mode, output_prefix):
+    """
+    Optional profiling hook around a block (the render loop).
+      "cprofile": runs cProfile and saves <output_prefix>.prof (open with snakeviz or pstats), printing the top entries
+      "py-spy":   attaches py-spy (if installed) to this process and saves a speedscope profile to
+                  <output_prefix>.speedscope.json
+    Any other mode (e.g. None) does nothing.
+    """
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{output_prefix}.prof")
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(15)
+            print(stream.getvalue())
+            print(f"Render profile saved to {output_prefix}.prof")
+    elif mode == "py-spy" and shutil.which("py-spy"):
+        out_path = f"{output_prefix}.speedscope.json"
+        spy = subprocess.Popen(["py-spy", "record", "--pid", str(os.getpid()), "--format", "speedscope",
+                                "--output", out_path, "--subprocesses"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            yield
+        finally:
+            spy.send_signal(signal.SIGINT)  # py-spy writes its output on interrupt
+            try:
+                spy.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                spy.kill()
+            print(f"Render profile saved to {out_path}")
+    else:
+        if mode == "py-spy":
+            print(f"py-spy not found on PATH; attach it manually with: py-spy record --pid {os.getpid()}")
+        yield
@@ -0,0 +1,214 @@
+# Local LLM backends for script generation
+# One backend object per process owns an event loop thread and one pooled async client, shared by every caller
+# (including several threads at once, e.g. batch mode's script workers and the render daemon's jobs), so
+# requests fan out concurrently up to max_concurrency. Every request asks the server to keep the model loaded
+# (keep_alive), and the system prompt is always sent as the same first message, so a server that keeps its
+# prompt cache between requests (Ollama, LM Studio and llama.cpp do while the model stays loaded) only has to
+# process the new idea. warm_up() loads the model and puts the system prompt into that cache before real work.
+#
+# Backends: "ollama" (Ollama's /api/chat through the ollama client) and "openai" (any OpenAI-compatible
+# chat completions server: LM Studio, llama.cpp server, vLLM).
+import asyncio
+import queue
+import re
+import threading
+
+_STREAM_END = object()
+
+
+def keep_alive_seconds(keep_alive):
+    """An Ollama keep_alive ("30m", "1h", "90s", seconds; negative = forever) in seconds (None = forever)."""
+    if isinstance(keep_alive, str):
+        match = re.fullmatch(r"(-?[\d.]+)\s*(ms|s|m|h)?", keep_alive.strip())
+        if not match:
+            raise ValueError(f"Invalid keep_alive duration: {keep_alive!r}")
+        keep_alive = float(match.group(1)) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[match.group(2) or "s"]
+    return None if keep_alive is None or keep_alive < 0 else int(keep_alive)
+
+
+class LLMBackend:
+    """
+    Base class: subclasses implement _make_client(), and _chat(messages, model) and _stream(messages, model)
+    as coroutines running on the backend's loop. model None means the backend's model.
+    stats counts requests, the prompt tokens the server had to evaluate, and the prompt tokens it reported
+    taking from its cache (OpenAI-compatible servers report them; Ollama only reports the evaluated ones).
+    """
+    name = None
+
+    def __init__(self, model, keep_alive="30m", max_concurrency=4, timeout=600.0):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'evaluated_prompt_tokens': 0, 'cached_prompt_tokens': 0}
+        self._client = None
+        self._semaphore = None
+        self._stats_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name=f"llm-{self.name}-loop", daemon=True)
+        self._thread.start()
+
+    def _get_client(self):
+        # Created on the loop thread: the connection pool belongs to this loop
+        if self._client is None:
+            self._client = self._make_client()
+        return self._client
+
+    def _record(self, evaluated_tokens, cached_tokens):
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['evaluated_prompt_tokens'] += evaluated_tokens or 0
+            self.stats['cached_prompt_tokens'] += cached_tokens or 0
+
+    async def _limited(self, coroutine_function, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await coroutine_function(*args)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def chat(self, messages, model=None):
+        """Sends one chat request and returns the reply text. Blocks the calling thread only."""
+        return self.submit(messages, model).result()
+
+    def submit(self, messages, model=None):
+        """Starts one chat request and returns a concurrent.futures.Future with the reply text."""
+        return self._run(self._limited(self._chat, messages, model or self.model))
+
+    def chat_many(self, conversations, model=None):
+        """
+        Sends every conversation concurrently (at most max_concurrency in flight). Returns the replies in
+        order; a failed request's entry is its exception instead of the text.
+        """
+        async def fan_out():
+            return await asyncio.gather(*[self._limited(self._chat, messages, model or self.model)
+                                          for messages in conversations], return_exceptions=True)
+        return self._run(fan_out()).result()
+
+    def stream(self, messages, model=None):
+        """Yields the reply text piece by piece as the server writes it."""
+        pieces = queue.Queue()
+
+        async def produce():
+            try:
+                async for piece in self._stream(messages, model or self.model):
+                    pieces.put(piece)
+            except Exception as e:
+                pieces.put(e)
+            finally:
+                pieces.put(_STREAM_END)
+        self._run(self._limited(produce))
+        while True:
+            piece = pieces.get()
+            if piece is _STREAM_END:
+                return
+            if isinstance(piece, Exception):
+                raise piece
+            yield piece
+
+    def warm_up(self, system_prompt=None):
+        """Loads the model (and keeps it loaded) and gets system_prompt into the server's prompt cache."""
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        self.chat(messages + [{"role": "user", "content": "Reply with OK."}])
+
+    def close(self):
+        """Closes the client and stops the loop thread."""
+        if self._client is not None:
+            self._run(self._close_client()).result()
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def _close_client(self):
+        pass
+
+
+class OllamaBackend(LLMBackend):
+    """Ollama's chat API. host None uses $OLLAMA_HOST (like the ollama client)."""
+    name = "ollama"
+
+    def __init__(self, model, host=None, **kwargs):
+        super().__init__(model, **kwargs)
+        self.host = host
+
+    def _make_client(self):
+        import ollama
+        return ollama.AsyncClient(host=self.host, timeout=self.timeout)
+
+    async def _chat(self, messages, model):
+        response = await self._get_client().chat(model=model, messages=messages, keep_alive=self.keep_alive)
+        # Ollama only counts the prompt tokens it had to evaluate; the rest came from its cache
+        self._record(response.get('prompt_eval_count'), None)
+        return response['message']['content']
+
+    async def _stream(self, messages, model):
+        parts = await self._get_client().chat(model=model, messages=messages, keep_alive=self.keep_alive,
+                                              stream=True)
+        async for part in parts:
+            if part.get('done'):
+                self._record(part.get('prompt_eval_count'), None)
+            yield part['message']['content']
+
+    async def _close_client(self):
+        await self._get_client()._client.aclose()
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    An OpenAI-compatible chat completions server such as LM Studio. keep_alive is sent as LM Studio's "ttl"
+    (seconds before an idle just-in-time loaded model is unloaded).
+    """
+    name = "openai"
+
+    def __init__(self, model, base_url, api_key=None, **kwargs):
+        super().__init__(model, **kwargs)
+        self.base_url = base_url
+        self.api_key = api_key or "local"  # Local servers don't check it, but the client wants one
+
+    def _make_client(self):
+        import httpx
+        import openai
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        return openai.AsyncOpenAI(
+            api_key=self.api_key, base_url=self.base_url, max_retries=2,
+            http_client=httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(self.timeout, connect=10.0)),
+        )
+
+    def _extra_body(self):
+        ttl = keep_alive_seconds(self.keep_alive)
+        return {"ttl": ttl} if ttl is not None else None
+
+    async def _chat(self, messages, model):
+        response = await self._get_client().chat.completions.create(
+            model=model, messages=messages, extra_body=self._extra_body())
+        usage = response.usage
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", None) or 0
+            self._record(usage.prompt_tokens - cached, cached)
+        else:
+            self._record(None, None)
+        return response.choices[0].message.content
+
+    async def _stream(self, messages, model):
+        chunks = await self._get_client().chat.completions.create(
+            model=model, messages=messages, stream=True, extra_body=self._extra_body())
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        self._record(None, None)
+
+    async def _close_client(self):
+        await self._get_client().close()
+
+
+BACKENDS = {'ollama': OllamaBackend, 'lmstudio': OpenAICompatibleBackend, 'openai': OpenAICompatibleBackend}
+
+
+def make_backend(provider, model, **kwargs):
+    """Creates the backend for a LOCAL_LLM_PROVIDER name. Raises ValueError for an unknown provider."""
+    if provider not in BACKENDS:
+        raise ValueError(f"Unknown LLM provider '{provider}' (expected one of {sorted(BACKENDS)})")
+    return BACKENDS[provider](model, **kwargs)
@@ -1,34 +1,85 @@
 #Generate a script for a story
-import ollama
-import openai
-import dotenv
+# Heavy dependencies (ollama, openai, whisper_timestamped/torch, moviepy) are imported by the functions that
+# use them, so each CLI stage only pays for its own imports.
 from dotenv import load_dotenv
 import os
-# Import whisper-timestamped
-import whisper_timestamped as whisper
+import shutil
+import subprocess
+import argparse
+import ast
+import sys
+import time
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import json # Useful for inspecting whisper results
-# Import moviepy
-from moviepy.editor import VideoFileClip, AudioFileClip, TextClip, CompositeVideoClip
-from moviepy.config import change_settings # Optional: If ImageMagick path needs setting
-change_settings({"IMAGEMAGICK_BINARY": r"/opt/homebrew/bin/magick"}) # Example for Homebrew on Apple Silicon
+import numpy as np
+from PIL import Image
+import caption_raster
+import caption_overlay
+import caption_layout
+import ass_render
+import artifact_cache
+import chunked_encode
+import preview_render
+import parallel_tts
+import narration_audio
+import background_library
+import instrumentation
+import vad_chunking
+import llm_backends
 
-load_dotenv()
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-LOCAL_LLM_PROVIDER = "ollama" # Or "lmstudio" if you add that function back
+OPENAI_API_KEY = None # None: read from the environment (or .env) at run time
+LOCAL_LLM_PROVIDER = "ollama" # "ollama", or "lmstudio" for LM Studio (or any other OpenAI-compatible local server)
 OLLAMA_MODEL = "mistral"
-TEMP_AUDIO_FILENAME = "temp_story_audio.mp3"
+OLLAMA_HOST = None # None: $OLLAMA_HOST, else the ollama client's default (http://127.0.0.1:11434)
+LMSTUDIO_MODEL_ID = "mistral-7b-instruct-v0.3" # Model identifier as the LM Studio server lists it
+LMSTUDIO_BASE_URL = "http://localhost:1234/v1" # OpenAI-compatible endpoint (LM Studio, llama.cpp server, vLLM)
+LLM_KEEP_ALIVE = "30m" # Keep the model loaded this long after each request (negative: forever), so jobs don't reload it
+LLM_MAX_CONCURRENCY = 4 # Script requests in flight at once; match the server's parallel slots (e.g. OLLAMA_NUM_PARALLEL)
+TEMP_AUDIO_FILENAME = "temp_story_audio.wav" # WAV: read straight into memory by the later stages, no decoding
+
+# --- TTS Configuration ---
+# Models: "tts-1" (faster), "tts-1-hd" (higher quality), "gpt-4o-mini-tts" (newest)
+# Voices: "alloy", "echo", "fable", "onyx", "nova", "shimmer" (coral for gpt-4o-mini-tts)
+TTS_MODEL = "tts-1"
+TTS_VOICE = "echo"
+TTS_SPEED = 1.4  # Speed up the speech (0.25-4.0, default 1.0)
+TTS_CHUNKED = True  # Split the script at sentence boundaries and synthesize the chunks in parallel
+TTS_MAX_CONCURRENCY = 4  # Max chunk requests in flight at once
+TTS_MAX_RETRIES = 5  # Retries per chunk on rate limits / connection errors (exponential backoff)
+TTS_CHUNK_MIN_CHARS = 40  # Shorter sentences are merged with the next one
+STREAM_SCRIPT_TO_TTS = False  # Stream the script from the LLM and start TTS on each sentence as soon as it is written (needs TTS_CHUNKED)
 
 # --- Whisper Configuration ---
 WHISPER_MODEL_SIZE = "base" # Options: "tiny", "base", "small", "medium", "large"
 WHISPER_DEVICE = "cpu" # Use "cpu" for reliability, "mps" might work on M4 Pro but can be less stable
+WHISPER_QUANTIZE_INT8 = False # When True (CPU only), uses a dynamically int8-quantized copy of the model for faster inference
+WHISPER_NUM_THREADS = None # Torch intra-op threads used for inference; None keeps torch's default (all cores)
+WHISPER_NUM_INTEROP_THREADS = None # Torch inter-op threads; None keeps torch's default
+TIMESTAMP_MODE = "align" # "align": align the known script to the audio (fast), "transcribe": full Whisper transcription
+ALIGNMENT_MIN_CONFIDENCE = 0.4 # Mean word confidence below which alignment falls back to transcription
+ALIGNMENT_MAX_COLLAPSED_RATIO = 0.3 # Max share of words squeezed to ~0s before alignment falls back to transcription
+LONG_AUDIO_SECONDS = 180 # Transcriptions of longer audio are split at pauses and run in parallel worker processes; None disables
+LONG_AUDIO_CHUNK_SECONDS = 60 # Target chunk length; chunks are cut in the middle of the longest nearby pause
+LONG_AUDIO_MAX_CHUNK_SECONDS = 90 # Hard chunk limit (speech without any pause is cut at its quietest point)
+LONG_AUDIO_WORKERS = 2 # Worker processes, each keeping its own warm Whisper model; 1 transcribes the chunks in this process (batch.py's timestamp workers always do)
 
 # --- Video Configuration ---
 BACKGROUND_VIDEO_DIR = "background_videos" # Folder for input videos
 BACKGROUND_VIDEO_FILENAME = "minecraft_parkour_4.mp4"  # The background video file
 BACKGROUND_VIDEO_PATH = os.path.join(BACKGROUND_VIDEO_DIR, BACKGROUND_VIDEO_FILENAME)
+BACKGROUND_SELECTION = "random"  # "random": pick a video and a keyframe start from BACKGROUND_VIDEO_DIR, "fixed": always BACKGROUND_VIDEO_PATH from 0s
+BACKGROUND_INDEX_PATH = os.path.join(BACKGROUND_VIDEO_DIR, ".background_index.json")  # Probed metadata + keyframes of the library
+BACKGROUND_SEED = None  # Seed for the random pick; None seeds it with the narration audio, so reruns pick the same segment
+BACKGROUND_PROXIES = False  # Conform the library once to OUTPUT_SIZE/OUTPUT_FPS and render from those proxies (needs OUTPUT_SIZE; OUTPUT_FPS None keeps each video's fps)
+BACKGROUND_PROXY_DIR = os.path.join(BACKGROUND_VIDEO_DIR, ".proxies")
+BACKGROUND_PROXY_GOP_SECONDS = 1.0  # Keyframe interval of the proxies (every keyframe is a possible segment start)
 OUTPUT_VIDEO_FILENAME = "final_story_video.mp4"
 OUTPUT_VIDEO_DIR = "output_videos" # Folder to save final videos
+OUTPUT_SIZE = None  # (width, height) of the final video, e.g. (1080, 1920); other backgrounds are center-cropped and scaled. None keeps the background's size
+OUTPUT_FPS = None  # Frame rate of the final video; None keeps the background's fps
 # Caption Styling (Minecraft-style with large white text and black outline)
 CAPTION_FONT = 'Impact'  # Use Impact font for that Minecraft-style blocky appearance
 SINGLE_CAPTION_FONTSIZE = 65
@@ -36,21 +87,48 @@ MULTI_CAPTION_FONTSIZE = 35
 CAPTION_COLOR = 'white'  # White text
 CAPTION_STROKE_COLOR = 'black'  # Black outline
 CAPTION_STROKE_WIDTH = 2.0  # Strong outline
+CAPTION_RENDERER = "pillow"  # "pillow": in-process rasterizer with caching, "imagemagick": moviepy TextClip (one subprocess per caption)
+CAPTION_FONT_PATH = None  # Optional path to the .ttf for CAPTION_FONT (searched in the system font folders when None)
+CAPTION_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Memory budget for rendered captions
+CAPTION_CACHE_DIR = None  # Optional folder to keep rendered captions on disk between runs (e.g. ".caption_cache")
+CAPTION_COMPOSITOR = "overlay"  # "overlay": blend only the active caption onto each frame, "layers": one CompositeVideoClip layer per caption
+CAPTION_LAYOUT = "fit"  # "fit": plan caption groups, line breaks, font sizes and timing from font metrics so every caption fits the frame (changes every caption's timing), "fixed": the previous groups of 3 words at the configured sizes
+CAPTION_MAX_WIDTH = 0.9  # "fit" layout: widest caption line, as a fraction of the frame width
+CAPTION_MAX_LINES = 2  # "fit" layout: lines per caption
+CAPTION_MAX_WORDS = 3  # "fit" layout: words per grouped caption
+CAPTION_MIN_FONTSIZE = 24  # "fit" layout: captions too wide for the frame are shrunk, but never below this size
+CAPTION_MAX_CPS = 17  # "fit" layout: reading speed limit (characters per second; None disables); grouped captions too fast to read are merged with a neighbour within CAPTION_MAX_WORDS, and captions stay up into the following pause
+CAPTION_MAX_SECONDS = 3.0  # "fit" layout: longest stretch of speech one grouped caption covers
+CAPTION_PAUSE_BREAK = 0.4  # "fit" layout: a pause this long (seconds) between two words always starts a new caption
+IMAGEMAGICK_BINARY = None  # Only used by the "imagemagick" renderer; None: $IMAGEMAGICK_BINARY, else magick/convert from the PATH
+
+# --- Render Backend ---
+RENDER_BACKEND = "moviepy"  # "moviepy": frame-by-frame compositing in Python, "ffmpeg": one ffmpeg run with burned-in ASS subtitles, "chunked": moviepy compositing split into time ranges rendered in parallel processes
+VIDEO_PRESET = "medium"  # libx264 preset of the final encode ("ultrafast" ... "veryslow"; faster presets make bigger files)
+RENDER_WORKERS = None  # Processes of the "chunked" backend, each rendering and encoding one time range; None: one per core
+RENDER_GOP_SECONDS = 2.0  # Keyframe interval of the "chunked" backend; ranges start on these keyframes so the parts join seamlessly
+PREVIEW_SCALE = 1 / 3  # Preview renders (render --preview): fraction of the output size; captions are scaled to match
+PREVIEW_FPS = 10  # Preview renders: frame rate (caption timing is the same as in the full render)
+PREVIEW_PRESET = "ultrafast"  # Preview renders: libx264 preset
+PREVIEW_SHEET_COLUMNS = 6  # Contact sheets (render --contact-sheet): tiles per row
+
+# --- Artifact Cache ---
+ARTIFACT_CACHE_ENABLED = True  # Reuse stage outputs (script, audio, timestamps, video) whose inputs haven't changed
+ARTIFACT_CACHE_DIR = ".artifact_cache"
+ARTIFACT_CACHE_MAX_BYTES = 5 * 1024 ** 3  # Least recently used artifacts are evicted above this size
+PIPELINE_STAGES = ["script", "audio", "timestamps", "video"]
+
+# --- Instrumentation ---
+METRICS_ENABLED = True  # Write wall/CPU time and peak memory per stage and sub-span after each run
+METRICS_JSONL_PATH = "run_metrics.jsonl"  # One JSON record per span, appended for every run
+METRICS_PROM_PATH = "run_metrics.prom"  # Prometheus text file with the last run's metrics
+PROFILE_RENDER = None  # "cprofile" or "py-spy": profile the render loop and save the profile next to the output video
 
 # --- Caption Mode Toggle ---
 ENABLE_WORD_GROUPING = True  # When True, displays words in groups; when False, displays one word at a time
 
-#Generate a script for a story
-def generate_script_ollama(idea, model_name="mistral"): # Or specify a more precise model like "mistral:7b"
-    print(f"Generating script with Ollama ({model_name})...")
-    try:
-        # Make sure Ollama server is running and the model is pulled/available
-        response = ollama.chat(
-            model=model_name,
-            messages=[
-                {
-                    "role": "system", 
-                    "content": """
+# System prompt for script generation (also part of the script cache key)
+SCRIPT_SYSTEM_PROMPT = """
                     You are a writer specializing in short, viral stories with unexpected twists, perfect for platforms like Reddit or short-form video. Your goal is to create narratives that immediately present a shocking or seemingly clear-cut situation, often negative (like a scandal, betrayal, or bizarre behavior), and then reveal hidden context or a twist later that completely re-frames the initial perception, creating a moral gray area.
 
                     Key requirements:
@@ -63,48 +141,246 @@ def generate_script_ollama(idea, model_name="mistral"): # Or specify a more prec
                     7.  **Use simple diction and words that are easy to pronounce and understand**
                     8.  **Length:** Aim for 300 words.
                     """
-                 },
-                {
-                    "role": "user",
-                    "content": f"Write a story based on this core idea: {idea}"
-                }
-            ]
-        )
-        script = response['message']['content']
+
+# --- Runtime Configuration ---
+# The settings above are defaults. Anything that depends on the machine (API key, ffmpeg and ImageMagick
+# paths) is looked up when it is first needed, and configure() applies overrides when a run starts.
+_DERIVED_PATHS = {
+    'BACKGROUND_VIDEO_PATH': lambda: os.path.join(BACKGROUND_VIDEO_DIR, BACKGROUND_VIDEO_FILENAME),
+    'BACKGROUND_INDEX_PATH': lambda: os.path.join(BACKGROUND_VIDEO_DIR, ".background_index.json"),
+    'BACKGROUND_PROXY_DIR': lambda: os.path.join(BACKGROUND_VIDEO_DIR, ".proxies"),
+}
+
+def parse_setting(assignment):
+    """Parses "NAME=VALUE" (VALUE as a Python literal, else a plain string) into (name, value)."""
+    name, sep, value = assignment.partition("=")
+    name = name.strip()
+    if not sep or not name.isupper() or name.startswith("_") or name not in globals():
+        raise ValueError(f"Unknown setting '{name}' (expected NAME=VALUE with a setting from main.py)")
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return name, value
+
+def configure(overrides=(), env_file=None):
+    """
+    Loads .env (or env_file) into the environment and applies "NAME=VALUE" overrides to the settings.
+    Paths derived from BACKGROUND_VIDEO_DIR follow it unless they are overridden too.
+    Raises ValueError for an unknown setting.
+    """
+    load_dotenv(env_file)
+    parsed = dict(parse_setting(assignment) for assignment in overrides)
+    globals().update(parsed)
+    for name, derive in _DERIVED_PATHS.items():
+        if name not in parsed and ({'BACKGROUND_VIDEO_DIR', 'BACKGROUND_VIDEO_FILENAME'} & parsed.keys()):
+            globals()[name] = derive()
+    return parsed
+
+def openai_api_key():
+    return OPENAI_API_KEY or os.getenv("OPENAI_API_KEY")
+
+def ffmpeg_binary():
+    """
+    The ffmpeg executable, chosen like moviepy does ($FFMPEG_BINARY, else the imageio-ffmpeg build)
+    without importing moviepy.
+    """
+    binary = os.getenv("FFMPEG_BINARY", "ffmpeg-imageio")
+    if binary == "ffmpeg-imageio":
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    if binary == "auto-detect":
+        return shutil.which("ffmpeg") or "ffmpeg"
+    return binary
+
+def imagemagick_binary():
+    """The ImageMagick executable for the "imagemagick" caption renderer, or None if there is none."""
+    return (IMAGEMAGICK_BINARY or os.getenv("IMAGEMAGICK_BINARY")
+            or shutil.which("magick") or shutil.which("convert"))
+
+# Third-party modules each pipeline stage imports on first use
+STAGE_IMPORTS = {
+    'script': ["ollama"],  # "openai" and "httpx" with LOCAL_LLM_PROVIDER = "lmstudio"
+    'audio': ["openai", "httpx"],
+    'timestamps': ["whisper_timestamped"],
+    'video': ["moviepy.editor"],
+}
+
+def import_stage_modules(stages=None):
+    """Imports the heavy modules of the given stages (default: all) up front, e.g. to warm up a long-lived process."""
+    import importlib
+    for stage in stages or PIPELINE_STAGES:
+        modules = STAGE_IMPORTS.get(stage, [])
+        if stage == "script" and LOCAL_LLM_PROVIDER != "ollama":
+            modules = STAGE_IMPORTS['audio']  # The OpenAI client talks to the OpenAI-compatible server
+        for module in modules:
+            importlib.import_module(module)
+
+#Generate a script for a story
+# --- Progress Reporting ---
+# Long-running steps report (step, done, total) to a callback set for the current thread (the render daemon
+# sets one per job); without a callback, reporting does nothing.
+_PROGRESS = threading.local()
+
+def set_progress_callback(callback):
+    _PROGRESS.callback = callback
+
+def report_progress(step, done, total):
+    callback = getattr(_PROGRESS, "callback", None)
+    if callback is not None:
+        callback(step, done, total)
+
+def _script_messages(idea):
+    return [
+        {
+            "role": "system", 
+            "content": SCRIPT_SYSTEM_PROMPT
+         },
+        {
+            "role": "user",
+            "content": f"Write a story based on this core idea: {idea}"
+        }
+    ]
+
+# --- Local LLM Backend ---
+# Created once per process and shared by every script request (batch workers and daemon jobs included), so
+# requests fan out over one connection pool and the model stays loaded between jobs.
+_LLM_BACKEND = None
+
+def llm_model():
+    """The model LOCAL_LLM_PROVIDER writes scripts with."""
+    return OLLAMA_MODEL if LOCAL_LLM_PROVIDER == "ollama" else LMSTUDIO_MODEL_ID
+
+def get_llm_backend():
+    global _LLM_BACKEND
+    if _LLM_BACKEND is None:
+        options = {'keep_alive': LLM_KEEP_ALIVE, 'max_concurrency': LLM_MAX_CONCURRENCY}
+        if LOCAL_LLM_PROVIDER == "ollama":
+            options['host'] = OLLAMA_HOST
+        else:
+            options['base_url'] = LMSTUDIO_BASE_URL
+        _LLM_BACKEND = llm_backends.make_backend(LOCAL_LLM_PROVIDER, llm_model(), **options)
+    return _LLM_BACKEND
+
+def warm_up_llm():
+    """Loads the model on the LLM server and gets the script system prompt into its prompt cache."""
+    try:
+        get_llm_backend().warm_up(SCRIPT_SYSTEM_PROMPT)
+        return True
+    except Exception as e:
+        print(f"Warning: Could not warm up the {LOCAL_LLM_PROVIDER} model: {e}")
+        return False
+
+@instrumentation.stage("script")
+def generate_script(idea, model_name=None):
+    """Writes a story script for the idea with LOCAL_LLM_PROVIDER. Returns the script, or None on failure."""
+    model_name = model_name or llm_model()
+    print(f"Generating script with {LOCAL_LLM_PROVIDER} ({model_name})...")
+    try:
+        # Make sure the LLM server is running and the model is pulled/available
+        script = get_llm_backend().chat(_script_messages(idea), model=model_name)
         print(f"Script: {script}")
         return script
     except Exception as e:
-        print(f"Error connecting to Ollama or generating script: {e}")
-        print("Make sure the Ollama server is running and the model is available.")
+        print(f"Error connecting to {LOCAL_LLM_PROVIDER} or generating script: {e}")
+        print("Make sure the LLM server is running and the model is available.")
         return None # Handle error appropriately
 
+generate_script_ollama = generate_script # Deprecated: the old name, from before LOCAL_LLM_PROVIDER; use generate_script
+
+def generate_scripts(ideas, model_name=None):
+    """
+    Writes the scripts for several ideas with concurrent requests (up to LLM_MAX_CONCURRENCY in flight).
+    Returns the scripts in order, with None for the ideas that failed.
+    """
+    model_name = model_name or llm_model()
+    print(f"Generating {len(ideas)} scripts with {LOCAL_LLM_PROVIDER} ({model_name}), "
+          f"{LLM_MAX_CONCURRENCY} at a time...")
+    results = get_llm_backend().chat_many([_script_messages(idea) for idea in ideas], model=model_name)
+    scripts = []
+    for idea, result in zip(ideas, results):
+        if isinstance(result, Exception):
+            print(f"Error generating the script for '{idea}': {result}")
+            result = None
+        scripts.append(result or None)
+    return scripts
+
+#Generate speech for the script
+# --- OpenAI Clients ---
+# Created once per process and reused, so connections are pooled across TTS calls.
+_OPENAI_CLIENT = None
+_PARALLEL_TTS = None
+
+def get_openai_client():
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        import openai
+        _OPENAI_CLIENT = openai.OpenAI(api_key=openai_api_key())
+    return _OPENAI_CLIENT
+
+def get_parallel_tts():
+    global _PARALLEL_TTS
+    if _PARALLEL_TTS is None:
+        _PARALLEL_TTS = parallel_tts.ParallelTTS(api_key=openai_api_key(), max_concurrency=TTS_MAX_CONCURRENCY,
+                                                 max_retries=TTS_MAX_RETRIES)
+    return _PARALLEL_TTS
+
+# --- Narration Audio ---
+# The narration is decoded at most once per process; Whisper and the renderers all read the same buffer.
+def save_narration(pcm, output_path):
+    """Saves TTS PCM (24kHz s16le mono) to output_path and keeps it in memory for the later stages."""
+    return narration_audio.save(narration_audio.NarrationAudio.from_pcm(pcm, parallel_tts.PCM_SAMPLE_RATE),
+                                output_path, ffmpeg_binary())
+
+def load_narration(audio_path):
+    """Returns the narration's in-memory PCM buffer, decoding the file only on first use."""
+    return narration_audio.load(audio_path, ffmpeg_binary())
+
+def _generate_audio_chunked(script_text, output_path, voice):
+    """
+    Synthesizes the script sentence by sentence in parallel and stitches the chunks into one track.
+    The chunk boundaries (offsets in the final audio) are saved next to it as <audio>_chunks.json.
+    """
+    chunks = parallel_tts.split_sentences(script_text, min_chars=TTS_CHUNK_MIN_CHARS)
+    print(f"Synthesizing {len(chunks)} chunks (up to {TTS_MAX_CONCURRENCY} at once)...")
+    pcm_chunks = get_parallel_tts().synthesize(chunks, TTS_MODEL, voice, TTS_SPEED)
+    pcm, offsets = parallel_tts.stitch_pcm(pcm_chunks, chunks)
+    save_narration(pcm, output_path)
+    chunks_path = parallel_tts.write_chunk_table(os.path.splitext(output_path)[0] + "_chunks.json", offsets)
+    print(f"Chunk offsets saved to {chunks_path}")
+
 #Generate speech for the script
 # --- Text-to-Speech Function ---
-def generate_audio_openai(script_text, output_path):
-    """Generates audio from text using OpenAI TTS and saves it."""
+@instrumentation.stage("audio")
+def generate_audio_openai(script_text, output_path, voice=None):
+    """Generates audio from text using OpenAI TTS and saves it. voice defaults to TTS_VOICE."""
     print(f"Generating audio using OpenAI TTS...")
-    if not OPENAI_API_KEY:
+    if not openai_api_key():
         print("Error: OPENAI_API_KEY not found in environment variables.")
         return False
     if not script_text:
         print("Error: No script text provided to generate audio.")
         return False
 
+    import openai
+    voice = voice or TTS_VOICE
     try:
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        # You can choose different models and voices:
-        # Models: "tts-1" (faster), "tts-1-hd" (higher quality), "gpt-4o-mini-tts" (newest)
-        # Voices: "alloy", "echo", "fable", "onyx", "nova", "shimmer" (coral for gpt-4o-mini-tts)
-        # Stream the audio directly to the file
-        with open(output_path, "wb") as file:
-            with client.audio.speech.with_streaming_response.create(
-                model="tts-1",
-                voice="echo",
-                input=script_text,
-                speed=1.4  # Speed up the speech (0.25-4.0, default 1.0)
-            ) as response:
-                for chunk in response.iter_bytes():
-                    file.write(chunk)
+        if TTS_CHUNKED:
+            _generate_audio_chunked(script_text, output_path, voice)
+            print(f"Audio successfully saved to {output_path}")
+            return True
+
+        client = get_openai_client()
+        # Model, voice and speed are set in the TTS Configuration section
+        # Raw PCM is requested: it is kept in memory for the later stages and written without re-encoding
+        with client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=voice,
+            input=script_text,
+            speed=TTS_SPEED,
+            response_format="pcm"
+        ) as response:
+            pcm = b"".join(response.iter_bytes())
+        save_narration(pcm, output_path)
         print(f"Audio successfully saved to {output_path}")
         return True
     except openai.APIConnectionError as e:
@@ -120,11 +396,227 @@ def generate_audio_openai(script_text, output_path):
         print(f"An unexpected error occurred during TTS generation: {e}")
         return False
     
+# --- Streaming Script + TTS ---
+@instrumentation.stage("script_audio", ok=lambda result: result[0] is not None)
+def generate_script_and_audio_streaming(idea, audio_path, model_name=None, voice=None):
+    """
+    Streams the script from the LLM and sends each finished sentence to TTS right away, so speech synthesis
+    overlaps with script generation. The script is the same text generate_script returns, and the
+    audio (plus <audio>_chunks.json) is written like the chunked TTS path writes it. voice defaults to TTS_VOICE.
+    Returns (script, timings) where timings has 'first_audio' (time until the first chunk's audio arrived),
+    'script' (time until the script was complete) and 'total' in seconds, or (None, None) on failure.
+    """
+    model_name = model_name or llm_model()
+    voice = voice or TTS_VOICE
+    print(f"Streaming script from {LOCAL_LLM_PROVIDER} ({model_name}) into TTS...")
+    if not openai_api_key():
+        print("Error: OPENAI_API_KEY not found in environment variables.")
+        return None, None
+
+    tts = get_parallel_tts()
+    splitter = parallel_tts.SentenceStream(min_chars=TTS_CHUNK_MIN_CHARS)
+    chunks, futures, first_audio = [], [], []
+    started = time.perf_counter()
+
+    def submit(new_chunks):
+        for text in new_chunks:
+            future = tts.submit(len(chunks), text, TTS_MODEL, voice, TTS_SPEED)
+            future.add_done_callback(lambda f: first_audio.append(time.perf_counter() - started))
+            chunks.append(text)
+            futures.append(future)
+
+    try:
+        parts = []
+        for content in get_llm_backend().stream(_script_messages(idea), model=model_name):
+            parts.append(content)
+            submit(splitter.feed(content))
+        submit(splitter.close())
+        script_seconds = time.perf_counter() - started
+        script = "".join(parts)
+        print(f"Script: {script}")
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        print(f"Error connecting to {LOCAL_LLM_PROVIDER} or generating script: {e}")
+        print("Make sure the LLM server is running and the model is available.")
+        return None, None
+    if not chunks:
+        print(f"Error: {LOCAL_LLM_PROVIDER} returned an empty script.")
+        return None, None
+
+    try:
+        print(f"Script complete after {script_seconds:.2f}s, waiting for {len(chunks)} TTS chunks...")
+        pcm, offsets = parallel_tts.stitch_pcm([future.result() for future in futures], chunks)
+        save_narration(pcm, audio_path)
+        parallel_tts.write_chunk_table(os.path.splitext(audio_path)[0] + "_chunks.json", offsets)
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        print(f"An unexpected error occurred during TTS generation: {e}")
+        return None, None
+
+    timings = {'first_audio': min(first_audio), 'script': script_seconds, 'total': time.perf_counter() - started}
+    print(f"Audio successfully saved to {audio_path}")
+    print(f"Time to first audio: {timings['first_audio']:.2f}s, total: {timings['total']:.2f}s")
+    return script, timings
+
+# --- Whisper Model Registry ---
+# Loaded models are kept here for the lifetime of the process, keyed by (size, device, quantized),
+# so repeated calls to get_word_timestamps don't pay for reloading weights and warming torch.
+_WHISPER_MODELS = {}
+_TORCH_THREADS_CONFIGURED = False
+
+def configure_torch_threads(num_threads=None, num_interop_threads=None):
+    """
+    Applies the torch thread settings once per process (inter-op threads can't change after first use).
+    Arguments left as None use the WHISPER_*_THREADS settings at call time.
+    """
+    global _TORCH_THREADS_CONFIGURED
+    if _TORCH_THREADS_CONFIGURED:
+        return
+    num_threads = num_threads or WHISPER_NUM_THREADS
+    num_interop_threads = num_interop_threads or WHISPER_NUM_INTEROP_THREADS
+    import torch
+    if num_threads:
+        torch.set_num_threads(int(num_threads))
+    if num_interop_threads:
+        try:
+            torch.set_num_interop_threads(int(num_interop_threads))
+        except RuntimeError as e:
+            print(f"Warning: Could not set torch inter-op threads: {e}")
+    _TORCH_THREADS_CONFIGURED = True
+
+def _quantize_whisper_model(model):
+    """
+    Applies dynamic int8 quantization to the Linear layers of a Whisper model (in place).
+    Whisper uses its own Linear subclass, which torch's quantizer skips, so those layers are
+    swapped for plain torch.nn.Linear modules sharing the same weights first.
+    """
+    import torch
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                plain.weight = child.weight
+                plain.bias = child.bias
+                setattr(module, name, plain)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def get_whisper_model(model_size=None, device=None, quantize=None):
+    """
+    Returns a loaded Whisper model, loading it only on first use for each (size, device, quantized) combination.
+    Arguments left as None use the WHISPER_* settings at call time.
+    Quantization is only supported on CPU; it is ignored for other devices.
+    """
+    model_size = model_size or WHISPER_MODEL_SIZE
+    device = device or WHISPER_DEVICE
+    quantize = WHISPER_QUANTIZE_INT8 if quantize is None else quantize
+    if quantize and device != "cpu":
+        print(f"Warning: int8 quantization is only supported on CPU, loading the regular model on '{device}'.")
+        quantize = False
+    key = (model_size, device, bool(quantize))
+    model = _WHISPER_MODELS.get(key)
+    if model is not None:
+        print(f"Reusing loaded Whisper model '{model_size}' on device '{device}'{' (int8)' if quantize else ''}.")
+        return model
+
+    configure_torch_threads()
+    # Downloads the model automatically on first run for the specified size.
+    print(f"Loading Whisper model '{model_size}' on device '{device}' (this may take time)...")
+    with instrumentation.span("model_load", size=model_size, device=device, quantized=bool(quantize)):
+        import whisper_timestamped as whisper
+        model = whisper.load_model(model_size, device=device)
+        if quantize:
+            print("Applying dynamic int8 quantization...")
+            model = _quantize_whisper_model(model)
+        model.eval()
+    _WHISPER_MODELS[key] = model
+    print("Whisper model loaded.")
+    return model
+
+def clear_whisper_models():
+    """Drops all cached Whisper models (frees their memory)."""
+    _WHISPER_MODELS.clear()
+
+# --- Long Audio Transcription ---
+# Long narrations are split at pauses (voice activity detection) and the chunks are transcribed in parallel
+# by a pool of worker processes that each load the Whisper model once and keep it for later calls.
+WHISPER_SAMPLE_RATE = narration_audio.WHISPER_SAMPLE_RATE # Whisper works on 16 kHz mono
+_TRANSCRIBE_POOL = None
+
+def _init_transcribe_worker(model_size, device, quantize, num_threads):
+    """Loads the Whisper model once per worker process, with the cores split between the workers."""
+    configure_torch_threads(num_threads, WHISPER_NUM_INTEROP_THREADS)
+    get_whisper_model(model_size, device, quantize)
+
+def _transcribe_chunk_task(audio_chunk, model_size, device, quantize):
+    import whisper_timestamped as whisper
+    model = get_whisper_model(model_size, device, quantize)
+    result = whisper.transcribe(model, audio_chunk, language="en", beam_size=5, best_of=5, vad=False)
+    return result.get('segments', [])
+
+def get_transcribe_pool():
+    """Returns the process-wide pool of transcription workers, starting it on first use."""
+    global _TRANSCRIBE_POOL
+    if _TRANSCRIBE_POOL is None:
+        workers = max(1, LONG_AUDIO_WORKERS)
+        threads = max(1, (WHISPER_NUM_THREADS or os.cpu_count() or 1) // workers)
+        print(f"Starting {workers} transcription worker(s) with {threads} thread(s) each...")
+        # Spawned (not forked) workers: torch doesn't survive a fork of a threaded process
+        _TRANSCRIBE_POOL = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_transcribe_worker,
+            initargs=(WHISPER_MODEL_SIZE, WHISPER_DEVICE, WHISPER_QUANTIZE_INT8, threads),
+        )
+    return _TRANSCRIBE_POOL
+
+def shutdown_transcribe_pool():
+    """Stops the transcription workers (frees their models)."""
+    global _TRANSCRIBE_POOL
+    if _TRANSCRIBE_POOL is not None:
+        _TRANSCRIBE_POOL.shutdown()
+        _TRANSCRIBE_POOL = None
+
+def transcribe_long_audio(audio):
+    """
+    Transcribes 16 kHz audio in chunks cut at pauses, in parallel in LONG_AUDIO_WORKERS worker processes (in
+    this process when it is 1), and merges the chunks' segments into one continuous list with word times on
+    the original timeline. Returns a result dict like whisper.transcribe.
+    """
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    with instrumentation.span("vad"):
+        levels = vad_chunking.frame_levels(audio, WHISPER_SAMPLE_RATE)
+        speech = vad_chunking.find_speech(levels)
+        chunks = vad_chunking.plan_chunks(speech, duration, levels, LONG_AUDIO_CHUNK_SECONDS, LONG_AUDIO_MAX_CHUNK_SECONDS)
+    print(f"Split {duration:.1f}s of audio into {len(chunks)} chunks at pauses: "
+          + ", ".join(f"{start:.1f}-{end:.1f}s" for start, end in chunks))
+
+    with instrumentation.span("transcribe", chunks=len(chunks), workers=max(1, LONG_AUDIO_WORKERS)):
+        pieces = [audio[int(start * WHISPER_SAMPLE_RATE):int(end * WHISPER_SAMPLE_RATE)] for start, end in chunks]
+        if LONG_AUDIO_WORKERS <= 1:
+            # One after another on this process's model: no second copy of the model in a worker
+            chunk_results = [(chunk, _transcribe_chunk_task(piece, WHISPER_MODEL_SIZE, WHISPER_DEVICE, WHISPER_QUANTIZE_INT8))
+                             for chunk, piece in zip(chunks, pieces)]
+        else:
+            pool = get_transcribe_pool()
+            futures = [pool.submit(_transcribe_chunk_task, piece, WHISPER_MODEL_SIZE, WHISPER_DEVICE, WHISPER_QUANTIZE_INT8)
+                       for piece in pieces]
+            chunk_results = [(chunk, future.result()) for chunk, future in zip(chunks, futures)]
+    segments = vad_chunking.merge_chunk_segments(chunk_results)
+    return {
+        'text': "".join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': "en",
+        'chunks': [{'start': start, 'end': end} for start, end in chunks],
+    }
+
 # --- NEW: Word Timestamp Function ---
-def get_word_timestamps(audio_path):
+@instrumentation.stage("timestamps")
+def get_word_timestamps(audio_path, script_text=None):
     """
-    Transcribes audio using whisper-timestamped to get word-level timestamps.
-    Requires ffmpeg to be installed system-wide.
+    Gets word-level timestamps for the audio.
+    When the script text is known and TIMESTAMP_MODE is "align", the script is force-aligned to the
+    audio (no decoding search); otherwise, or if alignment quality is poor, the audio is transcribed
+    using whisper-timestamped. Requires ffmpeg to be installed system-wide.
     """
     print(f"\n--- Starting Word Timestamp Generation ---")
     print(f"Processing audio file: {audio_path}")
@@ -132,21 +624,32 @@ def get_word_timestamps(audio_path):
         print(f"Error: Audio file not found at {audio_path}")
         return None
 
-    try:
-        # Load the Whisper model (runs locally).
-        # Downloads the model automatically on first run for the specified size.
-        print(f"Loading Whisper model '{WHISPER_MODEL_SIZE}' on device '{WHISPER_DEVICE}' (this may take time)...")
-        model = whisper.load_model(WHISPER_MODEL_SIZE, device=WHISPER_DEVICE)
-        print("Whisper model loaded.")
+    if TIMESTAMP_MODE == "align" and script_text:
+        segments = align_script_to_audio(audio_path, script_text)
+        if segments is not None:
+            print(f"--- Word Timestamp Generation Finished (Aligned) ---")
+            return segments
+        print("Falling back to full transcription...")
 
+    try:
         print("Loading audio data...")
-        audio = whisper.load_audio(audio_path)
+        with instrumentation.span("audio_decode"):
+            audio = load_narration(audio_path).for_whisper()
         print("Audio data loaded.")
 
-        print("Transcribing and aligning audio (this is the core Whisper process)...")
-        # Perform transcription with word-level timestamps
-        # beam_size=5 and best_of=5 can improve accuracy but slow down transcription
-        result = whisper.transcribe(model, audio, language="en", beam_size=5, best_of=5, vad=False)
+        audio_seconds = len(audio) / WHISPER_SAMPLE_RATE
+        if LONG_AUDIO_SECONDS and audio_seconds > LONG_AUDIO_SECONDS:
+            result = transcribe_long_audio(audio)
+        else:
+            # Get the Whisper model (runs locally), loaded once and reused across calls.
+            model = get_whisper_model()
+
+            print("Transcribing and aligning audio (this is the core Whisper process)...")
+            # Perform transcription with word-level timestamps
+            # beam_size=5 and best_of=5 can improve accuracy but slow down transcription
+            with instrumentation.span("transcribe"):
+                import whisper_timestamped as whisper
+                result = whisper.transcribe(model, audio, language="en", beam_size=5, best_of=5, vad=False)
         print("Transcription and alignment complete.")
 
         # Optional: Save the full transcription result as JSON for inspection
@@ -173,23 +676,511 @@ def get_word_timestamps(audio_path):
         print(f"--- Word Timestamp Generation Failed ---")
         return None
 
+# --- Script Alignment Function ---
+ALIGNMENT_WINDOW_MARGIN = 2.0 # Seconds at the end of each 30s window whose words are re-aligned in the next window
+ALIGNMENT_MAX_TOKENS = 400 # Text tokens per window (Whisper's decoder context is 448)
+
+def _script_to_segments(aligned_words):
+    """Groups aligned words into sentence segments shaped like whisper-timestamped output."""
+    segments = []
+    current = []
+    for i, word in enumerate(aligned_words):
+        current.append(word)
+        if word['text'].rstrip('"\')').endswith(('.', '!', '?')) or i == len(aligned_words) - 1:
+            segments.append({
+                'id': len(segments),
+                'start': current[0]['start'],
+                'end': current[-1]['end'],
+                'text': " " + " ".join(w['text'] for w in current),
+                'words': current,
+                'confidence': round(sum(w['confidence'] for w in current) / len(current), 3),
+            })
+            current = []
+    return segments
+
+def align_script_to_audio(audio_path, script_text):
+    """
+    Force-aligns the known script to the audio to get word-level timestamps.
+    Runs the Whisper encoder once per 30s window and reads word timings from the cross-attention
+    alignment of the script tokens (DTW), skipping the beam-search decoding entirely.
+    Returns segments in the same shape as get_word_timestamps (with a per-word 'confidence'),
+    or None if alignment failed or its quality is below ALIGNMENT_MIN_CONFIDENCE.
+    """
+    from whisper.audio import log_mel_spectrogram, N_FRAMES, N_SAMPLES, HOP_LENGTH, SAMPLE_RATE
+    from whisper.timing import find_alignment
+    from whisper.tokenizer import get_tokenizer
+
+    script_words = script_text.split()
+    if not script_words:
+        print("Error: No script text provided to align.")
+        return None
+
+    try:
+        model = get_whisper_model()
+        print("Loading audio data...")
+        with instrumentation.span("audio_decode"):
+            audio = load_narration(audio_path).for_whisper()
+        print("Audio data loaded.")
+
+        print(f"Aligning {len(script_words)} script words to the audio...")
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, language="en", task="transcribe")
+        word_tokens = [tokenizer.encode(" " + w) for w in script_words]
+        with instrumentation.span("align", words=len(script_words)):
+            mel = log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES).to(model.device)
+            total_frames = mel.shape[-1] - N_FRAMES
+            frames_per_second = SAMPLE_RATE / HOP_LENGTH
+            audio_duration = total_frames / frames_per_second
+            # Rough speaking rate, used to guess which words fall inside each window
+            chars_per_second = sum(len(w) + 1 for w in script_words) / max(audio_duration, 1e-6)
+
+            aligned_words = []
+            seek = 0
+            idx = 0
+            while idx < len(script_words):
+                window_frames = min(N_FRAMES, total_frames - seek)
+                window_seconds = window_frames / frames_per_second
+                is_last_window = seek + N_FRAMES >= total_frames
+
+                # Take somewhat more words than should fit; the overflow is squeezed into the window's
+                # tail and gets aligned again in the next window.
+                char_budget = window_seconds * chars_per_second * 1.25
+                end, chars, tokens = idx, 0, []
+                while end < len(script_words) and (is_last_window or chars < char_budget):
+                    if len(tokens) + len(word_tokens[end]) > ALIGNMENT_MAX_TOKENS: break
+                    chars += len(script_words[end]) + 1
+                    tokens.extend(word_tokens[end])
+                    end += 1
+                if end == idx: # A single word over the token budget
+                    tokens = word_tokens[idx][:ALIGNMENT_MAX_TOKENS]
+                    end = idx + 1
+
+                window_mel = mel[:, seek:seek + N_FRAMES]
+                timings = find_alignment(model, tokenizer, tokens, window_mel, window_frames)
+
+                # find_alignment splits punctuation into separate words; merge pieces back into
+                # script words by counting tokens.
+                offset = seek / frames_per_second
+                window_words = []
+                pieces = iter(timings)
+                for word_idx in range(idx, end):
+                    needed = len(word_tokens[word_idx])
+                    start_time = end_time = None
+                    prob_sum = 0.0
+                    while needed > 0:
+                        piece = next(pieces, None)
+                        if piece is None: break
+                        start_time = piece.start if start_time is None else start_time
+                        end_time = piece.end
+                        prob_sum += piece.probability * len(piece.tokens)
+                        needed -= len(piece.tokens)
+                    if start_time is None: break
+                    window_words.append({
+                        'text': script_words[word_idx],
+                        'start': round(float(start_time) + offset, 2),
+                        'end': round(float(end_time) + offset, 2),
+                        'confidence': round(float(prob_sum) / len(word_tokens[word_idx]), 3),
+                    })
+
+                if is_last_window and end == len(script_words):
+                    accepted = window_words
+                else:
+                    cutoff = offset + window_seconds - ALIGNMENT_WINDOW_MARGIN
+                    accepted = [w for w in window_words if w['end'] <= cutoff] or window_words[:1]
+                if not accepted:
+                    print("Error: Alignment produced no words for the current window.")
+                    return None
+
+                aligned_words.extend(accepted)
+                idx += len(accepted)
+                report_progress("align", idx, len(script_words))
+                next_seek = int(round(accepted[-1]['end'] * frames_per_second))
+                seek = max(next_seek, seek + 1)
+                if seek >= total_frames and idx < len(script_words):
+                    # Ran out of audio: the remaining words can't be placed
+                    print(f"Warning: Ran out of audio with {len(script_words) - idx} script words left.")
+                    return None
+
+        # Quality check before trusting the alignment
+        mean_confidence = sum(w['confidence'] for w in aligned_words) / len(aligned_words)
+        collapsed = sum(1 for w in aligned_words if w['end'] - w['start'] < 0.02)
+        collapsed_ratio = collapsed / len(aligned_words)
+        print(f"Alignment complete: mean confidence {mean_confidence:.2f}, {collapsed} collapsed words.")
+        if mean_confidence < ALIGNMENT_MIN_CONFIDENCE or collapsed_ratio > ALIGNMENT_MAX_COLLAPSED_RATIO:
+            print("Warning: Alignment quality is too low.")
+            return None
+
+        segments = _script_to_segments(aligned_words)
+        json_output_path = os.path.splitext(audio_path)[0] + "_timestamps.json"
+        with open(json_output_path, "w", encoding="utf-8") as f:
+            json.dump({'text': script_text, 'segments': segments, 'language': 'en', 'mode': 'align',
+                       'confidence': round(mean_confidence, 3)}, f, indent=2, ensure_ascii=False)
+        print(f"Full timestamp data saved to {json_output_path}")
+        print(f"Successfully aligned {len(aligned_words)} words in {len(segments)} segments.")
+        return segments
+
+    except Exception as e:
+        print(f"An error occurred during script alignment: {e}")
+        return None
+
+# --- Caption Clip Creation ---
+_CAPTION_CACHE = None
+_CAPTION_CACHE_LOCK = threading.Lock()
+
+def get_caption_cache():
+    """Returns the process-wide cache of rendered captions (shared by the daemon's jobs), creating it on first use."""
+    global _CAPTION_CACHE
+    with _CAPTION_CACHE_LOCK:
+        if _CAPTION_CACHE is None:
+            _CAPTION_CACHE = caption_raster.CaptionCache(max_bytes=CAPTION_CACHE_MAX_BYTES, cache_dir=CAPTION_CACHE_DIR)
+        return _CAPTION_CACHE
+
+def make_caption_clip(text, fontsize):
+    """Creates an untimed caption clip in the configured style using CAPTION_RENDERER."""
+    if CAPTION_RENDERER == "pillow":
+        return caption_raster.make_caption_clip(
+            text, CAPTION_FONT, fontsize, CAPTION_COLOR, CAPTION_STROKE_COLOR, CAPTION_STROKE_WIDTH,
+            cache=get_caption_cache(), font_path=CAPTION_FONT_PATH
+        )
+    from moviepy.config import change_settings
+    from moviepy.editor import TextClip
+    binary = imagemagick_binary()
+    if binary:
+        change_settings({"IMAGEMAGICK_BINARY": binary})
+    return TextClip(
+        text,
+        fontsize=fontsize,
+        font=CAPTION_FONT,
+        color=CAPTION_COLOR,
+        stroke_color=CAPTION_STROKE_COLOR,
+        stroke_width=CAPTION_STROKE_WIDTH,
+        method='label',  # 'label' for single line without background
+        align='center'   # Center-align the text
+    )
+
+def make_caption_image(text, fontsize):
+    """Renders a caption in the configured style to an RGBA uint8 array (used by the overlay compositor)."""
+    if CAPTION_RENDERER == "pillow":
+        font_path = caption_raster.resolve_font_path(CAPTION_FONT, CAPTION_FONT_PATH)
+        return get_caption_cache().get(text, font_path, fontsize, CAPTION_COLOR, CAPTION_STROKE_COLOR, CAPTION_STROKE_WIDTH)
+    txt_clip = make_caption_clip(text, fontsize)
+    try:
+        rgb = txt_clip.get_frame(0)
+        alpha = txt_clip.mask.get_frame(0) if txt_clip.mask is not None else np.ones(rgb.shape[:2])
+        return np.dstack([rgb, (alpha * 255).round()]).astype(np.uint8)
+    finally:
+        txt_clip.close()
+
+# --- Caption Timing ---
+def build_caption_cues(segments, audio_duration, word_grouping=None, frame_width=None):
+    """
+    Builds the caption timeline from word timestamps.
+    Returns a list of cues: dicts with 'text', 'start', 'end' (seconds) and 'fontsize'.
+    Uses word groups when word_grouping (default: ENABLE_WORD_GROUPING) is True, otherwise one word at a time.
+    With CAPTION_LAYOUT "fit" the captions are planned to fit frame_width (see plan_caption_cues).
+    """
+    if word_grouping is None:
+        word_grouping = ENABLE_WORD_GROUPING
+    if CAPTION_LAYOUT == "fit":
+        try:
+            return plan_caption_cues(segments, audio_duration, word_grouping, frame_width)
+        except OSError as e:
+            print(f"Warning: Can't measure the caption font ({e}); using the fixed caption layout.")
+
+    # Constants for either mode
+    GROUP_SIZE = 3  # Number of words per group (used only if word grouping)
+    MIN_DURATION = 0.5  # Minimum duration for any caption (in seconds)
+
+    cues = []
+    processed_words = 0
+    total_words = sum(len(s.get('words', [])) for s in segments)
+
+    if word_grouping:
+        # --- WORD GROUPING MODE ---
+        print("Generating caption cues with word grouping...")
+
+        for segment in segments:
+            if 'words' not in segment: continue
+
+            # Process each segment's words in groups
+            word_group = []
+            group_start_time = None
+            group_end_time = None
+
+            for i, word_info in enumerate(segment['words']):
+                word_text = word_info.get('text', '').strip()
+                start_time = word_info.get('start')
+                end_time = word_info.get('end')
+
+                # Skip words outside the audio duration
+                if start_time is not None and start_time >= audio_duration: continue
+                if end_time is not None and end_time > audio_duration: end_time = audio_duration
+
+                # Valid word to add to group
+                if word_text and start_time is not None and end_time is not None and end_time > start_time:
+                    # First word in group - set the starting time
+                    if len(word_group) == 0:
+                        group_start_time = start_time
+
+                    # Add word to group
+                    word_group.append(word_text)
+                    group_end_time = end_time
+                    processed_words += 1
+
+                    # Create caption when group is full or segment ends
+                    if len(word_group) >= GROUP_SIZE or i == len(segment['words']) - 1:
+                        # Only create caption if we have words and timing
+                        if word_group and group_start_time is not None and group_end_time is not None:
+                            group_text = " ".join(word_group)
+                            duration = group_end_time - group_start_time
+
+                            # Ensure minimum duration
+                            if duration < MIN_DURATION:
+                                duration = MIN_DURATION
+
+                            cues.append({'text': group_text, 'start': group_start_time,
+                                         'end': group_start_time + duration, 'fontsize': MULTI_CAPTION_FONTSIZE})
+
+                            # Reset for next group
+                            word_group = []
+                            group_start_time = None
+
+                # Print progress periodically
+                if processed_words % 50 == 0 and processed_words > 0:
+                    print(f"  Processed {processed_words}/{total_words} words...")
+                    report_progress("captions", processed_words, total_words)
+
+        print(f"Created {len(cues)} caption groups from {processed_words} words.")
+
+    else:
+        # --- ONE WORD AT A TIME MODE ---
+        print("Generating one-word-at-a-time caption cues...")
+
+        # Flatten all words for sequential processing
+        all_words = []
+        for segment in segments:
+            if 'words' in segment:
+                all_words.extend(segment['words'])
+
+        # Add a small gap constant to prevent visual overlap
+        GAP_BETWEEN_WORDS = 0.02 # Small gap in seconds
+
+        for i, word_info in enumerate(all_words):
+            word_text = word_info.get('text', '').strip()
+            start_time = word_info.get('start')
+            end_time = word_info.get('end')
+
+            # Skip invalid words or timing
+            if not word_text or start_time is None or end_time is None: continue
+            if start_time >= audio_duration: continue
+            if end_time > audio_duration: end_time = audio_duration
+            if end_time <= start_time: continue # Ensure duration is positive
+
+            # --- Improved Duration Calculation ---
+            # Default duration from whisper
+            calculated_duration = end_time - start_time
+
+            # Look ahead to the next word's start time
+            next_word_start_time = None
+            if i + 1 < len(all_words):
+                next_word_info = all_words[i+1]
+                next_word_start_time = next_word_info.get('start')
+
+            # If there's a next word, cap duration to end slightly before it starts
+            if next_word_start_time is not None and next_word_start_time > start_time:
+                max_duration_before_next = next_word_start_time - start_time - GAP_BETWEEN_WORDS
+                duration = min(calculated_duration, max_duration_before_next)
+            else:
+                # Last word or issue with next word timing, use calculated duration
+                duration = calculated_duration
+
+            # Ensure minimum duration BUT don't exceed original end time or gap
+            duration = max(duration, MIN_DURATION)
+            # Final check: ensure clip doesn't exceed original end_time (if MIN_DURATION pushed it)
+            duration = min(duration, end_time - start_time)
+            # Ensure duration is still positive after adjustments
+            duration = max(duration, 0.01)
+
+            cues.append({'text': word_text, 'start': start_time,
+                         'end': start_time + duration, 'fontsize': SINGLE_CAPTION_FONTSIZE})
+            processed_words += 1
+
+            # Print progress periodically
+            if processed_words % 25 == 0 and processed_words > 0:
+                print(f"  Processed {processed_words}/{total_words} words...")
+                report_progress("captions", processed_words, total_words)
+
+        print(f"Created {len(cues)} individual word captions from {processed_words} words.")
+
+    report_progress("captions", total_words, total_words)
+    return cues
+
+def plan_caption_cues(segments, audio_duration, word_grouping=None, frame_width=None, fontsize=None, font_path=None,
+                      stroke_width=None):
+    """
+    The "fit" caption layout: caption_layout groups the words, wraps the lines and picks the font sizes so
+    every caption fits CAPTION_MAX_WIDTH of the frame and is read at CAPTION_MAX_CPS where the speech allows,
+    from cached glyph metrics (nothing is rasterized). frame_width defaults to OUTPUT_SIZE's width, or 1080
+    when the output size follows the background. fontsize, font_path and stroke_width default to the caption style settings.
+    Returns the cue table (build_caption_cues' cues plus 'lines' and 'cps').
+    """
+    if word_grouping is None:
+        word_grouping = ENABLE_WORD_GROUPING
+    if fontsize is None:
+        fontsize = MULTI_CAPTION_FONTSIZE if word_grouping else SINGLE_CAPTION_FONTSIZE
+    font_path = font_path or caption_raster.resolve_font_path(CAPTION_FONT, CAPTION_FONT_PATH)
+    frame_width = frame_width or (OUTPUT_SIZE[0] if OUTPUT_SIZE else 1080)
+    stroke_width = CAPTION_STROKE_WIDTH if stroke_width is None else stroke_width
+
+    words = []
+    for segment in segments:
+        segment_words = []
+        for word_info in segment.get('words', []):
+            word_text = word_info.get('text', '').strip()
+            start_time, end_time = word_info.get('start'), word_info.get('end')
+            # Same filtering as the fixed layout: valid timing inside the audio
+            if not word_text or start_time is None or end_time is None or start_time >= audio_duration: continue
+            end_time = min(end_time, audio_duration)
+            if end_time <= start_time: continue
+            segment_words.append({'text': word_text, 'start': start_time, 'end': end_time})
+        if segment_words:
+            segment_words[-1]['segment_end'] = True
+            words.extend(segment_words)
+
+    print(f"Planning captions ({'grouped' if word_grouping else 'one word at a time'}) for a {frame_width}px wide frame...")
+    cues = caption_layout.plan_cues(
+        words, caption_layout.get_metrics(font_path), CAPTION_MAX_WIDTH * frame_width, fontsize,
+        min_fontsize=CAPTION_MIN_FONTSIZE, max_lines=CAPTION_MAX_LINES,
+        max_words=CAPTION_MAX_WORDS if word_grouping else 1, max_cps=CAPTION_MAX_CPS, min_duration=0.5,
+        max_duration=CAPTION_MAX_SECONDS, pause_break=CAPTION_PAUSE_BREAK, end_time=audio_duration,
+        stroke_width=stroke_width,
+    )
+    shrunk = sum(1 for cue in cues if cue['fontsize'] < fontsize)
+    wrapped = sum(1 for cue in cues if cue['lines'] > 1)
+    print(f"Planned {len(cues)} captions from {len(words)} words ({wrapped} wrapped, {shrunk} shrunk to fit).")
+    report_progress("captions", len(words), len(words))
+    return cues
+
+def write_cue_table(cues, path):
+    """Writes a caption timeline as JSON (a list of cues, the format render --cues reads)."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cues, f, ensure_ascii=False, indent=1)
+    return path
+
+def trim_cues(cues, duration):
+    """Drops the cues after duration and cuts the last ones at it (for backgrounds shorter than the narration)."""
+    return [dict(cue, end=min(cue['end'], duration)) for cue in cues if cue['start'] < duration]
+
+# --- Background Library ---
+_BACKGROUND_LIBRARY = None
+
+def get_background_library():
+    """Loads the background index once per process and brings it up to date with BACKGROUND_VIDEO_DIR."""
+    global _BACKGROUND_LIBRARY
+    if _BACKGROUND_LIBRARY is None:
+        _BACKGROUND_LIBRARY = background_library.BackgroundLibrary(
+            BACKGROUND_VIDEO_DIR, BACKGROUND_INDEX_PATH, ffmpeg_binary=ffmpeg_binary(),
+            proxy_dir=BACKGROUND_PROXY_DIR
+        )
+        _BACKGROUND_LIBRARY.refresh()
+        if use_background_proxies():
+            _BACKGROUND_LIBRARY.conform(OUTPUT_SIZE[0], OUTPUT_SIZE[1], OUTPUT_FPS, BACKGROUND_PROXY_GOP_SECONDS)
+    return _BACKGROUND_LIBRARY
+
+def use_background_proxies():
+    if BACKGROUND_PROXIES and not OUTPUT_SIZE:
+        print("Warning: BACKGROUND_PROXIES needs OUTPUT_SIZE; rendering from the original backgrounds.")
+        return False
+    return BACKGROUND_PROXIES and BACKGROUND_SELECTION == "random"
+
+def select_background(audio_path):
+    """
+    Returns (background video path, start time in seconds) for this narration.
+    In "random" mode the segment starts on a keyframe and covers the whole audio.
+    """
+    if BACKGROUND_SELECTION != "random":
+        return BACKGROUND_VIDEO_PATH, 0.0
+    audio_duration = load_narration(audio_path).duration
+    seed = BACKGROUND_SEED if BACKGROUND_SEED is not None else artifact_cache.file_digest(audio_path)
+    picked = get_background_library().pick_segment(audio_duration, seed=seed, proxies=use_background_proxies())
+    if picked is None:
+        print(f"Warning: No videos indexed in '{BACKGROUND_VIDEO_DIR}', falling back to {BACKGROUND_VIDEO_PATH}")
+        return BACKGROUND_VIDEO_PATH, 0.0
+    return picked
+
+def background_info(path):
+    """Duration, size and fps of a background video, from the library index when possible (no probing)."""
+    entry = get_background_library().info(path) if BACKGROUND_SELECTION == "random" else None
+    if entry is not None:
+        return {'duration': entry['duration'], 'width': entry['width'], 'height': entry['height'], 'fps': entry['fps']}
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    video_info = ffmpeg_parse_infos(path)
+    width, height = video_info['video_size']
+    if video_info.get('video_rotation') in (90, 270):
+        width, height = height, width
+    return {'duration': video_info['duration'], 'width': width, 'height': height, 'fps': video_info.get('video_fps')}
+
+def output_format(width, height, fps):
+    """The final video's (width, height, fps) for a background of the given format."""
+    out_width, out_height = OUTPUT_SIZE or (width, height)
+    return out_width, out_height, OUTPUT_FPS or fps
+
+def conform_clip(clip, width, height):
+    """
+    Center-crops a moviepy clip to the aspect ratio of width x height and scales it to that size
+    (per frame; conformed proxies skip this). Uses Pillow directly: moviepy's resize needs Pillow < 10.
+    """
+    if (clip.w, clip.h) == (width, height):
+        return clip
+    crop_width = min(clip.w, round(clip.h * width / height))
+    crop_height = min(clip.h, round(clip.w * height / width))
+    clip = clip.crop(x1=(clip.w - crop_width) // 2, y1=(clip.h - crop_height) // 2, width=crop_width, height=crop_height)
+    return clip.fl_image(lambda frame: np.asarray(
+        Image.fromarray(frame).resize((width, height), Image.BILINEAR)
+    ))
+
+def _report_frames(frames, total, every=30):
+    """Passes frames through, reporting render progress every few frames."""
+    for count, frame in enumerate(frames, 1):
+        if count % every == 0:
+            report_progress("render", min(count, total), total)
+        yield frame
+    report_progress("render", total, total)
+
 # --- Video Creation Function (Supports both modes) ---
-def create_video(background_video_path, audio_path, segments, output_path):
+@instrumentation.stage("video")
+def create_video(background_video_path, audio_path, segments, output_path, background_start=0.0, word_grouping=None, cues=None,
+                 preview=None, window=None):
     """
     Creates the final video by combining background video, audio, and word captions.
-    Supports both word grouping and one-word-at-a-time modes based on ENABLE_WORD_GROUPING.
+    Supports both word grouping and one-word-at-a-time modes (word_grouping, default: ENABLE_WORD_GROUPING).
+    The background is used from background_start seconds on (a keyframe, so seeking there is cheap).
+    cues: a caption timeline from build_caption_cues to use instead of building one from segments.
+    preview: "video" for a low-resolution preview, "sheet" for a contact sheet image (see create_preview);
+    window: (start, end) seconds of the timeline a preview covers.
     """
+    if word_grouping is None:
+        word_grouping = ENABLE_WORD_GROUPING
     print(f"\n--- Starting Video Generation ---")
-    print(f"Using background: {background_video_path}")
+    print(f"Using background: {background_video_path} (from {background_start:.2f}s)")
     print(f"Using audio: {audio_path}")
     print(f"Saving to: {output_path}")
-    print(f"Caption Mode: {'Word Grouping' if ENABLE_WORD_GROUPING else 'One Word at a Time'}")
+    print(f"Caption Mode: {'Word Grouping' if word_grouping else 'One Word at a Time'}")
 
     # Basic checks
     if not os.path.exists(background_video_path): return False
     if not os.path.exists(audio_path): return False
     if not segments: return False
 
+    if preview:
+        return create_preview(background_video_path, audio_path, segments, output_path, background_start, word_grouping,
+                              cues, sheet=preview == "sheet", window=window)
+    if RENDER_BACKEND == "ffmpeg":
+        return create_video_ffmpeg(background_video_path, audio_path, segments, output_path, background_start, word_grouping, cues)
+    if RENDER_BACKEND == "chunked":
+        return create_video_chunked(background_video_path, audio_path, segments, output_path, background_start, word_grouping, cues)
+
+    # moviepy.editor also adds the effect methods (crop, ...) to the clip classes
+    from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip
     video_clip = None
     audio_clip = None
     final_clip = None
@@ -199,8 +1190,12 @@ def create_video(background_video_path, audio_path, segments, output_path):
         # Load clips
         print("Loading video and audio clips...")
         video_clip = VideoFileClip(background_video_path)
-        audio_clip = AudioFileClip(audio_path)
-        audio_duration = audio_clip.duration
+        if 0 < background_start < video_clip.duration:
+            video_clip = video_clip.subclip(background_start)
+        out_width, out_height, out_fps = output_format(video_clip.w, video_clip.h, video_clip.fps)
+        video_clip = conform_clip(video_clip, out_width, out_height)
+        narration = load_narration(audio_path)
+        audio_duration = narration.duration
         print(f"Audio duration: {audio_duration:.2f}s")
 
         # Trim video to audio duration
@@ -209,183 +1204,60 @@ def create_video(background_video_path, audio_path, segments, output_path):
             video_clip = video_clip.subclip(0, audio_duration)
         elif video_clip.duration < audio_duration:
              print(f"Warning: Background video ({video_clip.duration:.2f}s) is shorter than audio ({audio_duration:.2f}s). Video will end early.")
-             audio_clip = audio_clip.subclip(0, video_clip.duration)
              audio_duration = video_clip.duration
 
-        print("Assigning audio to video...")
-        video_clip = video_clip.set_audio(audio_clip)
-
-        # Constants for either mode
-        GROUP_SIZE = 3  # Number of words per group (used only if ENABLE_WORD_GROUPING)
-        MIN_DURATION = 0.5  # Minimum duration for any caption (in seconds)
-        
-        processed_words = 0
-        total_words = sum(len(s.get('words', [])) for s in segments)
-        textclip_creation_errors = 0
-
-        if ENABLE_WORD_GROUPING:
-            # --- WORD GROUPING MODE ---
-            print("Generating caption clips with word grouping...")
-            
-            for segment in segments:
-                if 'words' not in segment: continue
-                
-                # Process each segment's words in groups
-                word_group = []
-                group_start_time = None
-                group_end_time = None
-                
-                for i, word_info in enumerate(segment['words']):
-                    word_text = word_info.get('text', '').strip()
-                    start_time = word_info.get('start')
-                    end_time = word_info.get('end')
-                    
-                    # Skip words outside the audio duration
-                    if start_time is not None and start_time >= audio_duration: continue
-                    if end_time is not None and end_time > audio_duration: end_time = audio_duration
-                    
-                    # Valid word to add to group
-                    if word_text and start_time is not None and end_time is not None and end_time > start_time:
-                        # First word in group - set the starting time
-                        if len(word_group) == 0:
-                            group_start_time = start_time
-                        
-                        # Add word to group
-                        word_group.append(word_text)
-                        group_end_time = end_time
-                        processed_words += 1
-                        
-                        # Create caption when group is full or segment ends
-                        if len(word_group) >= GROUP_SIZE or i == len(segment['words']) - 1:
-                            # Only create caption if we have words and timing
-                            if word_group and group_start_time is not None and group_end_time is not None:
-                                # Create caption for the word group
-                                group_text = " ".join(word_group)
-                                duration = group_end_time - group_start_time
-                                
-                                # Ensure minimum duration
-                                if duration < MIN_DURATION:
-                                    duration = MIN_DURATION
-                                
-                                try:
-                                    txt_clip = TextClip(
-                                        group_text,
-                                        fontsize=MULTI_CAPTION_FONTSIZE,
-                                        font=CAPTION_FONT,
-                                        color=CAPTION_COLOR,
-                                        stroke_color=CAPTION_STROKE_COLOR,
-                                        stroke_width=CAPTION_STROKE_WIDTH,
-                                        method='label',  # 'label' for single line without background
-                                        align='center'   # Center-align the text
-                                    )
-                                    # Center text both horizontally and vertically
-                                    txt_clip = txt_clip.set_position('center').set_start(group_start_time).set_duration(duration)
-                                    caption_clips.append(txt_clip)
-                                except Exception as e:
-                                    print(f"Failed to create TextClip for '{group_text}'")
-                                    print(f"Error: {e}")
-                                    textclip_creation_errors += 1
-                                    
-                                # Reset for next group
-                                word_group = []
-                                group_start_time = None
-                                
-                    # Print progress periodically
-                    if processed_words % 50 == 0 and processed_words > 0:
-                        print(f"  Processed {processed_words}/{total_words} words...")
-                        
-            print(f"Created {len(caption_clips)} caption groups from {processed_words} words.")
-            
-        else:
-            # --- ONE WORD AT A TIME MODE ---
-            print("Generating one-word-at-a-time captions...")
-            
-            # Flatten all words for sequential processing
-            all_words = []
-            for segment in segments:
-                if 'words' in segment:
-                    all_words.extend(segment['words'])
-            
-            # Add a small gap constant to prevent visual overlap
-            GAP_BETWEEN_WORDS = 0.02 # Small gap in seconds
-
-            for i, word_info in enumerate(all_words):
-                word_text = word_info.get('text', '').strip()
-                start_time = word_info.get('start')
-                end_time = word_info.get('end')
-                
-                # Skip invalid words or timing
-                if not word_text or start_time is None or end_time is None: continue
-                if start_time >= audio_duration: continue
-                if end_time > audio_duration: end_time = audio_duration
-                if end_time <= start_time: continue # Ensure duration is positive
-                
-                # --- Improved Duration Calculation --- 
-                # Default duration from whisper
-                calculated_duration = end_time - start_time
-                
-                # Look ahead to the next word's start time
-                next_word_start_time = None
-                if i + 1 < len(all_words):
-                    next_word_info = all_words[i+1]
-                    next_word_start_time = next_word_info.get('start')
-
-                # If there's a next word, cap duration to end slightly before it starts
-                if next_word_start_time is not None and next_word_start_time > start_time:
-                    max_duration_before_next = next_word_start_time - start_time - GAP_BETWEEN_WORDS
-                    duration = min(calculated_duration, max_duration_before_next)
-                else:
-                    # Last word or issue with next word timing, use calculated duration
-                    duration = calculated_duration
-                    
-                # Ensure minimum duration BUT don't exceed original end time or gap
-                duration = max(duration, MIN_DURATION)
-                # Final check: ensure clip doesn't exceed original end_time (if MIN_DURATION pushed it)
-                duration = min(duration, end_time - start_time)
-                # Ensure duration is still positive after adjustments
-                duration = max(duration, 0.01) 
-
-                try:
-                    # Create text clip for the single word
-                    txt_clip = TextClip(
-                        word_text,
-                        fontsize=SINGLE_CAPTION_FONTSIZE,
-                        font=CAPTION_FONT,
-                        color=CAPTION_COLOR,
-                        stroke_color=CAPTION_STROKE_COLOR,
-                        stroke_width=CAPTION_STROKE_WIDTH,
-                        method='label',  # 'label' for single line without background
-                        align='center'   # Center-align the text
-                    )
-                    
-                    # Center text both horizontally and vertically
-                    txt_clip = txt_clip.set_position('center').set_start(start_time).set_duration(duration)
-                    caption_clips.append(txt_clip)
-                    processed_words += 1
-                except Exception as e:
-                    print(f"Failed to create TextClip for '{word_text}'")
-                    print(f"Error: {e}")
-                    textclip_creation_errors += 1
-                    
-                # Print progress periodically 
-                if processed_words % 25 == 0 and processed_words > 0:
-                    print(f"  Processed {processed_words}/{total_words} words...")
-                    
-            print(f"Created {len(caption_clips)} individual word captions from {processed_words} words.")
-
-        if textclip_creation_errors > 0: print(f"Encountered {textclip_creation_errors} errors during TextClip creation.")
+        # Build the caption timeline for the selected mode and render the captions
+        overlay = None
+        with instrumentation.span("caption_build", compositor=CAPTION_COMPOSITOR):
+            cues = build_caption_cues(segments, audio_duration, word_grouping, out_width) if cues is None else trim_cues(cues, audio_duration)
+            if CAPTION_COMPOSITOR == "overlay":
+                overlay = caption_overlay.CaptionOverlay(cues, make_caption_image)
+                if overlay.errors > 0: print(f"Encountered {overlay.errors} errors during caption rendering.")
+            else:
+                textclip_creation_errors = 0
+                for cue in cues:
+                    try:
+                        txt_clip = make_caption_clip(cue['text'], cue['fontsize'])
+                        # Center text both horizontally and vertically
+                        txt_clip = txt_clip.set_position('center').set_start(cue['start']).set_duration(cue['end'] - cue['start'])
+                        caption_clips.append(txt_clip)
+                    except Exception as e:
+                        print(f"Failed to create TextClip for '{cue['text']}'")
+                        print(f"Error: {e}")
+                        textclip_creation_errors += 1
+                if textclip_creation_errors > 0: print(f"Encountered {textclip_creation_errors} errors during TextClip creation.")
+        if CAPTION_RENDERER == "pillow": print(f"Caption cache: {get_caption_cache().stats()}")
 
         # Composite clips
         print("Compositing video and captions...")
-        final_clip = CompositeVideoClip([video_clip] + caption_clips)
+        with instrumentation.span("composite"):
+            if overlay is not None:
+                final_clip = overlay.apply_to(video_clip)
+            else:
+                final_clip = CompositeVideoClip([video_clip] + caption_clips)
 
-        # Write final video
+        # Write final video (frames are decoded and composited inside this loop)
         print(f"Writing final video to {output_path} (this can take a significant amount of time)...")
-        final_clip.write_videofile(
-            output_path, codec='libx264', audio_codec='aac',
-            temp_audiofile='temp-audio.m4a', remove_temp=True,
-            threads=4, preset='medium', logger='bar'
-        )
+        with instrumentation.span("encode"), instrumentation.profile(PROFILE_RENDER, os.path.splitext(output_path)[0] + "_render"):
+            if os.name == "posix":
+                # The AAC track is encoded straight from the narration buffer, piped in next to the frames
+                frames = _report_frames(final_clip.iter_frames(fps=out_fps, dtype="uint8", logger='bar'),
+                                        int(final_clip.duration * out_fps))
+                narration_audio.encode_video(
+                    ffmpeg_binary(), frames, final_clip.size, out_fps, narration, output_path, duration=audio_duration,
+                    preset=VIDEO_PRESET, threads=4
+                )
+            else:
+                # No extra pipe for the audio on Windows: let moviepy mux it through a temporary file
+                audio_clip = AudioFileClip(audio_path).subclip(0, audio_duration)
+                final_clip.set_audio(audio_clip).write_videofile(
+                    output_path, codec='libx264', audio_codec='aac',
+                    temp_audiofile=os.path.splitext(output_path)[0] + "_temp-audio.m4a", remove_temp=True,
+                    threads=4, preset=VIDEO_PRESET, logger='bar', fps=out_fps
+                )
+            if overlay is not None:
+                instrumentation.add_span("frame_decode", overlay.decode_seconds)
+                instrumentation.add_span("frame_composite", overlay.blend_seconds)
         print(f"--- Video Generation Finished Successfully ---")
         return True
 
@@ -408,10 +1280,340 @@ def create_video(background_video_path, audio_path, segments, output_path):
         except Exception as e:
             print(f"Warning: Error closing clips: {e}")
 
+# --- FFmpeg Render Backend ---
+def create_video_ffmpeg(background_video_path, audio_path, segments, output_path, background_start=0.0, word_grouping=None, cues=None):
+    """
+    Creates the final video with a single ffmpeg run: the captions are written as an ASS subtitle file
+    in the caption style and burned in while the background is trimmed and the audio is muxed.
+    Uses the same caption timing as the moviepy backend.
+    """
+    print("Render backend: ffmpeg (ASS subtitle burn-in)")
+    try:
+        video_info = background_info(background_video_path)
+        video_duration = video_info['duration'] - background_start
+        narration = load_narration(audio_path)
+        audio_duration = narration.duration
+        print(f"Audio duration: {audio_duration:.2f}s")
+        if video_duration < audio_duration:
+            print(f"Warning: Background video ({video_duration:.2f}s) is shorter than audio ({audio_duration:.2f}s). Video will end early.")
+            audio_duration = video_duration
+        width, height, fps = output_format(video_info['width'], video_info['height'], video_info['fps'])
+        # Only raw backgrounds of another format need per-frame scaling/resampling (proxies already match)
+        video_filters = []
+        if (video_info['width'], video_info['height']) != (width, height):
+            video_filters.append(f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1")
+        if fps and video_info['fps'] and abs(fps - video_info['fps']) > 0.01:
+            video_filters.append(f"fps={fps}")
+
+        with instrumentation.span("caption_build", compositor="ass"):
+            cues = build_caption_cues(segments, audio_duration, word_grouping, width) if cues is None else trim_cues(cues, audio_duration)
+            font_path = caption_raster.resolve_font_path(CAPTION_FONT, CAPTION_FONT_PATH)
+            font_name, bold = ass_render.font_family(font_path)
+            subtitles_path = os.path.splitext(output_path)[0] + "_captions.ass"
+            ass_render.write_ass(subtitles_path, ass_render.build_ass(
+                cues, width, height, font_name, CAPTION_COLOR, CAPTION_STROKE_COLOR, CAPTION_STROKE_WIDTH,
+                bold=bold, size_scale=ass_render.font_size_scale(font_path)
+            ))
+        print(f"Captions saved to {subtitles_path}")
+
+        print(f"Writing final video to {output_path}...")
+        report_progress("render", 0, 1)
+        # Decoding, compositing and encoding all happen inside the one ffmpeg run
+        with instrumentation.span("encode"), instrumentation.profile(PROFILE_RENDER, os.path.splitext(output_path)[0] + "_render"):
+            ass_render.burn_in(
+                ffmpeg_binary(), background_video_path, audio_path, subtitles_path, output_path,
+                audio_duration, fonts_dir=os.path.dirname(font_path), preset=VIDEO_PRESET, start=background_start,
+                video_filters=video_filters, audio_pcm=narration.pcm(audio_duration), audio_sample_rate=narration.sample_rate
+            )
+        report_progress("render", 1, 1)
+        print(f"--- Video Generation Finished Successfully ---")
+        return True
+
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg failed during video generation: {e.stderr.strip()}")
+        print(f"--- Video Generation Failed ---")
+        return False
+    except Exception as e:
+        print(f"An error occurred during video generation: {e}")
+        print(f"--- Video Generation Failed ---")
+        return False
+
+# --- Chunked Render Backend ---
+# The settings a render worker process needs to draw the captions like the parent would (spawned workers
+# start from the module defaults)
+RENDER_WORKER_SETTINGS = [
+    "CAPTION_FONT", "CAPTION_FONT_PATH", "CAPTION_COLOR", "CAPTION_STROKE_COLOR", "CAPTION_STROKE_WIDTH",
+    "CAPTION_RENDERER", "CAPTION_CACHE_MAX_BYTES", "CAPTION_CACHE_DIR", "IMAGEMAGICK_BINARY", "VIDEO_PRESET",
+]
+
+def _render_range_task(settings, background_video_path, background_start, cues, first_frame, end_frame, fps, size,
+                       part_path, gop_frames, threads):
+    """Renders frames [first_frame, end_frame) of the final video, captions included, into a video-only part."""
+    from moviepy.editor import VideoFileClip
+    for name, value in settings.items():
+        globals()[name] = value
+    start, end = first_frame / fps, end_frame / fps
+    video_clip = VideoFileClip(background_video_path)
+    try:
+        if 0 < background_start < video_clip.duration:
+            video_clip = video_clip.subclip(background_start)
+        clip = conform_clip(video_clip, size[0], size[1])
+        # Only the captions visible in this range are rendered
+        overlay = caption_overlay.CaptionOverlay([cue for cue in cues if cue['end'] > start and cue['start'] < end],
+                                                 make_caption_image)
+        clip = overlay.apply_to(clip)
+        # Same frame times as iter_frames over the whole video, so every frame matches the single-process render
+        frames = (clip.get_frame(i / fps) for i in range(first_frame, end_frame))
+        return chunked_encode.encode_frames(ffmpeg_binary(), frames, size, fps, part_path, gop_frames,
+                                            preset=VIDEO_PRESET, threads=threads)
+    finally:
+        video_clip.close()
+
+def create_video_chunked(background_video_path, audio_path, segments, output_path, background_start=0.0, word_grouping=None, cues=None):
+    """
+    Creates the final video like the moviepy backend, but splits the timeline into RENDER_WORKERS time ranges
+    that start on keyframes (every RENDER_GOP_SECONDS). Each range is composited and encoded in its own process,
+    then the parts are joined with stream copy and the narration is muxed in once.
+    """
+    workers = RENDER_WORKERS or os.cpu_count() or 1
+    print(f"Render backend: chunked ({workers} worker(s), keyframe every {RENDER_GOP_SECONDS:g}s)")
+    parts_dir = None
+    try:
+        video_info = background_info(background_video_path)
+        narration = load_narration(audio_path)
+        audio_duration = narration.duration
+        print(f"Audio duration: {audio_duration:.2f}s")
+        video_duration = video_info['duration'] - background_start
+        if video_duration < audio_duration:
+            print(f"Warning: Background video ({video_duration:.2f}s) is shorter than audio ({audio_duration:.2f}s). Video will end early.")
+            audio_duration = video_duration
+        width, height, fps = output_format(video_info['width'], video_info['height'], video_info['fps'])
+        total_frames = int(audio_duration * fps)
+        gop_frames = max(1, int(round(RENDER_GOP_SECONDS * fps)))
+        ranges = chunked_encode.plan_ranges(total_frames, workers, gop_frames)
+
+        with instrumentation.span("caption_build", compositor="overlay"):
+            cues = build_caption_cues(segments, audio_duration, word_grouping, width) if cues is None else trim_cues(cues, audio_duration)
+
+        print(f"Rendering {total_frames} frames in {len(ranges)} parts: "
+              + ", ".join(f"{first / fps:.1f}-{end / fps:.1f}s" for first, end in ranges))
+        parts_dir = os.path.splitext(output_path)[0] + "_parts"
+        os.makedirs(parts_dir, exist_ok=True)
+        part_paths = [os.path.join(parts_dir, f"part_{i:04d}.mp4") for i in range(len(ranges))]
+        settings = {name: globals()[name] for name in RENDER_WORKER_SETTINGS}
+        threads = max(1, (os.cpu_count() or 1) // len(ranges))
+        report_progress("render", 0, total_frames)
+        with instrumentation.span("encode", workers=len(ranges)):
+            # Spawned (not forked) workers: moviepy's ffmpeg readers don't survive a fork of a threaded process
+            with ProcessPoolExecutor(len(ranges), mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = [
+                    pool.submit(_render_range_task, settings, background_video_path, background_start, cues,
+                                first, end, fps, (width, height), path, gop_frames, threads)
+                    for (first, end), path in zip(ranges, part_paths)
+                ]
+                done = 0
+                for future in futures:
+                    done += future.result()
+                    report_progress("render", done, total_frames)
+        with instrumentation.span("concat", parts=len(part_paths)):
+            chunked_encode.concat_parts(ffmpeg_binary(), part_paths, narration, output_path, audio_duration)
+        print(f"--- Video Generation Finished Successfully ---")
+        return True
+
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg failed during video generation: {(e.stderr or '').strip()}")
+        print(f"--- Video Generation Failed ---")
+        return False
+    except Exception as e:
+        print(f"An error occurred during video generation: {e}")
+        print(f"--- Video Generation Failed ---")
+        return False
+    finally:
+        if parts_dir:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+# --- Preview Render ---
+def _preview_caption_image(scale):
+    """make_caption_image for captions scaled by scale (the stroke is scaled with the font size)."""
+    if CAPTION_RENDERER != "pillow":
+        return make_caption_image
+    font_path = caption_raster.resolve_font_path(CAPTION_FONT, CAPTION_FONT_PATH)
+    return lambda text, fontsize: get_caption_cache().get(text, font_path, fontsize, CAPTION_COLOR, CAPTION_STROKE_COLOR,
+                                                          CAPTION_STROKE_WIDTH * scale)
+
+def create_preview(background_video_path, audio_path, segments, output_path, background_start=0.0, word_grouping=None, cues=None,
+                   sheet=False, window=None):
+    """
+    Renders a quick draft of the final video: PREVIEW_SCALE of the output size at PREVIEW_FPS, encoded with
+    PREVIEW_PRESET. The caption timeline is planned for the full output size (so the captions break and time
+    exactly like in the full render) and only drawn smaller. window: (start, end) seconds of the timeline to
+    render (default: all of it). sheet: write a contact sheet image instead, with the frame on which each
+    caption first appears in the full render (output_path should then end in .png).
+    """
+    try:
+        video_info = background_info(background_video_path)
+        narration = load_narration(audio_path)
+        audio_duration = narration.duration
+        video_duration = video_info['duration'] - background_start
+        if video_duration < audio_duration:
+            print(f"Warning: Background video ({video_duration:.2f}s) is shorter than audio ({audio_duration:.2f}s). Video will end early.")
+            audio_duration = video_duration
+        width, height, fps = output_format(video_info['width'], video_info['height'], video_info['fps'])
+        size = preview_render.preview_size(width, height, PREVIEW_SCALE)
+        scale = size[0] / width
+        start, end = window or (0.0, audio_duration)
+        start, end = max(0.0, start), min(end, audio_duration)
+        if end <= start:
+            print(f"Error: Preview window {start:.2f}-{end:.2f}s is outside the {audio_duration:.2f}s video.")
+            return False
+
+        with instrumentation.span("caption_build", compositor="overlay"):
+            cues = build_caption_cues(segments, audio_duration, word_grouping, width) if cues is None else trim_cues(cues, audio_duration)
+            cues = [cue for cue in cues if cue['end'] > start and cue['start'] < end]
+            overlay = caption_overlay.CaptionOverlay(preview_render.scale_cues(cues, scale), _preview_caption_image(scale))
+
+        if sheet:
+            # The full render's frames (at its fps) on which each caption first appears
+            indices = [i for i in preview_render.cue_frames(cues, fps) if start <= i / fps < end]
+            if not indices:
+                print("Error: No captions in the preview window.")
+                return False
+            print(f"Writing a contact sheet of {len(indices)} caption frames ({size[0]}x{size[1]} each) to {output_path}...")
+            first = int(math.floor(start * fps))
+            tiles = []
+            with instrumentation.span("encode", preview="sheet"):
+                # Only the wanted frames are scaled and read
+                frames = preview_render.read_frames(ffmpeg_binary(), background_video_path, background_start + first / fps,
+                                                    (indices[-1] - first + 1) / fps, size, fps,
+                                                    frames=[i - first for i in indices], skip_bframes=True)
+                for i, frame in zip(indices, frames):
+                    t = i / fps
+                    label = f"{t:.2f}s " + " / ".join(cue['text'].replace("\n", " ") for cue in cues
+                                                      if cue['start'] <= t < cue['end'])
+                    tiles.append((overlay.apply(frame, t), label))
+                    report_progress("render", len(tiles), len(indices))
+                preview_render.contact_sheet(tiles, PREVIEW_SHEET_COLUMNS).save(output_path)
+            print(f"--- Contact Sheet Finished Successfully ---")
+            return True
+
+        total_frames = int((end - start) * PREVIEW_FPS)
+        print(f"Writing a {size[0]}x{size[1]} {PREVIEW_FPS:g} fps preview of {start:.2f}-{end:.2f}s to {output_path}...")
+        parts_dir = os.path.splitext(output_path)[0] + "_parts"
+        os.makedirs(parts_dir, exist_ok=True)
+        part_path = os.path.join(parts_dir, "preview.mp4")
+        try:
+            with instrumentation.span("encode", preview="video"):
+                frames = preview_render.read_frames(ffmpeg_binary(), background_video_path, background_start + start,
+                                                    end - start, size, PREVIEW_FPS, skip_bframes=True)
+                # Frame i is at timeline time start + i / PREVIEW_FPS, and shows the captions the full render shows then
+                frames = (overlay.apply(frame, start + i / PREVIEW_FPS) for i, frame in enumerate(frames))
+                chunked_encode.encode_frames(ffmpeg_binary(), _report_frames(frames, total_frames, every=PREVIEW_FPS),
+                                             size, PREVIEW_FPS, part_path, max(1, int(PREVIEW_FPS * 2)),
+                                             preset=PREVIEW_PRESET)
+                first_sample = int(round(start * narration.sample_rate))
+                audio = narration_audio.NarrationAudio(narration.samples[first_sample:], narration.sample_rate)
+                chunked_encode.concat_parts(ffmpeg_binary(), [part_path], audio, output_path, end - start)
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+        print(f"--- Preview Finished Successfully ---")
+        return True
+
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg failed during the preview render: {(e.stderr or '').strip()}")
+        print(f"--- Preview Failed ---")
+        return False
+    except Exception as e:
+        print(f"An error occurred during the preview render: {e}")
+        print(f"--- Preview Failed ---")
+        return False
+
+# --- Artifact Cache Keys ---
+# Each stage's output is stored under a hash of everything that affects it.
+def script_cache_key(idea, model_name=None):
+    return artifact_cache.make_key("script", idea=idea, provider=LOCAL_LLM_PROVIDER, model=model_name or llm_model(),
+                                   system_prompt=SCRIPT_SYSTEM_PROMPT)
+
+def audio_cache_key(script_text, voice=None):
+    return artifact_cache.make_key("audio", script=script_text, model=TTS_MODEL, voice=voice or TTS_VOICE, speed=TTS_SPEED,
+                                   chunked=TTS_CHUNKED, chunk_min_chars=TTS_CHUNK_MIN_CHARS, format="pcm")
+
+def timestamps_cache_key(audio_path, script_text):
+    return artifact_cache.make_key(
+        "timestamps", audio=artifact_cache.file_digest(audio_path), whisper_size=WHISPER_MODEL_SIZE,
+        device=WHISPER_DEVICE, quantize=WHISPER_QUANTIZE_INT8, mode=TIMESTAMP_MODE,
+        script=script_text if TIMESTAMP_MODE == "align" else None,
+        alignment=[ALIGNMENT_MIN_CONFIDENCE, ALIGNMENT_MAX_COLLAPSED_RATIO],
+        long_audio=[LONG_AUDIO_SECONDS, LONG_AUDIO_CHUNK_SECONDS, LONG_AUDIO_MAX_CHUNK_SECONDS],
+    )
+
+def caption_settings(word_grouping=None):
+    """Everything that changes how the captions look or are timed, and how the video is rendered."""
+    return {
+        'font': CAPTION_FONT, 'font_path': CAPTION_FONT_PATH, 'single_fontsize': SINGLE_CAPTION_FONTSIZE,
+        'multi_fontsize': MULTI_CAPTION_FONTSIZE, 'color': CAPTION_COLOR, 'stroke_color': CAPTION_STROKE_COLOR,
+        'stroke_width': CAPTION_STROKE_WIDTH,
+        'word_grouping': ENABLE_WORD_GROUPING if word_grouping is None else word_grouping,
+        'layout': [CAPTION_LAYOUT, CAPTION_MAX_WIDTH, CAPTION_MAX_LINES, CAPTION_MAX_WORDS, CAPTION_MIN_FONTSIZE,
+                   CAPTION_MAX_CPS, CAPTION_MAX_SECONDS, CAPTION_PAUSE_BREAK] if CAPTION_LAYOUT == "fit" else CAPTION_LAYOUT,
+        'renderer': CAPTION_RENDERER, 'compositor': CAPTION_COMPOSITOR, 'backend': RENDER_BACKEND,
+        'preset': VIDEO_PRESET, 'gop': RENDER_GOP_SECONDS if RENDER_BACKEND == "chunked" else None,
+    }
+
+def video_cache_key(audio_path, segments, background_video_path, background_start=0.0, word_grouping=None, cues=None):
+    return artifact_cache.make_key(
+        "video", audio=artifact_cache.file_digest(audio_path), segments=artifact_cache.make_key("segments", segments=segments),
+        background=artifact_cache.file_fingerprint(background_video_path), background_start=background_start,
+        output=[OUTPUT_SIZE, OUTPUT_FPS], captions=caption_settings(word_grouping),
+        cues=artifact_cache.make_key("cues", cues=cues) if cues is not None else None,
+    )
+
+def write_run_metrics(recorder=None):
+    """
+    Prints the per-stage summary and writes the run's metrics (JSON lines + Prometheus text file).
+    recorder: the records to write (default: the process-wide recorder).
+    """
+    recorder = recorder or instrumentation.get_recorder()
+    if not recorder.records:
+        return
+    print("\n--- Stage Metrics ---")
+    print(recorder.summary())
+    try:
+        recorder.write_jsonl(METRICS_JSONL_PATH)
+        recorder.write_prometheus(METRICS_PROM_PATH)
+        print(f"Metrics saved to {METRICS_JSONL_PATH} and {METRICS_PROM_PATH}")
+    except OSError as e:
+        print(f"Warning: Could not write metrics: {e}")
+
+def run_cached_stage(cache, stage, key, output_path, produce, force_stages=()):
+    """
+    Makes sure output_path holds the artifact for this stage.
+    If the cache has it (and the stage isn't forced), it is copied to output_path and produce is skipped;
+    otherwise produce(output_path) is called (returns True on success) and the result is stored in the cache.
+    Returns (success, from_cache).
+    """
+    filename = os.path.basename(output_path)
+    forced = stage in force_stages or "all" in force_stages
+    if cache is not None and not forced:
+        if cache.fetch(stage, key, filename, output_path):
+            print(f"Using cached {stage} ({key[:12]}) -> {output_path}")
+            return True, True
+    if forced:
+        print(f"Forcing {stage} stage to run again.")
+    if not produce(output_path):
+        return False, False
+    if cache is not None:
+        try:
+            cache.store(stage, key, output_path, filename)
+        except Exception as e:
+            print(f"Warning: Could not cache {stage} output: {e}")
+    return True, False
+
+DEFAULT_STORY_IDEA = "My sibling, who always struggled financially, suddenly started buying expensive designer items and taking lavish trips right after our estranged, wealthy uncle died, but they claim they inherited nothing."
+
     # --- Main Execution Logic ---
-if __name__ == "__main__":
+def run_pipeline(story_idea=None, cache=None, force_stages=()):
+    """Runs all four stages, reusing cached stage outputs whose inputs haven't changed. Returns True if the video was made."""
     print("Starting Insta Brain Rot Bot Script...")
-    
     # Create output directory if it doesn't exist
     if not os.path.exists(OUTPUT_VIDEO_DIR):
         os.makedirs(OUTPUT_VIDEO_DIR)
@@ -421,39 +1623,54 @@ if __name__ == "__main__":
 
     # --- Step 1: Generate Script ---
     #story_idea = input("Enter your story idea: ")
-    story_idea = "My sibling, who always struggled financially, suddenly started buying expensive designer items and taking lavish trips right after our estranged, wealthy uncle died, but they claim they inherited nothing."# Example idea
+    story_idea = story_idea or DEFAULT_STORY_IDEA # Example idea
     generated_script = None
+    script_path = os.path.join(".", "script.txt")
+    # Define the output path for the temporary audio file
+    temp_audio_path = os.path.join(".", TEMP_AUDIO_FILENAME) # Save in root project dir for now
+    streamed_audio = False # Set when the audio was synthesized while the script was streaming
+
+    def produce_script(path):
+        nonlocal streamed_audio
+        script = None
+        if STREAM_SCRIPT_TO_TTS and TTS_CHUNKED:
+            script, _ = generate_script_and_audio_streaming(story_idea, temp_audio_path)
+            streamed_audio = script is not None
+        else:
+            script = generate_script(story_idea)
+        if not script:
+            return False
+        # Save the script to a text file
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(script)
+        return True
 
     print(f"\n--- Step 1: Generating Script ---")
     print(f"Using local LLM provider: {LOCAL_LLM_PROVIDER}")
-    # ... (Your existing Ollama/LM Studio script generation logic) ...
-    if LOCAL_LLM_PROVIDER == "ollama":
-        generated_script = generate_script_ollama(story_idea, model_name=OLLAMA_MODEL)
-    elif LOCAL_LLM_PROVIDER == "lmstudio":
-        #generated_script = generate_script_lmstudio(story_idea, model_identifier=LMSTUDIO_MODEL_ID)
-        print(f"Failed to get local LLM provider")
-        pass
-    # ... (Error handling) ...
+    script_ok, _ = run_cached_stage(cache, "script", script_cache_key(story_idea), script_path, produce_script, force_stages)
+    if script_ok:
+        with open(script_path, encoding="utf-8") as file:
+            generated_script = file.read()
+        print(f"Script saved to {script_path}")
 
     # --- Step 2: Generate TTS Audio ---
     audio_generated = False
     timestamp_segments = None # Initialize variable for timestamps
-    
+
     if generated_script:
         print(f"\n--- Step 2: Generating TTS Audio ---")
         print("\nScript generated successfully! Proceeding to TTS...")
-        
-        # Save the script to a text file
-        script_path = os.path.join(".", "script.txt")
-        with open(script_path, "w", encoding="utf-8") as file:
-            file.write(generated_script)
-        print(f"Script saved to {script_path}")
-        
-        # Define the output path for the temporary audio file
-        temp_audio_path = os.path.join(".", TEMP_AUDIO_FILENAME) # Save in root project dir for now
 
-        # Choose TTS provider (can add logic later for ElevenLabs)
-        audio_generated = generate_audio_openai(generated_script, temp_audio_path)
+        def produce_audio(path):
+            if streamed_audio and os.path.exists(path):
+                print("Audio was already synthesized while the script was streaming.")
+                return True
+            # Choose TTS provider (can add logic later for ElevenLabs)
+            return generate_audio_openai(generated_script, path)
+
+        audio_generated, _ = run_cached_stage(
+            cache, "audio", audio_cache_key(generated_script), temp_audio_path, produce_audio, force_stages
+        )
 
     else:
         print("\nFailed to generate script. Skipping TTS.")
@@ -461,8 +1678,23 @@ if __name__ == "__main__":
     # --- Step 3: Generate Word Timestamps ---
     if audio_generated:
         print(f"\n--- Step 3: Generating Word Timestamps ---")
-        # Call the word timestamp function
-        timestamp_segments = get_word_timestamps(temp_audio_path)
+        # Call the word timestamp function (or reuse cached timestamps for this exact audio)
+        def produce_timestamps(path):
+            segments = get_word_timestamps(temp_audio_path, script_text=generated_script)
+            if segments is None:
+                return False
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(segments, f, ensure_ascii=False)
+            return True
+
+        segments_path = os.path.splitext(temp_audio_path)[0] + "_segments.json"
+        timestamps_ok, _ = run_cached_stage(
+            cache, "timestamps", timestamps_cache_key(temp_audio_path, generated_script), segments_path,
+            produce_timestamps, force_stages
+        )
+        if timestamps_ok:
+            with open(segments_path, encoding="utf-8") as f:
+                timestamp_segments = json.load(f)
 
         if timestamp_segments is not None:
              # Optional: Print first few words for verification
@@ -504,17 +1736,24 @@ if __name__ == "__main__":
     if timestamp_segments: # Only proceed if timestamps exist
         # Define final output path
         output_video_path = os.path.join(OUTPUT_VIDEO_DIR, OUTPUT_VIDEO_FILENAME)
+        # Pick the background (a keyframe-aligned segment from the library, or the fixed video)
+        background_path, background_start = select_background(temp_audio_path)
         # Ensure background video exists before calling
-        if os.path.exists(BACKGROUND_VIDEO_PATH):
-             video_generated = create_video(
-                 background_video_path=BACKGROUND_VIDEO_PATH,
-                 audio_path=temp_audio_path,
-                 segments=timestamp_segments,
-                 output_path=output_video_path
+        if os.path.exists(background_path):
+             video_generated, _ = run_cached_stage(
+                 cache, "video", video_cache_key(temp_audio_path, timestamp_segments, background_path, background_start), output_video_path,
+                 lambda path: create_video(
+                     background_video_path=background_path,
+                     audio_path=temp_audio_path,
+                     segments=timestamp_segments,
+                     output_path=path,
+                     background_start=background_start
+                 ),
+                 force_stages
              )
         else:
-             print(f"Error: Background video not found at '{BACKGROUND_VIDEO_PATH}'. Cannot create video.")
-             print(f"Please place your background video in the '{BACKGROUND_VIDEO_DIR}' folder and name it '{BACKGROUND_VIDEO_FILENAME}'.")
+             print(f"Error: Background video not found at '{background_path}'. Cannot create video.")
+             print(f"Please place your background videos in the '{BACKGROUND_VIDEO_DIR}' folder (or name one '{BACKGROUND_VIDEO_FILENAME}').")
 
     else:
         print("Timestamp generation failed or was skipped. Cannot proceed to Video Generation.")
@@ -527,5 +1766,199 @@ if __name__ == "__main__":
     print(f"Final Video Generated: {'Yes' if video_generated else 'No'}")
     if video_generated:
         print(f"Output video saved to: {os.path.join(OUTPUT_VIDEO_DIR, OUTPUT_VIDEO_FILENAME)}")
+    print("\nScript finished.")
+    return video_generated
+
+# --- Command Line ---
+# Each stage is its own subcommand that reads and writes plain files, so stages can be run (and re-run)
+# separately; only the modules a stage needs are imported. Without a subcommand, all stages run.
+#   python main.py script --idea "..." -o script.txt
+#   python main.py tts --script script.txt -o narration.wav
+#   python main.py align --audio narration.wav --script script.txt -o segments.json
+#   python main.py captions --segments segments.json --audio narration.wav -o cues.json
+#   python main.py render --audio narration.wav --segments segments.json -o video.mp4 [--cues cues.json]
+#   python main.py all --idea "..."   (same as python main.py --idea "...")
+CLI_COMMANDS = ["script", "tts", "align", "captions", "render", "all"]
+
+def _prepare_output(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return path
+
+def _read_text(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def cli_script(args, cache):
+    def produce(path):
+        script = generate_script(args.idea)
+        if not script:
+            return False
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(script)
+        return True
+    ok, _ = run_cached_stage(cache, "script", script_cache_key(args.idea), _prepare_output(args.output), produce,
+                             ["script"] if args.force else [])
+    if ok:
+        print(f"Script saved to {args.output}")
+    return ok
+
+def cli_tts(args, cache):
+    script_text = _read_text(args.script)
+    output = args.output or TEMP_AUDIO_FILENAME
+    ok, _ = run_cached_stage(
+        cache, "audio", audio_cache_key(script_text, args.voice), _prepare_output(output),
+        lambda path: generate_audio_openai(script_text, path, voice=args.voice), ["audio"] if args.force else []
+    )
+    return ok
+
+def cli_align(args, cache):
+    script_text = _read_text(args.script) if args.script else None
+    output = args.output or os.path.splitext(args.audio)[0] + "_segments.json"
 
-    print("\nScript finished.")
\ No newline at end of file
+    def produce(path):
+        segments = get_word_timestamps(args.audio, script_text=script_text)
+        if segments is None:
+            return False
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(segments, f, ensure_ascii=False)
+        return True
+    ok, _ = run_cached_stage(cache, "timestamps", timestamps_cache_key(args.audio, script_text),
+                             _prepare_output(output), produce, ["timestamps"] if args.force else [])
+    if ok:
+        print(f"Word timestamps saved to {output}")
+    return ok
+
+def cli_captions(args, cache):
+    with open(args.segments, encoding="utf-8") as f:
+        segments = json.load(f)
+    if args.audio:
+        duration = load_narration(args.audio).duration
+    else:
+        duration = max((word['end'] for segment in segments for word in segment.get('words', [])
+                        if word.get('end') is not None), default=0.0)
+    word_grouping = None if args.caption_mode is None else args.caption_mode == "grouped"
+    width = args.width or (OUTPUT_SIZE[0] if OUTPUT_SIZE else None)
+    started = time.perf_counter()
+    cues = build_caption_cues(segments, duration, word_grouping, width)
+    print(f"Caption timeline built in {(time.perf_counter() - started) * 1000:.1f} ms")
+    output = args.output or os.path.splitext(args.segments)[0] + "_cues.json"
+    write_cue_table(cues, _prepare_output(output))
+    print(f"Cue table saved to {output}")
+    return True
+
+def cli_render(args, cache):
+    with open(args.segments, encoding="utf-8") as f:
+        segments = json.load(f)
+    cues = None
+    if args.cues:
+        with open(args.cues, encoding="utf-8") as f:
+            cues = json.load(f)
+    if args.background:
+        background_path, background_start = args.background, args.background_start
+    else:
+        background_path, background_start = select_background(args.audio)
+    if not os.path.exists(background_path):
+        print(f"Error: Background video not found at '{background_path}'. Cannot create video.")
+        return False
+    word_grouping = None if args.caption_mode is None else args.caption_mode == "grouped"
+    preview = "sheet" if args.contact_sheet else "video" if args.preview or args.window else None
+    if preview:
+        # Previews are quick to redo, so they skip the artifact cache
+        stem = os.path.splitext(OUTPUT_VIDEO_FILENAME)[0]
+        output = args.output or os.path.join(OUTPUT_VIDEO_DIR, f"{stem}_contact_sheet.png" if preview == "sheet" else f"{stem}_preview.mp4")
+        ok = create_video(background_path, args.audio, segments, _prepare_output(output), background_start, word_grouping, cues,
+                          preview=preview, window=args.window)
+        if ok:
+            print(f"Preview saved to: {output}")
+        return ok
+    output = args.output or os.path.join(OUTPUT_VIDEO_DIR, OUTPUT_VIDEO_FILENAME)
+    ok, _ = run_cached_stage(
+        cache, "video", video_cache_key(args.audio, segments, background_path, background_start, word_grouping, cues),
+        _prepare_output(output),
+        lambda path: create_video(background_path, args.audio, segments, path, background_start, word_grouping, cues),
+        ["video"] if args.force else []
+    )
+    if ok:
+        print(f"Output video saved to: {output}")
+    return ok
+
+def cli_all(args, cache):
+    return run_pipeline(args.idea, cache, args.force_stage)
+
+def build_cli_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a setting from main.py for this run, e.g. --set WHISPER_MODEL_SIZE=tiny (repeatable)")
+    common.add_argument("--no-cache", action="store_true", help="Don't read or write the artifact cache")
+    stage = argparse.ArgumentParser(add_help=False, parents=[common])
+    stage.add_argument("--force", action="store_true", help="Run the stage even if its output is cached")
+
+    parser = argparse.ArgumentParser(description="Generate a story video from an idea, all at once or stage by stage.")
+    commands = parser.add_subparsers(dest="command", metavar="{" + ",".join(CLI_COMMANDS) + "}")
+
+    command = commands.add_parser("script", parents=[stage], help="Write a story script for an idea")
+    command.add_argument("--idea", default=DEFAULT_STORY_IDEA, help="Story idea (defaults to the example idea)")
+    command.add_argument("-o", "--output", default="script.txt", help="Script file to write")
+    command.set_defaults(handler=cli_script)
+
+    command = commands.add_parser("tts", parents=[stage], help="Synthesize the narration for a script file")
+    command.add_argument("--script", required=True, help="Script text file")
+    command.add_argument("--voice", help="TTS voice (default: TTS_VOICE)")
+    command.add_argument("-o", "--output", help="Narration file to write (default: TEMP_AUDIO_FILENAME)")
+    command.set_defaults(handler=cli_tts)
+
+    command = commands.add_parser("align", parents=[stage], help="Word timestamps for a narration file")
+    command.add_argument("--audio", required=True, help="Narration audio file")
+    command.add_argument("--script", help="Script text file (aligned to the audio when TIMESTAMP_MODE is \"align\")")
+    command.add_argument("-o", "--output", help="Segments JSON to write (default: <audio>_segments.json)")
+    command.set_defaults(handler=cli_align)
+
+    command = commands.add_parser("captions", parents=[common], help="Plan the caption timeline (cue table) for word timestamps")
+    command.add_argument("--segments", required=True, help="Segments JSON from the align stage")
+    command.add_argument("--audio", help="Narration audio file (captions are cut at its end; default: the last word's end)")
+    command.add_argument("--width", type=int, help="Frame width the captions must fit (default: OUTPUT_SIZE, else 1080)")
+    command.add_argument("--caption-mode", choices=["grouped", "single"], help="Default: ENABLE_WORD_GROUPING")
+    command.add_argument("-o", "--output", help="Cue table JSON to write (default: <segments>_cues.json)")
+    command.set_defaults(handler=cli_captions)
+
+    command = commands.add_parser("render", parents=[stage], help="Render the captioned video")
+    command.add_argument("--audio", required=True, help="Narration audio file")
+    command.add_argument("--segments", required=True, help="Segments JSON from the align stage")
+    command.add_argument("--background", help="Background video (default: picked like BACKGROUND_SELECTION says)")
+    command.add_argument("--background-start", type=float, default=0.0, help="Seconds into --background to start at")
+    command.add_argument("--caption-mode", choices=["grouped", "single"], help="Default: ENABLE_WORD_GROUPING")
+    command.add_argument("--cues", help="Cue table JSON from the captions stage (default: planned from --segments)")
+    command.add_argument("--preview", action="store_true", help="Render a quick low-resolution preview (PREVIEW_SCALE, PREVIEW_FPS, PREVIEW_PRESET)")
+    command.add_argument("--window", type=float, nargs=2, metavar=("START", "END"), help="Preview only these seconds of the video (implies --preview)")
+    command.add_argument("--contact-sheet", action="store_true", help="Write an image with the frame at each caption's start instead of a video")
+    command.add_argument("-o", "--output", help="Video file to write (default: OUTPUT_VIDEO_FILENAME in OUTPUT_VIDEO_DIR, with _preview.mp4 or _contact_sheet.png for previews)")
+    command.set_defaults(handler=cli_render)
+
+    command = commands.add_parser("all", parents=[common], help="Run every stage (the default)")
+    command.add_argument("--idea", help="Story idea (defaults to the example idea)")
+    command.add_argument("--force-stage", action="append", default=[], choices=PIPELINE_STAGES + ["all"],
+                         help="Run this stage again even if its output is cached (repeatable)")
+    command.set_defaults(handler=cli_all)
+    return parser
+
+def main_cli(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0] not in CLI_COMMANDS and argv[0] not in ("-h", "--help")):
+        argv = ["all"] + argv  # python main.py --idea "..." keeps running the whole pipeline
+    parser = build_cli_parser()
+    args = parser.parse_args(argv)
+    try:
+        configure(args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+    cache = None
+    if ARTIFACT_CACHE_ENABLED and not args.no_cache:
+        cache = artifact_cache.ArtifactCache(ARTIFACT_CACHE_DIR, max_bytes=ARTIFACT_CACHE_MAX_BYTES)
+    ok = args.handler(args, cache)
+    if METRICS_ENABLED:
+        write_run_metrics()
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,206 @@
+# Narration audio kept in memory
+# The narration is decoded at most once per process into a NumPy PCM buffer that every later stage reads:
+# Whisper gets a 16 kHz copy resampled in memory, the renderers get the duration and the samples, and the
+# final AAC encode reads the samples through a pipe. WAV files (what the TTS stage writes) are read without
+# ffmpeg; other formats are decoded with one ffmpeg run.
+#
+# Usage:
+#   audio = narration_audio.load(path)     # Cached per path until the file changes
+#   audio.for_whisper()                    # float32, 16 kHz, as whisper.load_audio returns it
+import os
+import subprocess
+import threading
+import wave
+
+import numpy as np
+
+DEFAULT_SAMPLE_RATE = 24000  # Rate non-WAV files are decoded to (the TTS output rate)
+WHISPER_SAMPLE_RATE = 16000
+
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def resample(samples, source_rate, target_rate):
+    """Band-limited resampling in the frequency domain (one FFT over the whole track)."""
+    target_length = int(round(len(samples) * target_rate / source_rate))
+    if target_length == 0 or len(samples) == 0:
+        return np.zeros(target_length, dtype=np.float32)
+    spectrum = np.fft.rfft(samples)
+    bins = target_length // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(bins - len(spectrum), dtype=spectrum.dtype)])
+    return (np.fft.irfft(spectrum, target_length) * (target_length / len(samples))).astype(np.float32)
+
+
+class NarrationAudio:
+    """Mono 16-bit PCM samples plus their sample rate."""
+
+    def __init__(self, samples, sample_rate):
+        self.samples = np.ascontiguousarray(samples, dtype="<i2")
+        self.sample_rate = int(sample_rate)
+        self._whisper = None
+
+    @classmethod
+    def from_pcm(cls, pcm, sample_rate):
+        """From raw s16le mono bytes (a trailing odd byte is dropped)."""
+        return cls(np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], dtype="<i2"), sample_rate)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def pcm(self, duration=None):
+        """The samples as s16le bytes, optionally cut to duration seconds."""
+        samples = self.samples if duration is None else self.samples[:int(round(duration * self.sample_rate))]
+        return samples.tobytes()
+
+    def for_whisper(self):
+        """float32 samples in [-1, 1] at 16 kHz (resampled in memory once, then reused)."""
+        if self._whisper is None:
+            samples = self.samples.astype(np.float32) / 32768.0
+            if self.sample_rate != WHISPER_SAMPLE_RATE:
+                samples = resample(samples, self.sample_rate, WHISPER_SAMPLE_RATE)
+            self._whisper = samples.astype(np.float32)
+        return self._whisper
+
+    def write_wav(self, path):
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.sample_rate)
+            w.writeframes(self.samples.tobytes())
+        return path
+
+
+def _read_wav(path):
+    """Reads 16-bit PCM WAV files directly; returns None for anything else (compressed or float WAV)."""
+    try:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2:
+                return None
+            channels, rate = w.getnchannels(), w.getframerate()
+            samples = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+    except (wave.Error, EOFError):
+        return None
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return NarrationAudio(samples, rate)
+
+
+def _decode(ffmpeg_binary, path, sample_rate=DEFAULT_SAMPLE_RATE):
+    result = subprocess.run(
+        [ffmpeg_binary, "-nostdin", "-loglevel", "error", "-i", path, "-map", "0:a:0",
+         "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        capture_output=True, check=True,
+    )
+    return NarrationAudio.from_pcm(result.stdout, sample_rate)
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load(path, ffmpeg_binary="ffmpeg"):
+    """
+    Returns the narration at path, decoding it only if it isn't cached yet or the file changed since.
+    Raises subprocess.CalledProcessError when ffmpeg can't decode the file.
+    """
+    path = os.path.abspath(path)
+    key = _file_key(path)
+    with _CACHE_LOCK:
+        cached = _CACHE.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    audio = None
+    if path.lower().endswith(".wav"):
+        audio = _read_wav(path)
+    if audio is None:
+        audio = _decode(ffmpeg_binary, path)
+    with _CACHE_LOCK:
+        _CACHE[path] = (key, audio)
+    return audio
+
+
+def save(audio, path, ffmpeg_binary="ffmpeg"):
+    """
+    Writes the narration to path and keeps the buffer cached for it, so nothing decodes it again.
+    .wav files are written directly; other formats are encoded from the buffer with one ffmpeg run.
+    """
+    if path.lower().endswith(".wav"):
+        audio.write_wav(path)
+    else:
+        subprocess.run([ffmpeg_binary, "-y", "-loglevel", "error", *pcm_input_args(audio.sample_rate), path],
+                       input=audio.pcm(), check=True, capture_output=True)
+    with _CACHE_LOCK:
+        _CACHE[os.path.abspath(path)] = (_file_key(path), audio)
+    return path
+
+
+def clear():
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+
+def pcm_input_args(sample_rate, source="pipe:0"):
+    """ffmpeg input arguments for mono s16le PCM read from source."""
+    return ["-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", source]
+
+
+def encode_video(ffmpeg_binary, frames, size, fps, audio, output_path, duration=None, preset="medium", threads=None):
+    """
+    Encodes RGB frames (an iterable of HxWx3 uint8 arrays) and the narration into output_path with one
+    ffmpeg run: frames go in on stdin, the PCM samples on a second pipe, and the audio is encoded to AAC
+    directly from them (no temporary audio file). duration cuts the audio. POSIX only (needs pass_fds).
+    Raises subprocess.CalledProcessError (with ffmpeg's stderr) on failure.
+    """
+    width, height = size
+    audio_read, audio_write = os.pipe()
+    cmd = [
+        ffmpeg_binary, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-vcodec", "rawvideo", "-s", f"{width}x{height}", "-pix_fmt", "rgb24", "-r", f"{fps:g}",
+        "-i", "pipe:0",
+        *pcm_input_args(audio.sample_rate, f"pipe:{audio_read}"),
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-movflags", "+faststart",
+    ]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd.append(output_path)
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=(audio_read,))
+    os.close(audio_read)
+    # Read stderr on a thread so a chatty ffmpeg can't block on a full pipe while frames are written
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+
+    def feed_audio():
+        # ffmpeg reads both pipes at its own pace, so the audio is written from its own thread
+        try:
+            with os.fdopen(audio_write, "wb") as pipe:
+                pipe.write(audio.pcm(duration))
+        except BrokenPipeError:
+            pass
+    feeder = threading.Thread(target=feed_audio, daemon=True)
+    feeder.start()
+
+    try:
+        for frame in frames:
+            process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+    except BrokenPipeError:
+        pass  # ffmpeg exited early; its stderr says why
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+        reader.join()
+        feeder.join(timeout=5)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=b"".join(stderr).decode(errors="replace"))
+    return output_path
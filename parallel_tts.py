@@ -0,0 +1,198 @@
+# Sentence-chunked parallel TTS
+# Splits the script at sentence boundaries and synthesizes the chunks concurrently through one pooled async
+# OpenAI client (bounded concurrency, retry with backoff on rate limits). Chunks are requested as raw PCM so
+# they can be joined sample-exactly, without the gaps/clicks that concatenating MP3s produces, and the
+# joined track is written once. Each chunk's offset in the final audio is kept for later stages.
+import asyncio
+import json
+import random
+import re
+import threading
+
+PCM_SAMPLE_RATE = 24000  # OpenAI "pcm" responses: 24kHz, 16-bit signed little-endian, mono
+PCM_SAMPLE_WIDTH = 2
+MAX_INPUT_CHARS = 4096  # OpenAI speech input limit
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])["\')\]]*\s+')
+
+
+def split_sentences(text, min_chars=40, max_chars=MAX_INPUT_CHARS):
+    """
+    Splits text into chunks at sentence boundaries.
+    Very short sentences are merged into the next one (tiny requests cost more in overhead than they save),
+    and sentences longer than max_chars are split at the last space that fits.
+    """
+    sentences = [s.strip() for s in _SENTENCE_END.split(text.strip()) if s.strip()]
+    chunks = []
+    pending = ""
+    for sentence in sentences:
+        pending = f"{pending} {sentence}".strip() if pending else sentence
+        if len(pending) >= min_chars:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks and len(chunks[-1]) + len(pending) + 1 <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+
+    return [piece for chunk in chunks for piece in _split_long(chunk, max_chars)]
+
+
+def _split_long(chunk, max_chars):
+    """Splits a chunk longer than max_chars at the last space that fits."""
+    pieces = []
+    while len(chunk) > max_chars:
+        cut = chunk.rfind(" ", 0, max_chars)
+        cut = cut if cut > 0 else max_chars
+        pieces.append(chunk[:cut].strip())
+        chunk = chunk[cut:].strip()
+    if chunk:
+        pieces.append(chunk)
+    return pieces
+
+
+class SentenceStream:
+    """
+    Incremental version of split_sentences for text that arrives in pieces (e.g. LLM tokens).
+    feed() returns the chunks that are complete so far; a sentence only counts as complete once the
+    whitespace after its end mark has arrived. close() returns whatever is left. Chunks follow the same
+    rules as split_sentences, except that a short final sentence becomes its own chunk (the one before it
+    may already be on its way to TTS).
+    """
+
+    def __init__(self, min_chars=40, max_chars=MAX_INPUT_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._pending = ""
+
+    def _add_sentence(self, sentence):
+        sentence = sentence.strip()
+        if not sentence:
+            return []
+        self._pending = f"{self._pending} {sentence}".strip() if self._pending else sentence
+        if len(self._pending) < self.min_chars:
+            return []
+        chunk, self._pending = self._pending, ""
+        return _split_long(chunk, self.max_chars)
+
+    def feed(self, text):
+        self._buffer += text
+        chunks = []
+        last_end = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            chunks += self._add_sentence(self._buffer[last_end:match.start()])
+            last_end = match.end()
+        self._buffer = self._buffer[last_end:]
+        return chunks
+
+    def close(self):
+        chunks = self._add_sentence(self._buffer)
+        self._buffer = ""
+        if self._pending:
+            chunks += _split_long(self._pending, self.max_chars)
+            self._pending = ""
+        return chunks
+
+
+class ParallelTTS:
+    """
+    Owns one event loop thread and one pooled AsyncOpenAI client, shared by every synthesize() call in the
+    process (including calls from several threads at once, e.g. batch mode's TTS workers).
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=4, max_retries=5, backoff_base=1.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._client = None
+        self._submit_semaphore = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="tts-loop", daemon=True)
+        self._thread.start()
+
+    def _get_client(self):
+        # Created on the loop thread: the httpx connection pool belongs to this loop
+        if self._client is None:
+            import httpx
+            import openai
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=0,  # Retries are handled below
+                http_client=httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0, connect=10.0)),
+            )
+        return self._client
+
+    async def _synthesize_chunk(self, semaphore, index, text, model, voice, speed):
+        import openai  # Imported on first use, so importing this module stays cheap
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._get_client().audio.speech.create(
+                        model=model, voice=voice, input=text, speed=speed, response_format="pcm"
+                    )
+                    return response.content
+                except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                    if attempt == self.max_retries:
+                        raise
+                    # Exponential backoff with jitter; honor Retry-After when the server sends it
+                    delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+                    retry_after = getattr(getattr(e, "response", None), "headers", {}).get("retry-after")
+                    if retry_after:
+                        try:
+                            delay = max(delay, float(retry_after))
+                        except ValueError:
+                            pass
+                    print(f"TTS chunk {index + 1}: {type(e).__name__}, retrying in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+
+    async def _synthesize_all(self, chunks, model, voice, speed):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*[
+            self._synthesize_chunk(semaphore, i, text, model, voice, speed) for i, text in enumerate(chunks)
+        ])
+
+    def synthesize(self, chunks, model, voice, speed):
+        """Synthesizes all chunks concurrently. Returns their PCM bytes in order."""
+        future = asyncio.run_coroutine_threadsafe(self._synthesize_all(chunks, model, voice, speed), self._loop)
+        return future.result()
+
+    def submit(self, index, text, model, voice, speed):
+        """
+        Starts synthesizing one chunk and returns a concurrent.futures.Future with its PCM bytes.
+        Submitted chunks share one concurrency limit, so chunks can be handed over as they become available.
+        """
+        if self._submit_semaphore is None:
+            self._submit_semaphore = asyncio.Semaphore(self.max_concurrency)
+        return asyncio.run_coroutine_threadsafe(
+            self._synthesize_chunk(self._submit_semaphore, index, text, model, voice, speed), self._loop
+        )
+
+
+def stitch_pcm(pcm_chunks, chunk_texts):
+    """
+    Joins PCM chunks back to back. Returns (pcm bytes, chunk table) where the table has each chunk's text
+    and its start/end offsets (seconds) in the joined audio.
+    """
+    offsets = []
+    position = 0
+    for text, pcm in zip(chunk_texts, pcm_chunks):
+        samples = len(pcm) // PCM_SAMPLE_WIDTH
+        offsets.append({
+            'index': len(offsets),
+            'text': text,
+            'start': round(position / PCM_SAMPLE_RATE, 4),
+            'end': round((position + samples) / PCM_SAMPLE_RATE, 4),
+        })
+        position += samples
+    # Drop a trailing odd byte from any chunk so samples stay aligned
+    return b"".join(pcm[:len(pcm) - len(pcm) % PCM_SAMPLE_WIDTH] for pcm in pcm_chunks), offsets
+
+
+def write_chunk_table(path, offsets):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(offsets, f, indent=2, ensure_ascii=False)
+    return path
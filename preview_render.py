@@ -0,0 +1,107 @@
+# Preview renders: low-resolution, low-fps drafts of the final video for checking caption timing and style
+# ffmpeg decodes the background and scales it down (dropping frames down to the preview fps) before it reaches
+# Python, the captions come from the same cue table as the full render with only their size scaled, and the
+# frames are encoded with a fast preset. The decoder also skips B-frames (the background may lag the full render
+# by a frame or two), since decoding the full-size background is most of a preview's time. Caption timing is
+# not affected: a frame at timeline time t shows exactly the captions the full render shows at t.
+# A contact sheet tiles the frame at each caption's start into one image instead.
+import math
+import subprocess
+import threading
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+SHEET_LABEL_HEIGHT = 16  # Pixels under each contact sheet tile for its time and caption
+
+
+def preview_size(width, height, scale):
+    """The preview frame size for an output of width x height (even, as yuv420p needs)."""
+    return max(2, int(round(width * scale / 2)) * 2), max(2, int(round(height * scale / 2)) * 2)
+
+
+def scale_cues(cues, scale):
+    """The cues with their font sizes scaled for a preview; text, line breaks and timing are untouched."""
+    return [dict(cue, fontsize=max(1, int(round(cue['fontsize'] * scale)))) for cue in cues]
+
+
+def read_frames(ffmpeg_binary, path, start, duration, size, fps, frames=None, skip_bframes=False):
+    """
+    Yields the RGB frames (HxWx3 uint8 arrays) of path from start seconds on for duration seconds, at fps,
+    center-cropped to the aspect ratio of size and scaled to it. ffmpeg does the seeking, frame dropping and
+    scaling, so only size-d frames go through the pipe. frames: only yield these frame indices (counted at fps
+    from start, ascending). skip_bframes: don't decode B-frames (their neighbours are shown instead).
+    """
+    width, height = size
+    filters = [f"fps={fps:g}"]
+    if frames is not None:
+        filters.append("select='" + "+".join(f"eq(n,{i})" for i in frames) + "'")
+    filters.append(f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1")
+    cmd = [ffmpeg_binary, "-loglevel", "error"]
+    if skip_bframes:
+        cmd += ["-skip_frame", "bidir"]
+    cmd += [
+        "-ss", f"{start:.3f}", "-i", path, "-t", f"{duration:.3f}", "-an", "-sn", "-vf", ",".join(filters),
+        "-fps_mode", "passthrough", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1",
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    frame_bytes = width * height * 3
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            yield np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+        finished = True
+    finally:
+        process.stdout.close()
+        if not finished:
+            process.kill()  # The consumer stopped early
+        process.wait()
+        reader.join()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr=b"".join(stderr).decode(errors="replace"))
+
+
+def cue_frames(cues, fps):
+    """
+    Indices of the frames (at fps) on which each cue first appears: the first frame at or after its start,
+    which is where a render at fps shows it. One index per distinct frame, in order.
+    """
+    frames = set()
+    for cue in cues:
+        if cue['end'] <= cue['start']:
+            continue
+        index = math.ceil(cue['start'] * fps - 1e-9)
+        if index / fps < cue['start']:
+            index += 1
+        if index / fps < cue['end']:
+            frames.add(index)
+    return sorted(frames)
+
+
+def contact_sheet(tiles, columns):
+    """
+    Tiles (frame, label) pairs into one image, columns per row, each frame with its label underneath.
+    Returns a PIL image.
+    """
+    tile_h, tile_w = tiles[0][0].shape[:2]
+    rows = -(-len(tiles) // columns)
+    columns = min(columns, len(tiles))
+    sheet = Image.new("RGB", (columns * tile_w, rows * (tile_h + SHEET_LABEL_HEIGHT)), "black")
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default()
+    for i, (frame, label) in enumerate(tiles):
+        x, y = (i % columns) * tile_w, (i // columns) * (tile_h + SHEET_LABEL_HEIGHT)
+        sheet.paste(Image.fromarray(frame), (x, y))
+        # Cut the label to the tile width
+        text = label
+        while text and draw.textlength(label, font=font) > tile_w - 4:
+            text = text[:-1]
+            label = text + "..."
+        draw.text((x + 2, y + tile_h + 2), label, fill="white", font=font)
+    return sheet
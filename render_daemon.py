@@ -0,0 +1,435 @@
+# Render daemon: a resident service that keeps the pipeline warm and takes jobs over a local HTTP API
+# torch/whisper/moviepy are imported once, the Whisper model, the OpenAI clients, the caption cache and the
+# background library index are loaded at startup, so a job only pays for its own script, TTS, alignment
+# and render. Jobs wait in a priority queue and at most --max-jobs run at once (Whisper is used by one job
+# at a time; TTS and rendering overlap). Outputs go through the artifact cache like main.py runs.
+#
+# Usage: python render_daemon.py --port 8765                 (HTTP on 127.0.0.1)
+#        python render_daemon.py --socket /tmp/render.sock   (HTTP over a Unix socket)
+#
+# API (JSON):
+#   POST   /jobs              {"idea": "..."} or {"script": "..."}; optional "voice", "caption_mode"
+#                             ("grouped" | "single"), "background" (video path), "priority" (higher runs
+#                             first, default 0) and "id". Returns the job.
+#   GET    /jobs              All jobs
+#   GET    /jobs/<id>         Status (queued, running, done, failed, cancelled), current stage and progress
+#   POST   /jobs/<id>/cancel  Cancels a queued job, or stops a running one at its next progress report
+#   DELETE /jobs/<id>         Same as cancel
+#   GET    /health            Daemon status
+#
+# Example: curl -s localhost:8765/jobs -d '{"idea": "My roommate labels everything", "caption_mode": "single"}'
+import argparse
+import heapq
+import itertools
+import json
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import instrumentation
+import main
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+DAEMON_MAX_CONCURRENT_JOBS = 2  # Jobs running at once (each in its own thread)
+DAEMON_OUTPUT_DIR = "daemon_output"  # One folder per job with its script, audio, timestamps and video
+
+CAPTION_MODES = {"grouped": True, "single": False}
+_INTERNAL_FIELDS = ("dir", "audio_path", "segments")
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobCancelled(BaseException):
+    """
+    Raised from the progress callback of a cancelled job. Derives from BaseException so the pipeline
+    functions' `except Exception` handlers don't turn it into an ordinary failure (or a fallback).
+    """
+
+
+def _new_job(request, job_id):
+    job = {
+        'id': job_id,
+        'status': "queued",
+        'idea': request.get('idea'),
+        'script': request.get('script'),
+        'voice': request.get('voice') or main.TTS_VOICE,
+        'caption_mode': request.get('caption_mode') or ("grouped" if main.ENABLE_WORD_GROUPING else "single"),
+        'background': request.get('background'),
+        'priority': int(request.get('priority') or 0),
+        'stage': None,
+        'progress': None,
+        'timings': {},
+        'cached': {},
+        'error': None,
+        'video_path': None,
+        'submitted_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+    }
+    if not (job['idea'] or job['script']):
+        raise ValueError("A job needs an 'idea' or a 'script'")
+    if job['caption_mode'] not in CAPTION_MODES:
+        raise ValueError(f"caption_mode must be one of {sorted(CAPTION_MODES)}")
+    if job['background'] and not os.path.exists(job['background']):
+        raise ValueError(f"Background video not found: {job['background']}")
+    return job
+
+
+class RenderDaemon:
+    """Priority job queue plus the worker threads that run the jobs through the pipeline."""
+
+    def __init__(self, output_dir=DAEMON_OUTPUT_DIR, max_jobs=DAEMON_MAX_CONCURRENT_JOBS, use_cache=True):
+        self.output_dir = output_dir
+        self.max_jobs = max(1, max_jobs)
+        self.cache = None
+        if use_cache and main.ARTIFACT_CACHE_ENABLED:
+            self.cache = main.artifact_cache.ArtifactCache(main.ARTIFACT_CACHE_DIR, max_bytes=main.ARTIFACT_CACHE_MAX_BYTES)
+        self.jobs = {}
+        self._queue = []  # (-priority, sequence, job id)
+        self._sequence = itertools.count()
+        self._job_numbers = itertools.count(1)  # Automatic job ids; never reused, even after explicit ids
+        self._cancel_events = {}
+        self._condition = threading.Condition()
+        self._whisper_lock = threading.Lock()  # whisper installs hooks on the shared model while it runs
+        self._background_lock = threading.Lock()  # The library index is shared by all jobs
+        self._metrics_lock = threading.Lock()  # Jobs write their metrics to the same files
+        self._stopping = False
+        self._workers = []
+        self.started_at = time.time()
+
+    # --- Startup ---
+    def warm_up(self):
+        """Loads everything a job would otherwise load on its first use."""
+        started = time.perf_counter()
+        print("Warming up: imports, LLM model, Whisper model, OpenAI clients, caption cache, background library...")
+        main.import_stage_modules()
+        main.warm_up_llm()
+        main.get_whisper_model()
+        if main.openai_api_key():
+            main.get_openai_client()
+            main.get_parallel_tts()
+        if main.CAPTION_RENDERER == "pillow":
+            main.get_caption_cache()
+        if main.BACKGROUND_SELECTION == "random":
+            main.get_background_library()
+        print(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        for i in range(self.max_jobs):
+            worker = threading.Thread(target=self._worker, name=f"render-job-{i + 1}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            for event in self._cancel_events.values():
+                event.set()
+            self._condition.notify_all()
+
+    # --- Job API ---
+    def submit(self, request):
+        """Queues a job from an API request dict. Raises ValueError for an invalid request."""
+        with self._condition:
+            if request.get('id'):
+                job_id = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(request['id']))
+            else:
+                job_id = f"job_{next(self._job_numbers):04d}"
+                while job_id in self.jobs:  # Taken by a client-supplied id
+                    job_id = f"job_{next(self._job_numbers):04d}"
+            if job_id in self.jobs:
+                raise ValueError(f"Job '{job_id}' already exists")
+            job = _new_job(request, job_id)
+            self.jobs[job_id] = job
+            self._cancel_events[job_id] = threading.Event()
+            heapq.heappush(self._queue, (-job['priority'], next(self._sequence), job_id))
+            self._condition.notify()
+        print(f"Queued job {job_id} (priority {job['priority']})")
+        return self.status(job_id)
+
+    def cancel(self, job_id):
+        """Cancels a job. Returns its status, or None when there is no such job."""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] == "queued":
+                job['status'], job['finished_at'] = "cancelled", time.time()
+            if job['status'] not in FINISHED:
+                self._cancel_events[job_id].set()  # A running job stops at its next progress report
+        print(f"Cancel requested for job {job_id}")
+        return self.status(job_id)
+
+    def status(self, job_id):
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            # Working state (segments, paths of intermediate files) stays out of the responses
+            status = {key: value for key, value in job.items() if key not in _INTERNAL_FIELDS}
+            status['timings'], status['cached'] = dict(job['timings']), dict(job['cached'])
+            if job['status'] == "queued":
+                waiting = sorted(entry for entry in self._queue if self.jobs[entry[2]]['status'] == "queued")
+                status['queue_position'] = [entry[2] for entry in waiting].index(job_id) + 1
+            if job['status'] == "running" and self._cancel_events[job_id].is_set():
+                status['status'] = "cancelling"
+        return status
+
+    def list_jobs(self):
+        with self._condition:
+            job_ids = list(self.jobs)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def health(self):
+        with self._condition:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'status': "ok", 'uptime_seconds': round(time.time() - self.started_at, 1),
+                'max_jobs': self.max_jobs, 'jobs': counts}
+
+    # --- Workers ---
+    def _next_job(self):
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+                while self._queue:
+                    _, _, job_id = heapq.heappop(self._queue)
+                    job = self.jobs[job_id]
+                    if job['status'] == "queued":  # Cancelled jobs are skipped
+                        job['status'], job['started_at'] = "running", time.time()
+                        return job
+                self._condition.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._run_job(job)
+
+    def _progress(self, job, step, done, total):
+        if self._cancel_events[job['id']].is_set():
+            raise JobCancelled()
+        job['progress'] = {'step': step, 'done': done, 'total': total,
+                           'percent': round(100.0 * done / total, 1) if total else None}
+
+    def _run_stage(self, job, stage, func):
+        if self._cancel_events[job['id']].is_set():
+            raise JobCancelled()
+        job['stage'], job['progress'] = stage, None
+        started = time.perf_counter()
+        func(job)
+        job['timings'][stage] = round(time.perf_counter() - started, 3)
+
+    def _run_job(self, job):
+        print(f"Starting job {job['id']}")
+        job['dir'] = os.path.join(self.output_dir, job['id'])
+        os.makedirs(job['dir'], exist_ok=True)
+        main.set_progress_callback(lambda step, done, total: self._progress(job, step, done, total))
+        instrumentation.get_recorder().set_thread_run_id(job['id'])
+        status, error = "done", None
+        try:
+            if not job['script']:
+                self._run_stage(job, "script", self._script_stage)
+            self._run_stage(job, "audio", self._audio_stage)
+            self._run_stage(job, "timestamps", self._timestamps_stage)
+            self._run_stage(job, "video", self._video_stage)
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", str(e)
+            traceback.print_exc()
+        finally:
+            main.set_progress_callback(None)
+            instrumentation.get_recorder().set_thread_run_id(None)
+        with self._condition:
+            job['status'], job['error'], job['finished_at'] = status, error, time.time()
+            job.pop('segments', None)
+        total = job['finished_at'] - job['started_at']
+        print(f"Job {job['id']} {status} in {total:.2f}s{f': {error}' if error else ''}")
+        self._write_metrics(job)
+
+    def _write_metrics(self, job):
+        """
+        Writes and clears the spans recorded so far, so the recorder doesn't grow for the daemon's lifetime.
+        Spans from the job's thread carry its id as run_id; spans that other running jobs finished meanwhile
+        are written with it.
+        """
+        recorder = instrumentation.get_recorder().drain(job['id'])
+        if main.METRICS_ENABLED:
+            with self._metrics_lock:
+                main.write_run_metrics(recorder)
+
+    # --- Stages (run_cached_stage as in main.py; raise on failure) ---
+    def _cached(self, job, stage, key, path, produce):
+        ok, job['cached'][stage] = main.run_cached_stage(self.cache, stage, key, path, produce)
+        if not ok:
+            raise RuntimeError(f"{stage.capitalize()} stage failed")
+
+    def _script_stage(self, job):
+        def produce(path):
+            script = main.generate_script(job['idea'])
+            if not script:
+                return False
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(script)
+            return True
+
+        script_path = os.path.join(job['dir'], "script.txt")
+        self._cached(job, "script", main.script_cache_key(job['idea']), script_path, produce)
+        with open(script_path, encoding="utf-8") as f:
+            job['script'] = f.read()
+
+    def _audio_stage(self, job):
+        job['audio_path'] = os.path.join(job['dir'], main.TEMP_AUDIO_FILENAME)
+        self._cached(job, "audio", main.audio_cache_key(job['script'], job['voice']), job['audio_path'],
+                     lambda path: main.generate_audio_openai(job['script'], path, voice=job['voice']))
+
+    def _timestamps_stage(self, job):
+        def produce(path):
+            with self._whisper_lock:
+                segments = main.get_word_timestamps(job['audio_path'], script_text=job['script'])
+            if not segments:
+                return False
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(segments, f, ensure_ascii=False)
+            return True
+
+        segments_path = os.path.join(job['dir'], "segments.json")
+        self._cached(job, "timestamps", main.timestamps_cache_key(job['audio_path'], job['script']), segments_path, produce)
+        with open(segments_path, encoding="utf-8") as f:
+            job['segments'] = json.load(f)
+
+    def _video_stage(self, job):
+        if job['background']:
+            background, background_start = job['background'], 0.0
+        else:
+            with self._background_lock:
+                background, background_start = main.select_background(job['audio_path'])
+        word_grouping = CAPTION_MODES[job['caption_mode']]
+        video_path = os.path.join(job['dir'], "video.mp4")
+        key = main.video_cache_key(job['audio_path'], job['segments'], background, background_start, word_grouping)
+        self._cached(job, "video", key, video_path, lambda path: main.create_video(
+            background, job['audio_path'], job['segments'], path, background_start, word_grouping))
+        job['video_path'] = video_path
+
+
+# --- HTTP API ---
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "RenderDaemon/1.0"
+
+    def log_message(self, format, *args):
+        pass  # Job events are printed by the daemon itself
+
+    def _send(self, code, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_path(self):
+        match = re.fullmatch(r"/jobs/([^/]+)(/cancel)?", self.path.split("?")[0].rstrip("/"))
+        return (match.group(1), bool(match.group(2))) if match else (None, False)
+
+    def do_GET(self):
+        daemon = self.server.render_daemon
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/health":
+            return self._send(200, daemon.health())
+        if path == "/jobs":
+            return self._send(200, {'jobs': daemon.list_jobs()})
+        job_id, cancel = self._job_path()
+        status = daemon.status(job_id) if job_id and not cancel else None
+        if status is None:
+            return self._send(404, {'error': "No such job"})
+        self._send(200, status)
+
+    def do_POST(self):
+        daemon = self.server.render_daemon
+        if self.path.split("?")[0].rstrip("/") == "/jobs":
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("The request body must be a JSON object")
+                return self._send(202, daemon.submit(request))
+            except ValueError as e:  # Includes invalid JSON
+                return self._send(400, {'error': str(e)})
+        job_id, cancel = self._job_path()
+        if job_id and cancel:
+            return self.do_DELETE(job_id)
+        self._send(404, {'error': "Not found"})
+
+    def do_DELETE(self, job_id=None):
+        if job_id is None:
+            job_id, cancel = self._job_path()
+            job_id = None if cancel else job_id
+        status = self.server.render_daemon.cancel(job_id) if job_id else None
+        if status is None:
+            return self._send(404, {'error': "No such job"})
+        self._send(200, status)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)  # BaseHTTPRequestHandler expects a (host, port) address
+
+
+def make_server(daemon, host=DAEMON_HOST, port=DAEMON_PORT, socket_path=None):
+    """HTTP server for the daemon's API on host:port, or on a Unix socket when socket_path is given."""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    server.render_daemon = daemon
+    return server
+
+
+def main_daemon(argv=None):
+    parser = argparse.ArgumentParser(description="Run the render pipeline as a resident service with a local job API.")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    parser.add_argument("--socket", help="Serve on this Unix socket instead of host:port")
+    parser.add_argument("--max-jobs", type=int, default=DAEMON_MAX_CONCURRENT_JOBS, help="Jobs running at once")
+    parser.add_argument("--output-dir", default=DAEMON_OUTPUT_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the artifact cache")
+    parser.add_argument("--no-warm-up", action="store_true", help="Load models and clients on first use instead")
+    args = parser.parse_args(argv)
+    main.configure()
+
+    daemon = RenderDaemon(args.output_dir, args.max_jobs, use_cache=not args.no_cache)
+    if not args.no_warm_up:
+        daemon.warm_up()
+    daemon.start()
+    server = make_server(daemon, args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Render daemon listening on {where} ({daemon.max_jobs} concurrent job(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        daemon.stop()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_daemon())
@@ -0,0 +1,124 @@
+# Voice activity detection and chunk planning for long-form transcription
+# Finds the silences in a narration with a simple energy detector, picks cut points in the middle of
+# silences so no word is split between two chunks, and merges per-chunk Whisper results back into one
+# continuous segment list on the original timeline.
+#
+# All functions work on 16 kHz mono float32 audio as returned by whisper.load_audio.
+import numpy as np
+
+FRAME_SECONDS = 0.02
+
+
+def frame_levels(audio, sample_rate=16000, frame_seconds=FRAME_SECONDS):
+    """RMS level in dBFS of each frame_seconds frame (digital silence is -100 dB)."""
+    frame = max(1, int(sample_rate * frame_seconds))
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(audio[:count * frame], dtype=np.float32).reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return (20 * np.log10(np.maximum(rms, 1e-5))).astype(np.float32)
+
+
+def find_speech(levels, frame_seconds=FRAME_SECONDS, margin_db=35.0, min_silence=0.2, min_speech=0.1):
+    """
+    Returns the speech regions as (start, end) seconds. Frames more than margin_db below the loud
+    (95th percentile) frames are silence; silences shorter than min_silence don't split a region and
+    regions shorter than min_speech are dropped.
+    """
+    if len(levels) == 0:
+        return []
+    threshold = float(np.percentile(levels, 95)) - margin_db
+    voiced = levels > threshold
+    regions = []
+    start = None
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced and start is None:
+            start = i
+        elif not is_voiced and start is not None:
+            regions.append([start, i])
+            start = None
+    if start is not None:
+        regions.append([start, len(voiced)])
+
+    merged = []
+    for region in regions:
+        if merged and (region[0] - merged[-1][1]) * frame_seconds < min_silence:
+            merged[-1][1] = region[1]
+        else:
+            merged.append(region)
+    return [(round(s * frame_seconds, 3), round(e * frame_seconds, 3)) for s, e in merged
+            if (e - s) * frame_seconds >= min_speech]
+
+
+def plan_chunks(speech, duration, levels=None, target_seconds=60.0, max_seconds=90.0, frame_seconds=FRAME_SECONDS):
+    """
+    Splits [0, duration] into chunks of about target_seconds (at most max_seconds) that are cut in the
+    middle of silences between speech regions. Among the silences in the allowed range the longest one
+    wins. When speech runs longer than max_seconds without a pause, the cut goes to the quietest frame
+    (from levels) in the allowed range, or to max_seconds without levels.
+    Returns a list of (start, end) seconds covering the whole duration without gaps.
+    """
+    gaps = [(speech[i][1], speech[i + 1][0]) for i in range(len(speech) - 1)]
+    chunks = []
+    start = 0.0
+    while duration - start > max_seconds:
+        low, high = start + target_seconds / 2, start + max_seconds
+        candidates = [(gap_end - gap_start, gap_start, gap_end) for gap_start, gap_end in gaps
+                      if low <= (gap_start + gap_end) / 2 <= high]
+        if candidates:
+            # Longest silence first, then the one closest to the target length
+            _, gap_start, gap_end = max(candidates, key=lambda c: (round(c[0], 2), -abs((c[1] + c[2]) / 2 - start - target_seconds)))
+            cut = (gap_start + gap_end) / 2
+        elif levels is not None and len(levels):
+            first, last = int(low / frame_seconds), min(int(high / frame_seconds), len(levels))
+            if last > first:
+                # Of the frames within 1 dB of the quietest one, the one closest to the target length
+                window = levels[first:last]
+                quiet = np.flatnonzero(window <= window.min() + 1.0) + first
+                target_frame = (start + target_seconds) / frame_seconds
+                cut = quiet[np.argmin(np.abs(quiet - target_frame))] * frame_seconds + frame_seconds / 2
+            else:
+                cut = high
+            print(f"Warning: No pause between {low:.1f}s and {high:.1f}s; cutting at the quietest point ({cut:.2f}s).")
+        else:
+            cut = high
+        cut = round(float(cut), 3)
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, duration))
+    return chunks
+
+
+def merge_chunk_segments(chunk_results):
+    """
+    Merges per-chunk transcriptions into one segment list on the original timeline.
+    chunk_results: list of ((chunk_start, chunk_end), segments) in order, with segment/word times
+    relative to the chunk. Word times are shifted by the chunk start and clamped into the chunk, and
+    every word starts no earlier than the previous word ended, so words never overlap across chunk
+    edges. No words are dropped.
+    """
+    merged = []
+    previous_end = 0.0
+    for (chunk_start, chunk_end), segments in chunk_results:
+        for segment in segments:
+            segment = dict(segment)
+            words = []
+            for word in segment.get('words', []):
+                word = dict(word)
+                start = min(max(word['start'] + chunk_start, chunk_start, previous_end), chunk_end)
+                end = min(max(word['end'] + chunk_start, start), chunk_end)
+                word['start'], word['end'] = round(start, 3), round(end, 3)
+                previous_end = word['end']
+                words.append(word)
+            if words:
+                segment['start'], segment['end'] = words[0]['start'], words[-1]['end']
+            else:
+                segment['start'] = round(min(max(segment['start'] + chunk_start, previous_end), chunk_end), 3)
+                segment['end'] = round(min(max(segment['end'] + chunk_start, segment['start']), chunk_end), 3)
+            segment['words'] = words
+            segment['id'] = len(merged)
+            if 'seek' in segment:
+                segment['seek'] += int(round(chunk_start * 100))  # Whisper's seek is in 10 ms mel frames
+            merged.append(segment)
+    return merged
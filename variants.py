@@ -0,0 +1,344 @@
+# Multi-variant rendering: one story rendered with several backgrounds, caption styles and aspect ratios
+# Script, narration and word timestamps are produced once. The caption timeline is built once per caption
+# mode (and frame width and font, when the captions are fitted to the frame), every distinct caption is
+# rasterized once per style into a caption cache on disk that all workers read, and the variants are encoded
+# in parallel worker processes. The summary compares the run with rendering every variant separately (each
+# paying for its own TTS, timestamps and captions).
+#
+# Usage: python variants.py variants.json --script script.txt                (runs TTS and timestamps once)
+#        python variants.py variants.json --audio narration.wav --segments segments.json
+#   variants.json: a list of variant specs, e.g.
+#     [{"name": "grouped_9x16", "caption_mode": "grouped", "size": [1080, 1920]},
+#      {"name": "single_1x1", "caption_mode": "single", "size": [1080, 1080], "background": "bg/city.mp4"},
+#      {"name": "yellow", "style": {"CAPTION_COLOR": "yellow", "MULTI_CAPTION_FONTSIZE": 48}}]
+#   Optional keys: "background" and "background_start" (default: picked once as configured in main.py),
+#   "caption_mode" ("grouped" | "single"), "size" ([width, height]), "fps", "backend" ("moviepy" | "ffmpeg")
+#   and "style" (caption settings from main.py, see VARIANT_STYLE_SETTINGS).
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+
+VARIANTS_OUTPUT_DIR = "variants_output"
+VARIANT_STYLE_SETTINGS = [
+    "CAPTION_FONT", "CAPTION_FONT_PATH", "SINGLE_CAPTION_FONTSIZE", "MULTI_CAPTION_FONTSIZE", "CAPTION_COLOR",
+    "CAPTION_STROKE_COLOR", "CAPTION_STROKE_WIDTH",
+]
+CAPTION_MODES = {"grouped": True, "single": False}
+
+
+def parse_variant(spec, index):
+    """
+    Validates a variant spec and resolves its defaults from the current main.py settings.
+    Returns {'name', 'background', 'background_start', 'word_grouping', 'settings'} where settings are the
+    main.py settings the variant renders with. Raises ValueError for an invalid spec.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"Variant {index + 1} must be an object")
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(spec.get("name") or f"variant_{index + 1}"))
+    mode = spec.get("caption_mode")
+    if mode is not None and mode not in CAPTION_MODES:
+        raise ValueError(f"Variant '{name}': caption_mode must be one of {sorted(CAPTION_MODES)}")
+    style = spec.get("style") or {}
+    unknown = sorted(set(style) - set(VARIANT_STYLE_SETTINGS))
+    if unknown:
+        raise ValueError(f"Variant '{name}': unknown style settings {unknown} (allowed: {VARIANT_STYLE_SETTINGS})")
+    size = spec.get("size")
+    if size is not None and not (isinstance(size, (list, tuple)) and len(size) == 2
+                                 and all(isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in size)):
+        raise ValueError(f"Variant '{name}': size must be [width, height] in pixels")
+    fps = spec.get("fps")
+    if fps is not None and not (isinstance(fps, (int, float)) and not isinstance(fps, bool) and 0 < fps < float("inf")):
+        raise ValueError(f"Variant '{name}': fps must be a positive number")
+    backend = spec.get("backend", main.RENDER_BACKEND)
+    if backend not in ("moviepy", "ffmpeg"):
+        raise ValueError(f"Variant '{name}': backend must be \"moviepy\" or \"ffmpeg\"")
+
+    settings = {key: style.get(key, getattr(main, key)) for key in VARIANT_STYLE_SETTINGS}
+    settings.update(
+        OUTPUT_SIZE=tuple(size) if size else main.OUTPUT_SIZE,
+        OUTPUT_FPS=spec.get("fps", main.OUTPUT_FPS),
+        RENDER_BACKEND=backend,
+    )
+    return {
+        'name': name,
+        'background': spec.get("background"),
+        'background_start': float(spec.get("background_start", 0.0)),
+        'word_grouping': main.ENABLE_WORD_GROUPING if mode is None else CAPTION_MODES[mode],
+        'settings': settings,
+    }
+
+
+def style_key(settings):
+    """The settings that decide how a caption bitmap looks (variants with the same key share bitmaps)."""
+    return tuple(settings[key] for key in VARIANT_STYLE_SETTINGS)
+
+
+def timeline_key(variant):
+    """
+    The variants that can share one caption timeline: all variants of a caption mode with the fixed layout;
+    with the "fit" layout also the same frame width and font, since the planned breaks and sizes depend on them.
+    """
+    if main.CAPTION_LAYOUT != "fit":
+        return (variant['word_grouping'],)
+    settings = variant['settings']
+    width = settings["OUTPUT_SIZE"][0] if settings["OUTPUT_SIZE"] else None
+    fontsize = settings["MULTI_CAPTION_FONTSIZE"] if variant['word_grouping'] else settings["SINGLE_CAPTION_FONTSIZE"]
+    return (variant['word_grouping'], width, settings["CAPTION_FONT"], settings["CAPTION_FONT_PATH"], fontsize,
+            settings["CAPTION_STROKE_WIDTH"])
+
+
+def build_timeline(segments, audio_duration, variant):
+    """The caption timeline of a timeline_key group, planned for the variant's frame width and style."""
+    if main.CAPTION_LAYOUT != "fit":
+        return main.build_caption_cues(segments, audio_duration, variant['word_grouping'])
+    word_grouping, width, font, font_path, fontsize, stroke_width = timeline_key(variant)
+    return main.plan_caption_cues(segments, audio_duration, word_grouping, width, fontsize,
+                                  main.caption_raster.resolve_font_path(font, font_path), stroke_width)
+
+
+def variant_cues(cues, word_grouping, settings):
+    """The shared timeline of a caption mode with the font size of this variant's style."""
+    if main.CAPTION_LAYOUT == "fit":
+        return cues  # Planned for this style already
+    fontsize = settings["MULTI_CAPTION_FONTSIZE"] if word_grouping else settings["SINGLE_CAPTION_FONTSIZE"]
+    return [dict(cue, fontsize=fontsize) for cue in cues]
+
+
+def rasterize_captions(cues, settings, cache):
+    """
+    Renders every distinct caption of cues in the variant's style into cache (a caption_raster.CaptionCache).
+    Returns the number of distinct captions.
+    """
+    font_path = main.caption_raster.resolve_font_path(settings["CAPTION_FONT"], settings["CAPTION_FONT_PATH"])
+    captions = dict.fromkeys((cue['text'], cue['fontsize']) for cue in cues)
+    for text, fontsize in captions:
+        cache.get(text, font_path, fontsize, settings["CAPTION_COLOR"], settings["CAPTION_STROKE_COLOR"],
+                  settings["CAPTION_STROKE_WIDTH"])
+    return len(captions)
+
+
+# --- Process pool task (must be module-level to be picklable) ---
+def _render_variant_task(settings, background, background_start, audio_path, segments, cues, word_grouping,
+                         output_path, use_cache):
+    """Renders one variant with its settings applied to main. Returns (success, from_cache, seconds)."""
+    for key, value in settings.items():
+        setattr(main, key, value)
+    if main._CAPTION_CACHE is not None and main._CAPTION_CACHE.cache_dir != main.CAPTION_CACHE_DIR:
+        main._CAPTION_CACHE = None
+    cache = None
+    if use_cache and main.ARTIFACT_CACHE_ENABLED:
+        cache = main.artifact_cache.ArtifactCache(main.ARTIFACT_CACHE_DIR, max_bytes=main.ARTIFACT_CACHE_MAX_BYTES)
+    started = time.perf_counter()
+    ok, from_cache = main.run_cached_stage(
+        cache, "video", main.video_cache_key(audio_path, segments, background, background_start, word_grouping),
+        output_path,
+        lambda path: main.create_video(background, audio_path, segments, path, background_start, word_grouping, cues),
+    )
+    return ok, from_cache, time.perf_counter() - started
+
+
+def render_variants(audio_path, segments, specs, output_dir=VARIANTS_OUTPUT_DIR, workers=None, use_cache=True,
+                    shared_seconds=None, overrides=()):
+    """
+    Renders every variant spec for one narration and its word timestamps.
+    shared_seconds: seconds already spent on the stages all variants share (e.g. {'audio': 4.1,
+    'timestamps': 9.8}); separate runs would pay them once per variant.
+    overrides: "NAME=VALUE" settings applied in the worker processes too (see main.configure).
+    Returns a summary dict with per-variant results and the estimated time saved.
+    Raises ValueError for an invalid spec.
+    """
+    variants = [parse_variant(spec, i) for i, spec in enumerate(specs)]
+    names = [variant['name'] for variant in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("Variant names must be unique")
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    shared_seconds = dict(shared_seconds or {})
+    audio_duration = main.load_narration(audio_path).duration
+
+    # The caption timeline, once per caption mode (and per frame width and font with the "fit" layout)
+    timelines, cue_seconds = {}, {}
+    for variant in variants:
+        key = timeline_key(variant)
+        if key not in timelines:
+            mode_started = time.perf_counter()
+            timelines[key] = build_timeline(segments, audio_duration, variant)
+            cue_seconds[key] = time.perf_counter() - mode_started
+
+    # Every distinct caption, once per style, into the disk cache the workers read from
+    caption_dir = main.CAPTION_CACHE_DIR or os.path.join(output_dir, ".caption_cache")
+    raster_seconds, caption_counts, caches = 0.0, {}, {}
+    if main.CAPTION_RENDERER == "pillow":
+        raster_started = time.perf_counter()
+        for variant in variants:
+            if variant['settings']["RENDER_BACKEND"] != "moviepy":
+                continue  # The ffmpeg backend draws its captions with libass
+            cache = caches.setdefault(style_key(variant['settings']),
+                                      main.caption_raster.CaptionCache(main.CAPTION_CACHE_MAX_BYTES, caption_dir))
+            caption_counts[variant['name']] = rasterize_captions(
+                variant_cues(timelines[timeline_key(variant)], variant['word_grouping'], variant['settings']),
+                variant['settings'], cache)
+        raster_seconds = time.perf_counter() - raster_started
+    bitmaps = sum(cache.stats()['misses'] for cache in caches.values())
+    if caches:
+        print(f"Rasterized {bitmaps} caption bitmaps for {sum(caption_counts.values())} captions in {len(caches)} style(s)")
+
+    default_background = None
+    if any(not variant['background'] for variant in variants):
+        default_background = main.select_background(audio_path)
+    for variant in variants:
+        if not variant['background']:
+            variant['background'], variant['background_start'] = default_background
+        if not os.path.exists(variant['background']):
+            raise ValueError(f"Variant '{variant['name']}': background video not found at '{variant['background']}'")
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(variants)))
+    print(f"Rendering {len(variants)} variants with {workers} worker(s)...")
+    encode_started = time.perf_counter()
+    results = []
+    # Spawned (not forked) workers, like batch mode's render pool
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=main.configure,
+                             initargs=(list(overrides),)) as pool:
+        futures = []
+        for variant in variants:
+            settings = dict(variant['settings'], CAPTION_RENDERER=main.CAPTION_RENDERER, CAPTION_CACHE_DIR=caption_dir,
+                            CAPTION_COMPOSITOR=main.CAPTION_COMPOSITOR, VIDEO_PRESET=main.VIDEO_PRESET)
+            cues = variant_cues(timelines[timeline_key(variant)], variant['word_grouping'], variant['settings'])
+            output_path = os.path.join(output_dir, f"{variant['name']}.mp4")
+            futures.append((variant, output_path, pool.submit(
+                _render_variant_task, settings, variant['background'], variant['background_start'], audio_path,
+                segments, cues, variant['word_grouping'], output_path, use_cache)))
+        for variant, output_path, future in futures:
+            try:
+                ok, from_cache, seconds = future.result()
+                error = None if ok else "Video generation failed"
+            except Exception as e:
+                ok, from_cache, seconds, error = False, False, 0.0, str(e)
+            results.append({
+                'name': variant['name'], 'status': "done" if ok else "failed", 'error': error,
+                'video_path': output_path if ok else None, 'background': variant['background'],
+                'background_start': variant['background_start'],
+                'caption_mode': "grouped" if variant['word_grouping'] else "single",
+                'size': variant['settings']["OUTPUT_SIZE"], 'cached': from_cache, 'render_seconds': round(seconds, 3),
+            })
+    encode_seconds = time.perf_counter() - encode_started
+
+    # Separate runs would each pay for the shared stages, their caption timeline and rasterizing all of their captions
+    shared_total = sum(shared_seconds.values())
+    seconds_per_bitmap = raster_seconds / bitmaps if bitmaps else 0.0
+    separate = sum(
+        shared_total + cue_seconds[timeline_key(variant)] + caption_counts.get(variant['name'], 0) * seconds_per_bitmap
+        + result['render_seconds'] for variant, result in zip(variants, results)
+    )
+    actual = shared_total + time.perf_counter() - started
+    summary = {
+        'variants': results,
+        'workers': workers,
+        'shared_seconds': {stage: round(seconds, 3) for stage, seconds in shared_seconds.items()},
+        'caption_timing_seconds': round(sum(cue_seconds.values()), 3),
+        'caption_raster_seconds': round(raster_seconds, 3),
+        'caption_bitmaps': bitmaps,
+        'encode_seconds': round(encode_seconds, 3),
+        'total_seconds': round(actual, 3),
+        'separate_runs_seconds': round(separate, 3),
+        'saved_seconds': round(separate - actual, 3),
+    }
+    with open(os.path.join(output_dir, "variants_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def print_summary(summary):
+    print("\n--- Variants Summary ---")
+    for result in summary['variants']:
+        detail = result['video_path'] if result['status'] == "done" else result['error']
+        print(f"{result['name']}: {result['status']} in {result['render_seconds']:.2f}s"
+              f"{' (cached)' if result['cached'] else ''} - {detail}")
+    shared = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in summary['shared_seconds'].items()) or "none timed"
+    print(f"Shared once: {shared}; caption timing {summary['caption_timing_seconds']:.2f}s, "
+          f"caption rasterizing {summary['caption_raster_seconds']:.2f}s")
+    print(f"Encodes: {summary['encode_seconds']:.2f}s with {summary['workers']} worker(s)")
+    print(f"Total {summary['total_seconds']:.2f}s vs ~{summary['separate_runs_seconds']:.2f}s as separate runs "
+          f"(saved ~{summary['saved_seconds']:.2f}s)")
+
+
+def main_variants(argv=None):
+    parser = argparse.ArgumentParser(description="Render one story in several variants from a single alignment pass.")
+    parser.add_argument("variants", help="JSON file with a list of variant specs")
+    parser.add_argument("--script", help="Script text file (narrated and aligned once when --audio/--segments are missing)")
+    parser.add_argument("--audio", help="Narration audio file")
+    parser.add_argument("--segments", help="Segments JSON from the align stage")
+    parser.add_argument("--output-dir", default=VARIANTS_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, help="Encode processes (default: one per core, at most one per variant)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a setting from main.py for every variant (repeatable)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the artifact cache")
+    args = parser.parse_args(argv)
+    try:
+        main.configure(args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.segments and not args.script:
+        parser.error("--segments or --script is required")
+    if not args.audio and not args.script:
+        parser.error("--audio or --script is required")
+    with open(args.variants, encoding="utf-8") as f:
+        specs = json.load(f)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache = None
+    if main.ARTIFACT_CACHE_ENABLED and not args.no_cache:
+        cache = main.artifact_cache.ArtifactCache(main.ARTIFACT_CACHE_DIR, max_bytes=main.ARTIFACT_CACHE_MAX_BYTES)
+    script_text = None
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script_text = f.read()
+    shared_seconds = {}
+    audio_path = args.audio
+    if not audio_path:
+        audio_path = os.path.join(args.output_dir, "narration.wav")
+        started = time.perf_counter()
+        ok, _ = main.run_cached_stage(cache, "audio", main.audio_cache_key(script_text), audio_path,
+                                      lambda path: main.generate_audio_openai(script_text, path))
+        if not ok:
+            return 1
+        shared_seconds['audio'] = time.perf_counter() - started
+    segments_path = args.segments
+    if not segments_path:
+        segments_path = os.path.join(args.output_dir, "segments.json")
+
+        def produce(path):
+            segments = main.get_word_timestamps(audio_path, script_text=script_text)
+            if segments is None:
+                return False
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(segments, f, ensure_ascii=False)
+            return True
+        started = time.perf_counter()
+        ok, _ = main.run_cached_stage(cache, "timestamps", main.timestamps_cache_key(audio_path, script_text),
+                                      segments_path, produce)
+        if not ok:
+            return 1
+        shared_seconds['timestamps'] = time.perf_counter() - started
+    with open(segments_path, encoding="utf-8") as f:
+        segments = json.load(f)
+
+    try:
+        summary = render_variants(audio_path, segments, specs, args.output_dir, args.workers,
+                                  use_cache=not args.no_cache, shared_seconds=shared_seconds, overrides=args.overrides)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    print_summary(summary)
+    return 0 if all(result['status'] == "done" for result in summary['variants']) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_variants())